@@ -1,26 +1,41 @@
 # ease_chatbot_streamlit.py
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for the shared clauseease package
+
 import streamlit as st
-from io import BytesIO
-import docx
-import PyPDF2
 import re
 import base64
-import requests
 import heapq
-from langdetect import detect
 import difflib
-import textstat
-import spacy
 import json
 import os
 from datetime import datetime
 
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+from clauseease.chunking import ChunkView
+from clauseease.clauses import ClauseSpan, detect_clauses
+from clauseease.glossary import GlossaryBuilder
+from clauseease.jobs import DONE, FAILED, get_job_queue, stash_upload
+from clauseease.lazy import import_report, load
+from clauseease.ollama_client import OllamaError, get_client
+from clauseease.pipelines import KrushnaPipeline
+from clauseease.result_cache import content_hash
+from clauseease.summarize import MapReduceSummarizer
+from clauseease.tracing import span
+from clauseease.ui import diagnostics_panel, poll_job, queue_stats, tag_session
+
+client = get_client()
 DEFAULT_MODEL = "tinyllama"   
-CHUNK_SIZE_WORDS = 900        
+# Chunking, prompts and the Q&A index (shared with the benchmark)
+pipeline = KrushnaPipeline(DEFAULT_MODEL)
+# Chunks are sized in the model's tokens: half of num_ctx, leaving room for the prompt and answer
+CHUNK_TOKENS = pipeline.chunk_tokens
+OLLAMA_OPTIONS = pipeline.options
+LANG_SAMPLE_CHARS = 2000      # text per chunk given to langdetect
 FALLBACK_SUMMARY_SENTENCES = 4
 
 st.set_page_config(page_title="Clause Ease — Contract Simplifier", layout="wide")
+tag_session()   # questions from this session take turns with other sessions' in the Ollama queue
 st.title("📜 Ease — Contract Simplifier")
 
 
@@ -29,7 +44,7 @@ STOPWORDS = set([
 ])
 
 def simple_sent_tokenize(text):
-    return re.split(r'(?<=[.!?])\s+', text)
+    return pipeline.sentences(text)
 
 def simple_word_tokenize(text):
     return re.findall(r'\b[a-zA-Z]+\b', text.lower())
@@ -53,127 +68,121 @@ def fallback_extractive_summarize(text, max_sentences=FALLBACK_SUMMARY_SENTENCES
     top_idx = sorted(heapq.nlargest(max_sentences, scores, key=scores.get))
     return " ".join([sents[i] for i in top_idx])
 
-def chunk_text(text, chunk_size_words=CHUNK_SIZE_WORDS):
-    words = text.split()
-    return [" ".join(words[i:i+chunk_size_words]) for i in range(0, len(words), chunk_size_words)]
+def chunk_text(text, chunk_tokens=CHUNK_TOKENS):
+    return pipeline.chunk(text, chunk_tokens)
 
-def call_ollama(prompt, model=DEFAULT_MODEL, timeout=60):
-    """Call ollama local HTTP API (/api/generate). Returns text or None on failure."""
-    payload = {"model": model, "prompt": prompt, "stream": False}
+def call_ollama(prompt, model=DEFAULT_MODEL, timeout=60, cache=True, format=None):
+    """Call ollama local HTTP API (/api/generate). Returns text or None on failure.
+    Answers come from the shared on-disk response cache when the same prompt was seen before.
+    format is passed through to Ollama ("json" or a JSON schema)."""
     try:
-        r = requests.post(OLLAMA_API_URL, json=payload, timeout=timeout)
-        r.raise_for_status()
-        return r.json().get("response", "")
-    except Exception as e:
+        return client.generate(prompt, model=model, options=OLLAMA_OPTIONS, format=format,
+                               timeout=timeout, cache=cache).text
+    except OllamaError:
         # debug: st.write("Ollama call failed:", e)
         return None
 
-def translate_chunk_to_english(chunk):
-    prompt = (
-        "Translate the following text into clear, natural English while preserving legal terms and meaning. "
-        "If the text is already English, return it with minimal changes.\n\n"
-        f"{chunk}\n\nResult:"
-    )
-    out = call_ollama(prompt)
-    if out:
-        return out.strip()
-    # fallback: return chunk itself (still proceed)
-    return chunk
-
-def simplify_chunk(chunk):
-    prompt = (
-        "You are an assistant that simplifies legal/contract text into plain English. "
-        "Produce a short, clear, bullet or paragraph style summary preserving meaning and important terms.\n\n"
-        f"Text:\n{chunk}\n\nSimplified:"
-    )
-    out = call_ollama(prompt)
+def simplify_chunk(chunk, cache=True):
+    out = call_ollama(pipeline.simplify_prompt(chunk), cache=cache)
     if out:
         return out.strip()
     return fallback_extractive_summarize(chunk, max_sentences=6)
 
-def process_document_text(full_text, chunk_size=CHUNK_SIZE_WORDS):
-    """Translate & simplify document in chunks. Returns (translated_full, simplified_full)"""
-    # detect language
+TRANSLATE_SIMPLIFY_SCHEMA = pipeline.translate_simplify_schema
+
+def translate_and_simplify_chunk(chunk, cache=True):
+    """One call for a non-English chunk: English translation and plain-English simplification.
+    Returns (translated, simplified)."""
+    out = call_ollama(pipeline.translate_simplify_prompt(chunk), format=TRANSLATE_SIMPLIFY_SCHEMA,
+                      cache=cache)
+    try:
+        data = json.loads(out) if out else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    translated = str(data.get("translation") or "").strip()
+    simplified = str(data.get("simplified") or "").strip()
+    if not translated:
+        # same fallbacks as the separate steps: keep the original text
+        translated = chunk
+    if not simplified:
+        simplified = fallback_extractive_summarize(translated, max_sentences=6)
+    return translated, simplified
+
+@st.cache_resource(show_spinner=False)
+def get_language_detector():
+    """langdetect, imported and seeded once per process and shared by all sessions."""
+    langdetect = load("langdetect")
+    langdetect.DetectorFactory.seed = 0   # langdetect is randomised; keep chunk languages repeatable
+    return langdetect
+
+def detect_language(text):
+    """ISO code of the chunk's language, or "unknown" when langdetect cannot tell."""
+    langdetect = get_language_detector()
     try:
-        lang = detect(full_text)
-    except:
-        lang = "unknown"
-    chunks = chunk_text(full_text, chunk_size_words=chunk_size)
+        return langdetect.detect(text[:LANG_SAMPLE_CHARS])
+    except langdetect.LangDetectException:
+        return "unknown"
+
+def process_document_text(full_text, chunk_tokens=CHUNK_TOKENS, summarizer=None,
+                          chunks=None, done=None, on_chunk=None, cache=True):
+    """Translate & simplify document in chunks. Returns (translated_full, simplified_full)
+    Language is detected per chunk: English chunks are only simplified, other chunks
+    are translated and simplified by one combined prompt.
+    If a MapReduceSummarizer is given, the simplified chunks are condensed with it.
+    chunks overrides the chunking, done maps chunk number -> (translated, simplified)
+    already computed, and on_chunk(i, translated, simplified, n_chunks) sees every new one.
+    cache=False bypasses the response cache."""
+    if chunks is None:
+        chunks = chunk_text(full_text, chunk_tokens=chunk_tokens)
+    done = done or {}
     translated_chunks = []
     simplified_chunks = []
-    for i,ch in enumerate(chunks):
-        translated = translate_chunk_to_english(ch)
+    for i, ch in enumerate(chunks):
+        if i in done:
+            translated, simplified = done[i]
+        else:
+            if detect_language(ch) == "en":
+                translated, simplified = ch, simplify_chunk(ch, cache=cache)
+            else:
+                translated, simplified = translate_and_simplify_chunk(ch, cache=cache)
+            if on_chunk:
+                on_chunk(i, translated, simplified, len(chunks))
         translated_chunks.append(translated)
-        simplified = simplify_chunk(translated)
         simplified_chunks.append(simplified)
+    if summarizer is not None and len(simplified_chunks) > 1:
+        return "\n\n".join(translated_chunks), summarizer.reduce(simplified_chunks)
     return "\n\n".join(translated_chunks), "\n\n".join(simplified_chunks)
 
+def build_sentence_index(simplified, translated, original):
+    """Split the document into sentences once and index them for Q&A.
+    Returns {"sentences": [...], "bm25": BM25Index keyed by sentence number}."""
+    return pipeline.sentence_index(simplified, translated, original)
+
 def extract_clause_headings(text):
     """
     Very simple heading/ clause detector: looks for common clause keywords and
-    capitalized lines (heuristic). Returns a list of (heading, sample_text).
+    capitalized lines (heuristic) across the whole document, in one pass.
+    Returns ClauseSpan records, which unpack as (heading, sample_text) and carry
+    the clause's offsets in text.
     """
-    headings = []
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    clause_keywords = [
-        "Terminat", "Payment", "Confidential", "Governing Law", "Liabil", "Indemn",
-        "Force Majeure", "Intellectual Property", "Dispute", "Notice", "Warranty",
-        "Assignment", "Data Protection", "Privacy", "Breach", "Refund"
-    ]
-    for i,l in enumerate(lines[:400]):  # limit for speed
-        # heuristic 1: uppercase short line
-        if len(l) < 80 and sum(1 for c in l if c.isupper()) > (len(l)*0.3):
-            headings.append((l, " ".join(lines[i+1:i+3])))
-            continue
-        # heuristic 2: contains keyword
-        for k in clause_keywords:
-            if k.lower() in l.lower():
-                headings.append((l, " ".join(lines[i+1:i+3])))
-                break
-    # dedupe
-    seen = set()
-    out = []
-    for h,s in headings:
-        if h.lower() not in seen:
-            seen.add(h.lower())
-            out.append((h,s))
-    return out[:40]
-
-def extract_glossary_terms(text, top_n=20):
- 
+    return detect_clauses(text)
+
+def extract_glossary_terms(text, top_n=20, cache=True):
+    """Most frequent capitalized terms with short explanations.
+    Definitions are cached per term across documents; new terms cost one schema-constrained
+    call, plus one re-ask for any the model skipped."""
     # find candidate tokens: Capitalized words/phrases
-    candidates = re.findall(r'\b[A-Z][A-Za-z]{2,}(?:\s+[A-Z][A-Za-z]{2,}){0,3}\b', text)
-    freq = {}
-    for c in candidates:
-        freq[c] = freq.get(c,0) + 1
-    sorted_terms = sorted(freq.items(), key=lambda x: x[1], reverse=True)
-    terms = [t for t,_ in sorted_terms[:top_n]]
-    # ask Ollama to give simple definitions for terms (batch)
+    terms = pipeline.glossary_candidates(text, top_n)
     if not terms:
         return {}
-    prompt = "Provide a very short plain-English explanation (1-2 sentences) for each term below, using simple language:\n\n"
-    for t in terms:
-        prompt += f"- {t}\n"
-    prompt += "\nReturn as JSON mapping term -> explanation."
-    out = call_ollama(prompt)
-    # try to parse JSON; otherwise produce simple fallback mapping
-    glossary = {}
-    if out:
-        try:
-            # Some models return pretty JSON; try to extract first JSON block
-            js = re.search(r'\{[\s\S]*\}', out)
-            if js:
-                glossary = json.loads(js.group(0))
-        except Exception:
-            pass
-    if not glossary:
-        # fallback: brief autogenerated lines
-        for t in terms:
-            glossary[t] = "Short explanation: " + (call_ollama(f"Explain briefly what '{t}' means in a contract, in 1 sentence.") or "See clause.")
-    return glossary
+    builder = GlossaryBuilder(client, DEFAULT_MODEL, options=OLLAMA_OPTIONS, cache=cache)
+    return builder.define(terms)
 
 def compute_readability_metrics(text):
-    # using textstat for quick metrics
+    # using textstat for quick metrics (imported on the first upload, not at startup)
+    textstat = load("textstat")
     try:
         flesch = textstat.flesch_reading_ease(text)
         grade = textstat.text_standard(text, float_output=True)
@@ -182,42 +191,88 @@ def compute_readability_metrics(text):
         grade = None
     return {"flesch_reading_ease": flesch, "grade": grade}
 
-def read_docx(file_bytes):
-    doc = docx.Document(BytesIO(file_bytes))
-    return "\n".join([p.text for p in doc.paragraphs])
-
-def read_pdf(file_bytes):
-    reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-    pages = []
-    for page in reader.pages:
-        try:
-            pages.append(page.extract_text() or "")
-        except:
-            pages.append("")
-    return "\n".join(pages)
-
-def read_txt(file_bytes):
-    return file_bytes.decode('utf-8', errors='ignore')
+# The readers take a path or the uploaded file object itself, so the upload is not copied into a second buffer
+def read_document(file, fname):
+    return pipeline.extract(file, fname)
+
+
+# -------------------------
+# Background processing
+# -------------------------
+DOCUMENT_JOB = "ease_document"
+
+def run_document_job(job):
+    """Whole upload pipeline in a worker thread. Each translated/simplified chunk is
+    checkpointed, so an interrupted job picks up at the first unfinished chunk.
+    Returns the JSON-serialisable parts of a history entry.
+    Everything it needs comes from job.params, never from the widgets of whichever
+    session ran the script last: resumed jobs run before any widget exists."""
+    params = job.params
+    cache = params.get("cache", True)
+    with span("extract", file=params["name"]):
+        full_text = read_document(params["path"], params["name"])
+    saved = job.checkpoints()
+    # Step -1 holds the chunk spans: token chunking follows the calibrated
+    # chars-per-token ratio, so it is fixed once instead of being redone on resume
+    spans = saved.pop(-1, None)
+    if spans is None:
+        with span("chunk"):
+            spans = [list(s) for s in chunk_text(full_text).spans]
+        job.checkpoint(-1, spans)
+    chunks = ChunkView(full_text, spans)
+    job.progress(len(saved), len(chunks), "translating & simplifying")
+
+    def on_chunk(i, translated, simplified, total):
+        job.checkpoint(i, [translated, simplified])
+        saved[i] = (translated, simplified)
+        job.progress(len(saved), total, f"simplified chunk {i + 1} of {total}")
+
+    summarizer = MapReduceSummarizer(client, DEFAULT_MODEL, cache=cache,
+                                     options=OLLAMA_OPTIONS) if params["condense"] else None
+    with span("translate_simplify", chunks=len(chunks), resumed=len(saved)):
+        translated, simplified = process_document_text(full_text, summarizer=summarizer, chunks=chunks,
+                                                       done=saved, on_chunk=on_chunk, cache=cache)
+    if summarizer is not None and summarizer.errors:
+        # Fail instead of finishing with a half-condensed summary; the chunks stay
+        # checkpointed, so a retry only repeats the condensing
+        raise summarizer.errors[0]
+    job.progress(len(chunks), len(chunks), "clauses, glossary and readability")
+    with span("clauses"):
+        clauses = [c.to_dict() for c in extract_clause_headings(full_text)]
+    with span("glossary"):
+        glossary = extract_glossary_terms(full_text, top_n=12, cache=cache)
+    with span("readability"):
+        metrics = compute_readability_metrics(simplified or translated or full_text)
+    return {
+        "name": params["name"],
+        "original": full_text,
+        "translated": translated,
+        "simplified": simplified,
+        "clauses": clauses,
+        "glossary": glossary,
+        "metrics": metrics,
+    }
+
+jobs = get_job_queue()
+jobs.register(DOCUMENT_JOB, run_document_job)
+
+@st.cache_resource(show_spinner=False)
+def resume_document_jobs():
+    """Once per process: restart uploads a previous server process left unfinished."""
+    return jobs.resume(DOCUMENT_JOB)
+
+resume_document_jobs()
 
 
 if "history" not in st.session_state:
     st.session_state.history = []   # list of dicts: {name, uploaded_at, original, translated, simplified, clauses, glossary, metrics}
 
-if "nlp_loaded" not in st.session_state:
-    st.session_state.nlp_loaded = False
-
-
-if not st.session_state.nlp_loaded:
-    try:
-        nlp = spacy.load("en_core_web_sm")
-        st.session_state.nlp_loaded = True
-    except Exception:
-        nlp = None
-        st.session_state.nlp_loaded = False
-
-
 st.sidebar.header("Upload / Sessions")
 uploaded_file = st.sidebar.file_uploader("Upload contract (.txt, .docx, .pdf)", type=["txt","docx","pdf"])
+use_llm_cache = st.sidebar.checkbox("Reuse cached model answers", value=True,
+                                    help="Untick to bypass the response cache and re-run every prompt.")
+condense_simplified = st.sidebar.checkbox("Condense long documents (map-reduce)", value=False,
+                                          help="Merge the per-chunk simplifications level by level into one short summary.")
 if st.sidebar.button("New session / Clear view"):
     st.session_state.current_doc = None
 
@@ -229,40 +284,37 @@ for i,docmeta in enumerate(reversed(st.session_state.history[-10:])):
         st.session_state.current_doc = st.session_state.history[idx]
 
 
+pending_job = None
 if uploaded_file:
-    file_bytes = uploaded_file.read()
     fname = uploaded_file.name
-    try:
-        if fname.lower().endswith(".docx"):
-            full_text = read_docx(file_bytes)
-        elif fname.lower().endswith(".pdf"):
-            full_text = read_pdf(file_bytes)
-        else:
-            full_text = read_txt(file_bytes)
+    # The pipeline runs as a background job keyed by file content and settings:
+    # reruns, other sessions and a restarted server all attach to the same job
+    path, digest = stash_upload(uploaded_file.getvalue(), fname)
+    job_id = content_hash(digest, DEFAULT_MODEL, str(CHUNK_TOKENS), str(condense_simplified),
+                          str(use_llm_cache))
+    job = jobs.submit(DOCUMENT_JOB, job_id, {"path": path, "name": fname,
+                                             "condense": condense_simplified,
+                                             "cache": use_llm_cache})
+    if job.status == DONE:
+        if st.session_state.get("loaded_job") != job_id:
+            result = job.result
+            # save history entry
+            entry = dict(result,
+                         uploaded_at=datetime.now().strftime("%Y-%m-%d %H:%M"),
+                         clauses=[ClauseSpan(**c) for c in result["clauses"]],
+                         sentence_index=build_sentence_index(result["simplified"], result["translated"],
+                                                             result["original"]))
+            st.session_state.history.append(entry)
+            st.session_state.current_doc = entry
+            st.session_state.loaded_job = job_id
         st.sidebar.success(f"Uploaded: {fname}")
-
-        
-        with st.spinner("Processing (translate & simplify using TinyLlama via Ollama)... this may take a while"):
-            translated, simplified = process_document_text(full_text)
-            clauses = extract_clause_headings(full_text)
-            glossary = extract_glossary_terms(full_text, top_n=12)
-            metrics = compute_readability_metrics(simplified or translated or full_text)
-
-        # save history entry
-        entry = {
-            "name": fname,
-            "uploaded_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "original": full_text,
-            "translated": translated,
-            "simplified": simplified,
-            "clauses": clauses,
-            "glossary": glossary,
-            "metrics": metrics
-        }
-        st.session_state.history.append(entry)
-        st.session_state.current_doc = entry
-    except Exception as e:
-        st.sidebar.error("Could not read file: " + str(e))
+    elif job.status == FAILED:
+        st.sidebar.error("Could not process file: " + str(job.error))
+        if st.sidebar.button("Retry (continues from the last finished chunk)"):
+            jobs.submit(DOCUMENT_JOB, job_id, job.params, retry=True)
+            st.rerun()
+    else:
+        pending_job = job
 
 
 if "current_doc" in st.session_state and st.session_state.current_doc:
@@ -297,29 +349,24 @@ if "current_doc" in st.session_state and st.session_state.current_doc:
         if not (doc.get('simplified') or doc.get('translated') or doc.get('original')):
             st.error("No processed document to answer from. Upload first.")
         else:
-            # retrieval: match sentences from simplified + translated
-            corpus = (doc.get('simplified','') + "\n\n" + doc.get('translated','') + "\n\n" + doc.get('original',''))
-            sents = simple_sent_tokenize(corpus)
-            # find best matches by token overlap
-            q_tokens = set(simple_word_tokenize(q))
-            scored = []
-            for s in sents:
-                s_tokens = set(simple_word_tokenize(s))
-                if not s_tokens: continue
-                score = len(q_tokens.intersection(s_tokens)) / max(1,len(q_tokens))
-                scored.append((score,s))
-            scored_sorted = sorted(scored, key=lambda x:x[0], reverse=True)
-            top_text = " ".join([s for sc,s in scored_sorted[:6] if sc>0])
+            # retrieval: BM25 over the sentence index built at upload time
+            if "sentence_index" not in doc:
+                doc["sentence_index"] = build_sentence_index(doc.get('simplified'), doc.get('translated'), doc.get('original'))
+            sindex = doc["sentence_index"]
+            with span("retrieve"):
+                top_text = pipeline.search(sindex, q, k=6)
             if top_text:
                 # give model prompt to produce concise answer based on retrieved text
-                prompt = f"Answer the question concisely (1-3 sentences) using ONLY the context below. If uncertain, say 'Not mentioned'.\n\nContext:\n{top_text}\n\nQuestion: {q}\nAnswer:"
-                ans = call_ollama(prompt)
+                prompt = pipeline.answer_prompt(top_text, q)
+                with span("answer"):
+                    ans = call_ollama(prompt, cache=use_llm_cache)
                 if not ans:
                     ans = top_text[:800] or "No answer found."
             else:
                 # fallback ask full simplified doc
                 prompt = f"Based on the simplified text below, answer briefly:\n\n{doc.get('simplified')}\n\nQuestion: {q}\nAnswer:"
-                ans = call_ollama(prompt) or "No answer found."
+                with span("answer"):
+                    ans = call_ollama(prompt, cache=use_llm_cache) or "No answer found."
             st.markdown("**Answer:**")
             st.write(ans)
             # save QA to history record
@@ -338,7 +385,20 @@ else:
 st.sidebar.markdown("---")
 st.sidebar.markdown("**Settings**")
 st.sidebar.write(f"Model: {DEFAULT_MODEL}")
-st.sidebar.write(f"Ollama API: {OLLAMA_API_URL}")
+st.sidebar.write(f"Ollama API: {client.base_url}/api/generate")
+st.sidebar.write("Response cache:", client.cache.stats())
+with st.sidebar.expander("Startup: lazy imports"):
+    for name, seconds in import_report():
+        st.write(f"{name}: {seconds:.2f}s")
+with st.sidebar.expander("Ollama queue"):
+    queue_stats()
+with st.sidebar.expander("Diagnostics"):
+    diagnostics_panel()
 
 st.sidebar.markdown("---")
 st.sidebar.caption("Built with local TinyLlama via Ollama. Inspired by Clause_Ease project.")
+
+# Keep polling a running upload; the page above stays usable in the meantime
+if pending_job is not None:
+    poll_job(pending_job, f"Processing {pending_job.params['name']} (translate & simplify using TinyLlama)",
+             container=st.sidebar)
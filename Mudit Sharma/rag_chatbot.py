@@ -1,99 +1,153 @@
 # simple_chat.py - EMERGENCY DIRECT RAG CHATBOT (FIXED UI)
 
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for the shared clauseease package
+
 import streamlit as st
 import os
-import tempfile
-import chromadb
-from chromadb.utils import embedding_functions
-from pypdf import PdfReader
-import ollama
+
+from clauseease.bm25 import BM25Index
+from clauseease.concurrency import default_parallelism
+from clauseease.embedding_cache import embed_with_cache, get_embedding_cache
+from clauseease.jobs import DONE, FAILED, get_job_queue, stash_upload
+from clauseease.lazy import import_report, load
+from clauseease.ollama_client import OllamaError, get_client
+from clauseease.pipelines import RagPipeline
+from clauseease.retrieval import sync_sparse_index
+from clauseease.tracing import span
+from clauseease.ui import diagnostics_panel, poll_job, queue_stats, tag_session
+from clauseease.vector_index import DocumentIndex, document_lock
 
 # --- CONFIGURATION ---
 MODEL_NAME = "llama3:latest"
 EMBEDDING_MODEL = "nomic-embed-text" # Falls back if not found
+EMBED_PARALLEL = default_parallelism()   # batches in flight at once
+MAX_TOP_K = RagPipeline.max_top_k   # most chunks one question can pull into the prompt
 
-# Initialize ChromaDB (Vector Store)
+# ChromaDB (Vector Store) lives here; the client is opened by get_chroma_client()
 DB_PATH = "./chroma_db_data"
-client = chromadb.PersistentClient(path=DB_PATH)
+llm = get_client()
+embedding_cache = get_embedding_cache()   # (model, chunk hash) -> vector, shared by all documents
 
 # --------------------------------------------------------
 # HELPER FUNCTIONS
 # --------------------------------------------------------
 
-def get_ollama_embedding(text):
-    """Generate embedding using Ollama."""
+@st.cache_resource(show_spinner=False)
+def get_chroma_client():
+    """One PersistentClient per process. chromadb is imported here, on the first
+    run that needs it, instead of when the script loads."""
+    chromadb = load("chromadb")
+    return chromadb.PersistentClient(path=DB_PATH)
+
+@st.cache_resource(show_spinner=False)
+def resolve_embedding_model():
+    """EMBEDDING_MODEL if it is pulled, otherwise MODEL_NAME.
+    Decided once per process, so one collection never mixes vector sizes."""
     try:
-        response = ollama.embeddings(model=EMBEDDING_MODEL, prompt=text)
-        return response["embedding"]
-    except:
-        response = ollama.embeddings(model=MODEL_NAME, prompt=text)
-        return response["embedding"]
-
-def extract_text_from_pdf(uploaded_file):
-    pdf = PdfReader(uploaded_file)
-    text = ""
-    for page in pdf.pages:
-        text += page.extract_text()
-    return text
-
-def chunk_text(text, chunk_size=1000, overlap=100):
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start = end - overlap
-    return chunks
-
-def process_and_store_document(uploaded_file):
-    text = extract_text_from_pdf(uploaded_file)
-    chunks = chunk_text(text)
-    
-    try:
-        client.delete_collection(name="rag_demo")
-    except:
-        pass
-    collection = client.create_collection(name="rag_demo")
-    
-    ids = [str(i) for i in range(len(chunks))]
-    embeddings = []
-    
-    # Simple progress bar
-    progress_bar = st.progress(0)
-    for i, chunk in enumerate(chunks):
-        emb = get_ollama_embedding(chunk)
-        embeddings.append(emb)
-        progress_bar.progress((i + 1) / len(chunks))
-    progress_bar.empty() # Remove bar after done
-        
-    collection.add(documents=chunks, embeddings=embeddings, ids=ids)
-    return collection
+        llm.embed(["ping"], model=EMBEDDING_MODEL)
+        return EMBEDDING_MODEL
+    except OllamaError as e:
+        if e.status in (400, 404):   # model missing or cannot embed
+            return MODEL_NAME
+        raise
+
+@st.cache_resource(show_spinner=False)
+def load_sparse_index(collection_name):
+    """BM25 index kept next to the Chroma collection, shared by all sessions."""
+    path = os.path.join(DB_PATH, f"bm25_{collection_name}.json")
+    bm25 = BM25Index.load(path)
+    if sync_sparse_index(index, bm25):   # documents indexed before the BM25 file existed
+        bm25.save(path)
+    return bm25, path
 
-def query_rag(collection, question):
-    question_embedding = get_ollama_embedding(question)
-    results = collection.query(query_embeddings=[question_embedding], n_results=3)
-    context_text = "\n\n".join(results['documents'][0])
-    
-    prompt = f"""
-    You are a helpful assistant. Answer the question based ONLY on the following context.
-    If the answer is not in the context, say you don't know.
+def get_ollama_embedding(text):
+    """Generate embedding using Ollama (cached per chunk)."""
+    return get_ollama_embeddings([text])[0]
 
-    Context:
-    {context_text}
+def get_ollama_embeddings(texts):
+    """Embed a batch of texts: cached vectors first, one request for the rest."""
+    return embed_with_cache(llm, embedding_cache, texts, embedding_model)
 
-    Question: 
-    {question}
-    """
-    response = ollama.chat(model=MODEL_NAME, messages=[{'role': 'user', 'content': prompt}])
-    return response['message']['content']
+INDEX_JOB = "rag_index"
+
+def index_document_job(job):
+    """Embed and store one stashed PDF in a worker thread. Chunks already in Chroma
+    from an interrupted run are the checkpoints: only the missing ones are embedded.
+    Returns {"doc_id": ..., "new": ...}."""
+    doc_id, name = job.params["doc_id"], job.params["name"]
+    
+    # Another session may be indexing the same file; wait for it instead of repeating the work
+    with document_lock(doc_id):
+        if index.is_indexed(doc_id):
+            return {"doc_id": doc_id, "new": False}
+        
+        # The calibrated ratio drifts as questions are answered, so the chunk size is
+        # fixed on the first run (step -1): a retry re-creates exactly the chunks,
+        # and chunk ids, that are already in Chroma
+        chunk_size = job.checkpoints().get(-1)
+        if chunk_size is None:
+            chunk_size = pipeline.chunk_size()
+            job.checkpoint(-1, chunk_size)
+        with span("extract_chunk", file=name):
+            # Character chunks built page by page, without joining the whole PDF first
+            chunks = pipeline.chunk_pdf(job.params["path"], chunk_size)
+        # Only chunks missing from an earlier, interrupted upload are embedded
+        todo = index.missing_chunks(doc_id, len(chunks))
+        
+        # Embed several batches at once and write each one to Chroma as it finishes
+        done = len(chunks) - len(todo)
+        job.progress(done, len(chunks), "embedding chunks")
+
+        def stored(n):
+            nonlocal done
+            done += n
+            job.progress(done, len(chunks), "embedding chunks")
+
+        with span("embed_store", chunks=len(todo)):
+            first_error = pipeline.store_chunks(index, doc_id, name, chunks, todo, get_ollama_embeddings,
+                                                EMBED_PARALLEL, on_stored=stored)
+        
+        if first_error is None:
+            with span("sparse_index"):
+                pipeline.add_sparse(bm25, index, doc_id, chunks)
+                bm25.save(bm25_path)
+    
+    if first_error is not None:
+        raise first_error
+    return {"doc_id": doc_id, "new": True}
+
+def query_rag(doc_ids, question, k=3, sparse_weight=0.5):
+    retriever = pipeline.retriever(index, bm25, get_ollama_embedding, sparse_weight=sparse_weight)
+    with span("retrieve", k=k):
+        hits = retriever.retrieve(question, k=k, doc_ids=doc_ids)
+    context_text = "\n\n".join(text for chunk_id, text, meta in hits)
+    
+    prompt = pipeline.prompt(context_text, question)
+    with span("answer"):
+        response = llm.chat([{'role': 'user', 'content': prompt}], model=MODEL_NAME,
+                            options={"num_ctx": pipeline.num_ctx})
+    return response.text
 
 # --------------------------------------------------------
 # MAIN UI
 # --------------------------------------------------------
 
 st.set_page_config(page_title="Chatbot")
+tag_session()   # questions from this session take turns with other sessions' in the Ollama queue
 st.title("ClauseEase AI Chatbot")
 
+try:
+    embedding_model = resolve_embedding_model()
+except OllamaError as e:
+    st.error(f"Ollama not reachable — {e}")
+    st.stop()
+pipeline = RagPipeline(MODEL_NAME, embedding_model)
+# all uploaded documents, one namespace per content hash, one collection per embedding model
+index = DocumentIndex(get_chroma_client(), embedding_model)
+bm25, bm25_path = load_sparse_index(index.collection.name)
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -105,20 +159,62 @@ with st.sidebar:
         st.session_state.messages = []
         st.rerun()
 
+# Indexing runs as a background job: the chat stays usable, and a job cut off by a
+# server restart is picked up again once, by the first run of the new process
+jobs = get_job_queue()
+jobs.register(INDEX_JOB, index_document_job)
+
+@st.cache_resource(show_spinner=False)
+def resume_index_jobs():
+    return jobs.resume(INDEX_JOB)
+
+resume_index_jobs()
+
 # Processing Logic
-collection = None
+pending_job = None
 if uploaded_file:
-    if "current_file" not in st.session_state or st.session_state.current_file != uploaded_file.name:
-        with st.spinner("Processing PDF... (This runs once)"):
-            collection = process_and_store_document(uploaded_file)
-            st.session_state.current_file = uploaded_file.name
-            st.success("PDF Processed! Ready to chat.")
-    
-    # Get the collection reference
-    try:
-        collection = client.get_collection(name="rag_demo")
-    except:
-        pass
+    file_key = (uploaded_file.name, uploaded_file.size)
+    if st.session_state.get("current_file") != file_key:
+        path, digest = stash_upload(uploaded_file.getvalue(), uploaded_file.name)
+        doc_id = digest[:32]
+        job = jobs.submit(INDEX_JOB, f"{doc_id}:{index.collection.name}",
+                          {"path": path, "name": uploaded_file.name, "doc_id": doc_id})
+        if job.status == DONE:
+            st.session_state.current_file = file_key
+            st.session_state.current_doc = doc_id
+            if job.result["new"]:
+                st.success("PDF Processed! Ready to chat.")
+            else:
+                st.success("PDF already indexed. Ready to chat.")
+        elif job.status == FAILED:
+            st.error(f"Indexing failed: {job.error}")
+            if st.button("Retry indexing"):
+                jobs.submit(INDEX_JOB, job.id, job.params, retry=True)
+                st.rerun()
+        else:
+            pending_job = job
+
+# Pick which indexed documents the questions should search
+indexed_docs = index.documents()
+with st.sidebar:
+    st.header("Documents")
+    current = st.session_state.get("current_doc")
+    selected_docs = st.multiselect(
+        "Search in",
+        options=list(indexed_docs),
+        default=[current] if current in indexed_docs else [],
+        format_func=lambda d: indexed_docs[d],
+    )
+    top_k = st.slider("Chunks to retrieve", 1, MAX_TOP_K, 3)
+    keyword_weight = st.slider("Keyword vs. semantic weight", 0.0, 1.0, 0.5, 0.1,
+                               help="0 = embeddings only, 1 = BM25 keywords only (no embedding call)")
+    with st.expander("Startup: lazy imports"):
+        for name, seconds in import_report():
+            st.write(f"{name}: {seconds:.2f}s")
+    with st.expander("Ollama queue"):
+        queue_stats()
+    with st.expander("Diagnostics"):
+        diagnostics_panel()
 
 # Chat UI - Always show history
 for msg in st.session_state.messages:
@@ -127,9 +223,9 @@ for msg in st.session_state.messages:
 
 # INPUT BAR IS NOW OUTSIDE THE IF BLOCK
 if prompt := st.chat_input("Ask about the PDF..."):
-    if not uploaded_file:
-        st.error("⚠️ Please upload a PDF first to ask questions!")
-    elif collection:
+    if not selected_docs:
+        st.error("⚠️ Please upload a PDF (or pick an indexed one) first to ask questions!")
+    else:
         # Show User Message
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
@@ -138,6 +234,11 @@ if prompt := st.chat_input("Ask about the PDF..."):
         # Generate Answer
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
-                answer = query_rag(collection, prompt)
+                answer = query_rag(selected_docs, prompt, k=top_k, sparse_weight=keyword_weight)
                 st.markdown(answer)
-                st.session_state.messages.append({"role": "assistant", "content": answer})
\ No newline at end of file
+                st.session_state.messages.append({"role": "assistant", "content": answer})
+
+# Keep polling a running upload; the chat above stays usable in the meantime
+if pending_job is not None:
+    with st.sidebar:
+        poll_job(pending_job, "Processing PDF")
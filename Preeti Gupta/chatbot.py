@@ -1,13 +1,23 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for the shared clauseease package
+
 import streamlit as st
-import requests
 import json
-import PyPDF2
-import docx
 from pathlib import Path
 import re
 from datetime import datetime
 import time
 
+from clauseease.chunking import WORD_RE, ChunkView
+from clauseease.ollama_client import OllamaError, get_client
+from clauseease.pipelines import PreetiPipeline
+from clauseease.tracing import span
+from clauseease.ui import diagnostics_panel, stream_markdown, tag_session, timing_caption
+
+client = get_client()
+pipeline = PreetiPipeline()   # extraction, chunking, context selection and prompts (shared with the benchmark)
+
 # Page configuration
 st.set_page_config(
     page_title="AI Document Intelligence System",
@@ -20,6 +30,7 @@ st.set_page_config(
         'About': "# AI Document Intelligence System\nAdvanced document processing with AI-powered analysis."
     }
 )
+tag_session()
 
 # Custom CSS for beautiful UI
 st.markdown("""
@@ -161,12 +172,7 @@ st.markdown("""
 def extract_text_from_pdf(file):
     """Extract text from PDF file with error handling"""
     try:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page_num, page in enumerate(pdf_reader.pages):
-            text += f"\n--- Page {page_num + 1} ---\n"
-            text += page.extract_text()
-        return text
+        return pipeline.extract_pdf(file)
     except Exception as e:
         st.error(f"Error extracting PDF: {str(e)}")
         return None
@@ -174,11 +180,7 @@ def extract_text_from_pdf(file):
 def extract_text_from_docx(file):
     """Extract text from DOCX file"""
     try:
-        doc = docx.Document(file)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return pipeline.extract_docx(file)
     except Exception as e:
         st.error(f"Error extracting DOCX: {str(e)}")
         return None
@@ -206,20 +208,8 @@ def extract_document(file):
         return None
 
 def chunk_text(text, chunk_size=500, overlap=50):
-    """Split text into chunks with overlap"""
-    words = text.split()
-    chunks = []
-    
-    i = 0
-    while i < len(words):
-        chunk_words = words[i:i + chunk_size]
-        chunk = ' '.join(chunk_words)
-        chunks.append(chunk)
-        i += chunk_size - overlap
-        if i >= len(words):
-            break
-    
-    return chunks
+    """Split text into overlapping word chunks, as (start, end) spans into text"""
+    return pipeline.chunk(text, chunk_size, overlap)
 
 def analyze_document(text):
     """Analyze document and extract statistics"""
@@ -237,7 +227,8 @@ def analyze_document(text):
     }
 
 def create_document_json(filename, text, chunks, analysis):
-    """Create comprehensive JSON structure for the document"""
+    """Create comprehensive JSON structure for the document.
+    Chunks are stored as offsets into full_text; chunk_texts() slices them when needed."""
     doc_json = {
         "filename": filename,
         "upload_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -252,11 +243,12 @@ def create_document_json(filename, text, chunks, analysis):
         "chunks": [
             {
                 "chunk_id": i,
-                "text": chunk,
-                "word_count": len(chunk.split()),
-                "char_count": len(chunk)
+                "start": span.start,
+                "end": span.end,
+                "word_count": sum(1 for _ in WORD_RE.finditer(text, span.start, span.end)),
+                "char_count": len(span)
             }
-            for i, chunk in enumerate(chunks)
+            for i, span in enumerate(chunks)
         ]
     }
     return doc_json
@@ -264,33 +256,33 @@ def create_document_json(filename, text, chunks, analysis):
 def get_available_models():
     """Get list of available Ollama models"""
     try:
-        response = requests.get('http://localhost:11434/api/tags', timeout=5)
-        if response.status_code == 200:
-            models = response.json().get('models', [])
-            return [model['name'] for model in models]
-        return []
-    except Exception as e:
+        return client.tags(timeout=5)
+    except OllamaError:
         return []
 
 def query_ollama(prompt, model="llama3.2"):
     """Send query to Ollama API with streaming support"""
     try:
-        response = requests.post(
-            'http://localhost:11434/api/generate',
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=120
-        )
-        
-        if response.status_code == 200:
-            return response.json()['response']
-        else:
-            return f"❌ Error: {response.status_code} - {response.text}"
-    except Exception as e:
-        return f"❌ Error connecting to Ollama: {str(e)}"
+        return client.generate(prompt, model=model, timeout=120).text
+    except OllamaError as e:
+        return f"❌ {e}"
+
+def chunk_texts(doc):
+    """The document's chunk strings, sliced from full_text on access"""
+    return ChunkView(doc['full_text'], [(chunk['start'], chunk['end']) for chunk in doc['chunks']])
+
+def get_chunk_index(doc):
+    """BM25 index over the document's chunks, built once per document"""
+    key = (doc['filename'], doc['upload_time'])
+    if st.session_state.get('chunk_index_key') != key:
+        st.session_state.chunk_index = pipeline.chunk_index(
+            [chunk['chunk_id'] for chunk in doc['chunks']], chunk_texts(doc))
+        st.session_state.chunk_index_key = key
+    return st.session_state.chunk_index
+
+def format_chunk(chunk, text):
+    """Chunk block as it appears in the prompt"""
+    return pipeline.format_chunk(chunk['chunk_id'], chunk['word_count'], text)
 
 def export_chat_history(chat_history):
     """Export chat history as JSON"""
@@ -351,6 +343,13 @@ with st.sidebar:
     chunk_size = st.slider("Chunk Size (words)", 100, 2000, 500, 50)
     overlap = st.slider("Overlap (words)", 0, 300, 50, 10)
     
+    # Prompt size: only the most relevant chunks that fit are sent to the model
+    num_ctx = pipeline.num_ctx(model_name)
+    context_budget = st.slider(
+        "Document context (tokens)", 256, num_ctx, pipeline.context_budget(model_name), 128,
+        help=f"{model_name} runs with a {num_ctx}-token window; the rest is left for the question and answer"
+    )
+    
     st.markdown("---")
     
     # Advanced features
@@ -391,6 +390,9 @@ with st.sidebar:
                 "application/json",
                 use_container_width=True
             )
+    
+    with st.expander("🩺 Diagnostics"):
+        diagnostics_panel()
 
 # Initialize session state
 if 'document_json' not in st.session_state:
@@ -409,20 +411,25 @@ if uploaded_file and st.session_state.document_json is None:
         
         # Extract text
         progress_bar.progress(25)
-        extracted_text = extract_document(uploaded_file)
+        with span("extract", file=uploaded_file.name):
+            extracted_text = extract_document(uploaded_file)
         
         if extracted_text:
             # Analyze document
             progress_bar.progress(50)
-            analysis = analyze_document(extracted_text)
+            with span("analyze"):
+                analysis = analyze_document(extracted_text)
             
             # Create chunks
             progress_bar.progress(75)
-            chunks = chunk_text(extracted_text, chunk_size, overlap)
+            with span("chunk"):
+                chunks = chunk_text(extracted_text, chunk_size, overlap)
             
             # Create JSON structure
             doc_json = create_document_json(uploaded_file.name, extracted_text, chunks, analysis)
             st.session_state.document_json = doc_json
+            with span("index", chunks=len(chunks)):
+                get_chunk_index(doc_json)
             st.session_state.processing_time = time.time() - start_time
             
             progress_bar.progress(100)
@@ -488,9 +495,9 @@ if st.session_state.document_json:
     # Show chunks
     if show_chunks:
         with st.expander("🧩 Document Chunks", expanded=False):
-            for chunk in doc['chunks'][:5]:
+            for chunk, text in zip(doc['chunks'][:5], chunk_texts(doc)):
                 st.markdown(f"**Chunk {chunk['chunk_id']}** ({chunk['word_count']} words)")
-                st.text_area("", chunk['text'], height=100, key=f"chunk_{chunk['chunk_id']}")
+                st.text_area("", text, height=100, key=f"chunk_{chunk['chunk_id']}")
     
     # Show JSON
     if show_json:
@@ -506,14 +513,15 @@ Document: {doc['filename']}
 Word Count: {doc['analysis']['word_count']}
 
 Content Preview:
-{doc['chunks'][0]['text'][:1000]}...
+{doc['full_text'][:1000]}...
 
 Provide:
 1. Main topic/theme
 2. Key points (3-5 bullet points)
 3. Overall summary (2-3 sentences)"""
             
-            summary = query_ollama(summary_prompt, model_name)
+            with span("summarize"):
+                summary = query_ollama(summary_prompt, model_name)
             st.session_state.chat_history.append({
                 "role": "assistant",
                 "content": f"📝 **Auto-Generated Summary**\n\n{summary}"
@@ -572,6 +580,7 @@ if user_question:
         st.markdown(user_question)
     
     # Prepare prompt
+    context_note = None
     if st.session_state.document_json:
         doc = st.session_state.document_json
         
@@ -586,7 +595,7 @@ if user_question:
 📄 **Document:** {doc['filename']}
 
 **Full Content of Chunk {chunk_num}:**
-{doc['chunks'][chunk_num]['text']}
+{chunk_texts(doc)[chunk_num]}
 
 **Chunk Statistics:**
 - Word Count: {doc['chunks'][chunk_num]['word_count']}
@@ -595,50 +604,40 @@ if user_question:
             else:
                 doc_context = f"⚠️ Chunk {chunk_num} does not exist. Document has {len(doc['chunks'])} chunks (0-{len(doc['chunks'])-1})."
         else:
-            # General document question - include all chunks
-            doc_context = f"""
-📄 **Document Context Available:**
-- Filename: {doc['filename']}
-- Total Words: {doc['analysis']['word_count']:,}
-- Total Chunks: {doc['metadata']['total_chunks']}
-
-**All Document Chunks (Full Content):**
-"""
-            for chunk in doc['chunks']:
-                doc_context += f"\n\n{'='*50}\n**[Chunk {chunk['chunk_id']}]** ({chunk['word_count']} words)\n{'='*50}\n{chunk['text']}\n"
+            # General document question - include the most relevant chunks that fit the token budget
+            texts = chunk_texts(doc)
+            with span("retrieve"):
+                chunk_ids, used_tokens = pipeline.select_chunks(user_question, texts, get_chunk_index(doc),
+                                                                context_budget)
+            doc_context = pipeline.document_context(doc['filename'], doc['analysis']['word_count'],
+                                                    chunk_ids, texts,
+                                                    [chunk['word_count'] for chunk in doc['chunks']])
+            context_note = f"📏 Context: ~{used_tokens:,} / {context_budget:,} tokens from {len(chunk_ids)} of {len(texts)} chunks"
         
-        prompt = f"""{doc_context}
-
-**User Question:** {user_question}
-
-**Instructions:**
-- Provide complete, detailed information from the document
-- List ALL items, courses, or options mentioned
-- Use bullet points for clarity
-- Include all relevant details (codes, names, requirements)
-- If asking about a specific chunk, provide ALL content from that chunk
-- Be thorough and comprehensive
-- Don't truncate or summarize unless asked
-
-**Answer:**"""
+        prompt = pipeline.document_prompt(doc_context, user_question)
     else:
-        prompt = f"""**User Question:** {user_question}
-
-**Instructions:**
-- Provide clear, comprehensive answers
-- Support multiple languages
-- Be helpful and informative
-
-**Answer:**"""
+        prompt = pipeline.general_prompt(user_question)
     
-    # Get response
+    # Get response (streamed token by token)
+    ttft = None
     with st.chat_message("assistant"):
-        with st.spinner("🤔 Thinking..."):
-            response = query_ollama(prompt, model_name)
-            st.markdown(response)
+        placeholder = st.empty()
+        placeholder.markdown("🤔 Thinking...")
+        try:
+            with span("answer"):
+                stream = client.generate_stream(prompt, model=model_name, timeout=120,
+                                                options={"num_ctx": num_ctx})
+                response = stream_markdown(placeholder, stream)
+            ttft = stream.response.ttft
+            st.caption(timing_caption(stream.response))
+            if context_note:
+                st.caption(f"{context_note} · whole prompt {stream.response.prompt_tokens:,} tokens (measured)")
+        except OllamaError as e:
+            response = f"❌ {e}"
+            placeholder.markdown(response)
     
     # Add assistant response
-    st.session_state.chat_history.append({"role": "assistant", "content": response})
+    st.session_state.chat_history.append({"role": "assistant", "content": response, "ttft": ttft})
 
 # Footer with info
 st.markdown("---")
@@ -677,4 +676,4 @@ with col3:
     </div>
     """, unsafe_allow_html=True)
 
-st.markdown("**🔗 Status:** Ollama running on `http://localhost:11434`")
\ No newline at end of file
+st.markdown(f"**🔗 Status:** Ollama running on `{client.base_url}`")
\ No newline at end of file
@@ -1,21 +1,29 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for the shared clauseease package
+
 import streamlit as st
 import time
-import json
-import requests
-import docx
-import PyPDF2
+
+from clauseease.ollama_client import OllamaError, get_client
+from clauseease.pipelines import ShamruthaPipeline
+from clauseease.tracing import span
+from clauseease.ui import diagnostics_panel, stream_markdown, tag_session, timing_caption
 
 # -------------------------------
 # CONFIG
 # -------------------------------
 
 MODEL_NAME = "tinyllama"   # Change if needed ("phi3", "llama3:instruct", etc.)
+client = get_client()
+pipeline = ShamruthaPipeline(MODEL_NAME)   # chunking, retrieval and prompt (shared with the benchmark)
 
 st.set_page_config(
     page_title="Contract Language Simplifier",
     page_icon="💬",
     layout="wide"
 )
+tag_session()
 
 st.markdown("<h1 style='text-align: center;'>Chatbot</h1>", unsafe_allow_html=True)
 
@@ -65,72 +73,39 @@ def extract_text_from_file(uploaded_file):
 
     # PDF
     if file_type == "application/pdf":
-        reader = PyPDF2.PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
+        return pipeline.extract_pdf(uploaded_file)
 
     # DOCX
     if file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        doc = docx.Document(uploaded_file)
-        return "\n".join([p.text for p in doc.paragraphs])
+        return pipeline.extract_docx(uploaded_file)
 
     return None
 
 
 # Chunk text
 def chunk_text(text, max_chars=1000):
-    chunks = []
-    current = ""
-
-    for para in text.split("\n"):
-        if len(current) + len(para) < max_chars:
-            current += para + "\n"
-        else:
-            chunks.append(current.strip())
-            current = para
-
-    if current:
-        chunks.append(current.strip())
-
-    return chunks
-
-
-# Simple keyword-based retrieval
-def get_relevant_chunks(query, chunks, top_k=3):
-    scored = []
-    q = query.lower()
+    # Whole paragraphs packed up to max_chars; longer paragraphs are split, never dropped
+    return pipeline.chunk(text, max_chars)
 
-    for chunk in chunks:
-        score = chunk.lower().count(q)
-        scored.append((score, chunk))
 
-    scored.sort(reverse=True, key=lambda x: x[0])
+# TF-IDF retrieval (the retriever is built once, when the file is uploaded)
+def get_relevant_chunks(query, chunks, retriever, top_k=3):
+    # Nothing in common with the query: the opening chunks are used instead
+    return pipeline.relevant_chunks(query, chunks, retriever, top_k)
 
-    return [c for _, c in scored[:top_k]]
 
+# Query Ollama, rendering the answer into the placeholder as it streams in.
+# Returns (reply, timing caption).
+def query_ollama(prompt, context_text, placeholder):
+    final_prompt = pipeline.prompt(prompt, context_text)
 
-# Query Ollama
-def query_ollama(prompt, context_text):
-    url = "http://localhost:11434/api/generate"
-
-    final_prompt = f"Context:\n{context_text}\n\nUser Query:\n{prompt}\n\nAnswer based only on the context above."
-
-    data = {"model": MODEL_NAME, "prompt": final_prompt}
-
-    response = requests.post(url, json=data, stream=True)
-    full = ""
-
-    for line in response.iter_lines():
-        if line:
-            try:
-                decoded = json.loads(line.decode())
-                full += decoded.get("response", "")
-            except:
-                pass
-
-    return full
+    try:
+        stream = client.generate_stream(final_prompt, model=MODEL_NAME)
+        full = stream_markdown(placeholder, stream)
+        return full, timing_caption(stream.response)
+    except OllamaError as e:
+        placeholder.markdown(f"❌ {e}")
+        return f"❌ {e}", None
 
 
 # -------------------------------
@@ -170,6 +145,9 @@ with st.sidebar:
                 st.session_state.current_chat_id = cid
                 st.rerun()
 
+    with st.expander("Diagnostics"):
+        diagnostics_panel()
+
 
 # -------------------------------
 # MAIN CHAT AREA
@@ -194,15 +172,20 @@ else:
 
         if st.session_state.last_processed_file.get(cid) != fid:
 
-            extracted_text = extract_text_from_file(uploaded_file)
+            with span("extract", file=uploaded_file.name):
+                extracted_text = extract_text_from_file(uploaded_file)
 
             if extracted_text:
-                chunks = chunk_text(extracted_text)
+                with span("chunk"):
+                    chunks = chunk_text(extracted_text)
+                with span("index", chunks=len(chunks)):
+                    retriever = pipeline.retriever(chunks)
 
                 st.session_state.file_data = {
                     "file_name": uploaded_file.name,
                     "text": extracted_text,
                     "chunks": chunks,
+                    "retriever": retriever,
                 }
 
                 messages.append({
@@ -232,6 +215,8 @@ else:
         avatar = "🧑‍💻" if msg["role"] == "user" else "🤖"
         with st.chat_message(msg["role"], avatar=avatar):
             st.markdown(msg["content"])
+            if msg.get("timing"):
+                st.caption(msg["timing"])
 
     # -------------------------------
     # USER INPUT
@@ -245,13 +230,15 @@ else:
 
             if st.session_state.file_data:
                 chunks = st.session_state.file_data["chunks"]
-                relevant = get_relevant_chunks(prompt, chunks)
+                retriever = st.session_state.file_data["retriever"]
+                with span("retrieve"):
+                    relevant = get_relevant_chunks(prompt, chunks, retriever)
                 context_text = "\n\n".join(relevant)
             else:
                 context_text = ""
 
-            reply = query_ollama(prompt, context_text)
-            placeholder.markdown(reply)
+            with span("answer"):
+                reply, timing = query_ollama(prompt, context_text, placeholder)
 
-        messages.append({"role": "assistant", "content": reply})
+        messages.append({"role": "assistant", "content": reply, "timing": timing})
         st.rerun()
@@ -1,15 +1,27 @@
 import streamlit as st
-import requests
-import json
-from PyPDF2 import PdfReader
+
+from clauseease.concurrency import default_parallelism, map_ordered
+from clauseease.ollama_client import OllamaError, get_client
+from clauseease.pipelines import ChatbotPipeline
+from clauseease.result_cache import content_hash, get_result_cache
+from clauseease.scheduler import BATCH, request_class
+from clauseease.summarize import MapReduceSummarizer
+from clauseease.tracing import span
+from clauseease.ui import diagnostics_panel, stream_markdown, tag_session, timing_caption
 
 # -------------------------
 # CONFIG
 # -------------------------
 st.set_page_config(page_title="ChatBot", page_icon="💬", layout="wide")
+tag_session()   # this session's Ollama calls take turns with other sessions'
 
 MODEL_NAME = "tinyllama"   # Use small model for 8GB RAM
-OLLAMA_URL = "http://localhost:11434"
+pipeline = ChatbotPipeline(MODEL_NAME)   # extraction, chunking and prompts (shared with the benchmark)
+NUM_CTX = pipeline.num_ctx
+CHUNK_TOKENS = pipeline.chunk_tokens   # half the window; the rest holds the prompt and summary
+OPTIONS = pipeline.options
+client = get_client()      # shared keep-alive pool (OLLAMA_HOST overrides the URL)
+results = get_result_cache("chatbot")   # per-PDF text, chunks and summary
 
 
 # -------------------------
@@ -17,44 +29,28 @@ OLLAMA_URL = "http://localhost:11434"
 # -------------------------
 def check_ollama_alive():
     try:
-        r = requests.get(f"{OLLAMA_URL}/api/version", timeout=3)
-        if r.status_code == 200:
-            return True, r.json()
-        return False, f"HTTP {r.status_code}"
-    except Exception as e:
+        return True, client.version(timeout=3)
+    except OllamaError as e:
         return False, str(e)
 
 
-def ollama_query(prompt, model=MODEL_NAME):
+def ollama_query(prompt, model=MODEL_NAME, cache=False):
     try:
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False
-        }
-        r = requests.post(f"{OLLAMA_URL}/api/generate",
-                          json=payload, timeout=60)
+        return client.generate(prompt, model=model, options=OPTIONS, cache=cache).text.strip()
+    except OllamaError as e:
+        return f"❌ {e}"
 
-        if r.status_code != 200:
-            return f"❌ Ollama error: {r.text}"
 
-        return r.json().get("response", "").strip()
+def extract_pdf_text(uploaded_file):
+    return pipeline.extract(uploaded_file)
 
-    except Exception as e:
-        return f"❌ Connection error: {e}"
 
+def chunk_text(text, size=CHUNK_TOKENS):
+    return pipeline.chunk(text, size)
 
-def extract_pdf_text(uploaded_file):
-    reader = PdfReader(uploaded_file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
 
-
-def chunk_text(text, size=800):
-    words = text.split()
-    return [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+def summarize_chunk(chunk):
+    return ollama_query(pipeline.summary_prompt(chunk), cache=True)
 
 
 # -------------------------
@@ -84,6 +80,10 @@ with st.sidebar:
 
     uploaded_pdf = st.file_uploader("Upload PDF file", type=["pdf"])
 
+    # Keep this at or below the server's OLLAMA_NUM_PARALLEL
+    parallel_requests = st.slider("Parallel Ollama requests", 1, 16, default_parallelism())
+    condense_summary = st.checkbox("Condense long summaries (map-reduce)", value=True)
+
     st.write("---")
     st.subheader("📜 Chat History")
 
@@ -97,35 +97,78 @@ with st.sidebar:
 if uploaded_pdf:
     st.success("File uploaded successfully!")
 
+    # Everything below is keyed by the file content, so reruns (e.g. clicking
+    # "Send") reuse the cached results instead of re-summarizing the PDF.
+    doc_key = content_hash(uploaded_pdf.getvalue(), MODEL_NAME, str(CHUNK_TOKENS))
+    cached = results.get(doc_key) or {}
+
     # Extract text
-    with st.spinner("Extracting text from PDF..."):
-        text = extract_pdf_text(uploaded_pdf)
+    if "text" in cached:
+        text = cached["text"]
+    else:
+        with st.spinner("Extracting text from PDF..."), span("extract"):
+            text = extract_pdf_text(uploaded_pdf)
 
     st.markdown("### 📄 Extracted Text (Auto Language Detect)")
 
     st.write(text[:1000] + "...")   # Preview only
 
     # Chunking
-    chunks = chunk_text(text)
+    if "chunks" in cached:
+        chunks = cached["chunks"]
+    else:
+        with span("chunk"):
+            chunks = chunk_text(text)
+        cached = results.update(doc_key, text=text, chunks=chunks)
 
     st.markdown("### 🧩 Chunks")
     st.info(f"Total chunks: {len(chunks)} (hidden)")   # Only show count
 
     # Translate + Summarize
-    final_summary = ""
-
-    with st.spinner("Translating & Summarizing into English..."):
-        for chunk in chunks:
-            prompt = f"""
-            Translate the following text to English and summarize it clearly:
-
-            {chunk}
-            """
-            response = ollama_query(prompt)
-            final_summary += response + "\n\n"
-
-    # Save to history
-    st.session_state.history.append(f"Summary: {final_summary[:50]}")
+    if "final_summary" in cached:
+        final_summary = cached["final_summary"]
+        summaries = cached.get("chunk_summaries", [final_summary])
+        failed = False
+    else:
+        with st.spinner("Translating & Summarizing into English..."):
+            progress = st.progress(0.0)
+            # Chunks run concurrently; results come back in document order and
+            # one failed chunk does not abort the rest
+            # Batch priority: questions from any session go to Ollama first
+            with request_class(BATCH), span("summarize", chunks=len(chunks)):
+                summaries, errors = map_ordered(
+                    summarize_chunk, chunks, max_workers=parallel_requests,
+                    on_done=lambda done, total: progress.progress(done / total),
+                )
+            progress.empty()
+
+        summaries = [f"❌ {err}" if err else s for s, err in zip(summaries, errors)]
+        failed = any(s.startswith("❌") for s in summaries)
+        final_summary = "".join(s + "\n\n" for s in summaries)
+
+        # Only keep complete summaries, so a failed chunk is retried next time
+        if not failed:
+            cached = results.update(doc_key, final_summary=final_summary,
+                                    chunk_summaries=summaries)
+
+    # Reduce the per-chunk summaries level by level until they fit
+    if condense_summary and not failed and len(summaries) > 1:
+        if "reduced_summary" in cached:
+            final_summary = cached["reduced_summary"]
+        else:
+            summarizer = MapReduceSummarizer(client, MODEL_NAME, max_workers=parallel_requests,
+                                             options=OPTIONS)
+            with st.spinner("Condensing the summary..."), span("reduce"):
+                final_summary = summarizer.reduce(summaries)
+            # A failed reduce call leaves its input in place; keep that out of the
+            # cache so the next run asks Ollama again
+            if not summarizer.errors:
+                results.update(doc_key, reduced_summary=final_summary)
+
+    # Save to history (once per document, not on every rerun)
+    if st.session_state.get("summarized_doc") != doc_key:
+        st.session_state.summarized_doc = doc_key
+        st.session_state.history.append(f"Summary: {final_summary[:50]}")
 
     # Output summary
     st.markdown("## 📝 Summary in English")
@@ -140,7 +183,20 @@ user_input = st.text_input("Ask something about the PDF or anything:")
 
 if st.button("Send"):
     if user_input.strip():
-        response = ollama_query(user_input)
         st.session_state.history.append(f"Q: {user_input}")
         st.markdown("### 💬 ChatBot Reply")
-        st.write(response)  
\ No newline at end of file
+        placeholder = st.empty()
+        try:
+            # Stream tokens into the page as they arrive
+            with span("answer"):
+                stream = client.generate_stream(user_input, model=MODEL_NAME, options=OPTIONS)
+                stream_markdown(placeholder, stream)
+            st.session_state.last_ttft = stream.response.ttft
+            st.caption(timing_caption(stream.response))
+        except OllamaError as e:
+            placeholder.write(f"❌ {e}")
+
+# Where this session's time went: stages, tokens, cache hits, queue wait
+with st.sidebar.expander("Diagnostics"):
+    diagnostics_panel()
+  
\ No newline at end of file
@@ -0,0 +1,633 @@
+"""Offline benchmarks of every app's pipeline against the fake Ollama server.
+
+    python -m clauseease.benchmark                    # run and compare with benchmarks/baseline.json
+    python -m clauseease.benchmark --save-baseline    # record the current numbers as the baseline
+    python -m clauseease.benchmark --apps rag preeti --scenarios retrieval qa
+
+Each app is exercised through its clauseease.pipelines class, the same
+code its Streamlit script calls (extraction options, chunking strategy and
+sizes, retriever, prompts and model), on a generated corpus of synthetic
+contracts. The
+scenarios are ingestion, chunking, retrieval and end-to-end Q&A, plus
+summarize for the two apps that summarize whole documents. Latencies are per
+operation; Q&A runs `users` simulated users at once, each its own
+scheduler session.
+
+Baselines are machine-specific and are not committed: record one on the
+machine you compare on. A run is only compared with a baseline recorded with
+the same settings on the same kind of machine.
+"""
+import abc
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from clauseease.bm25 import BM25Index
+from clauseease.concurrency import default_parallelism, map_ordered
+from clauseease.embedding_cache import EmbeddingCache, embed_with_cache
+from clauseease.extraction import iter_pdf_pages, iter_text_lines
+from clauseease.fake_ollama import FakeOllama
+from clauseease.glossary import GlossaryBuilder
+from clauseease.lazy import load
+from clauseease.ollama_client import OllamaClient
+from clauseease.pipelines import ChatbotPipeline, KrushnaPipeline, PreetiPipeline, RagPipeline, ShamruthaPipeline
+from clauseease.result_cache import ResultCache
+from clauseease.scheduler import BATCH, INTERACTIVE, OllamaScheduler, request_class
+from clauseease.vector_index import DocumentIndex
+
+BASELINE_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "baseline.json"
+SCENARIOS = ("ingestion", "chunking", "retrieval", "summarize", "qa")
+THRESHOLD = 0.20           # relative change that counts as a regression
+NOISE_FLOOR_MS = 1.0       # latency changes smaller than this are timer noise, never regressions
+PDF_LINES = 48             # text lines per generated PDF page
+PDF_WIDTH = 95             # characters per generated PDF line
+
+# -------------------------
+# Synthetic contracts
+# -------------------------
+PARTIES = ("Acme Logistics Ltd.", "Borealis Software GmbH", "Cedar Health Partners LLP",
+           "Delta Retail Group Inc.", "Everline Energy S.A.", "Fjord Analytics AS")
+CLAUSES = {
+    "PAYMENT TERMS": (
+        "The Client shall pay each invoice within {days} days of receipt.",
+        "Late payments accrue interest at {rate}% per month until paid in full.",
+        "All fees are stated exclusive of VAT and other applicable taxes.",
+    ),
+    "TERMINATION": (
+        "Either party may terminate this Agreement on {days} days' written notice.",
+        "The Supplier may terminate immediately if the Client fails to pay an undisputed invoice.",
+        "Termination does not affect rights and obligations accrued before the termination date.",
+    ),
+    "CONFIDENTIALITY": (
+        "Each party shall keep the other party's Confidential Information secret for {years} years.",
+        "Confidential Information may be disclosed to professional advisers bound by similar duties.",
+    ),
+    "LIMITATION OF LIABILITY": (
+        "Neither party's total liability shall exceed the fees paid in the preceding {months} months.",
+        "Nothing in this Agreement limits liability for death, personal injury or fraud.",
+    ),
+    "INDEMNIFICATION": (
+        "The Supplier shall indemnify the Client against third-party claims of infringement.",
+        "The indemnified party shall notify the indemnifying party of any claim within {days} days.",
+    ),
+    "INTELLECTUAL PROPERTY": (
+        "All Intellectual Property Rights in the Deliverables vest in the Client upon payment.",
+        "The Supplier retains ownership of its pre-existing tools and know-how.",
+    ),
+    "GOVERNING LAW": (
+        "This Agreement is governed by the laws of {law}.",
+        "The courts of {law} have exclusive jurisdiction over any dispute.",
+    ),
+    "FORCE MAJEURE": (
+        "Neither party is liable for delay caused by events beyond its reasonable control.",
+        "If a force majeure event lasts more than {days} days, either party may terminate.",
+    ),
+    "DATA PROTECTION": (
+        "The Supplier shall process Personal Data only on documented instructions from the Client.",
+        "Personal Data breaches shall be reported within {hours} hours of discovery.",
+    ),
+    "WARRANTY": (
+        "The Supplier warrants that the Services will be performed with reasonable skill and care.",
+        "Defects notified within {days} days of delivery shall be remedied free of charge.",
+    ),
+    "ASSIGNMENT": (
+        "Neither party may assign this Agreement without the other party's prior written consent.",
+    ),
+    "NOTICES": (
+        "Notices shall be in writing and delivered by hand, courier or e-mail to the addresses above.",
+    ),
+}
+FILLER = (
+    "The parties shall cooperate in good faith to give effect to this clause.",
+    "Any amendment to this clause must be agreed in writing and signed by both parties.",
+    "References to the Services include any part of them delivered under a Statement of Work.",
+    "This obligation survives expiry or termination of the Agreement for {years} years.",
+    "Where the Client's requirements change, the Supplier shall provide a revised estimate.",
+)
+LAWS = ("England and Wales", "the State of New York", "Ireland", "Singapore", "Ontario")
+QUESTIONS = (
+    "What are the payment terms and when is an invoice due?",
+    "How can either party terminate the agreement?",
+    "Which law governs this agreement?",
+    "How long does the confidentiality obligation last?",
+    "What is the cap on liability?",
+    "Who owns the intellectual property in the deliverables?",
+    "What happens during a force majeure event?",
+    "How quickly must a data breach be reported?",
+    "Can the agreement be assigned to another company?",
+    "What warranty does the supplier give?",
+)
+
+
+def synthetic_contract(seed, sections=24):
+    """A contract with numbered, all-caps clause headings and filled-in terms."""
+    rng = random.Random(seed)
+    client, supplier = rng.sample(PARTIES, 2)
+    values = {"days": rng.choice((14, 30, 45, 60, 90)), "rate": rng.choice((1, 1.5, 2)),
+              "years": rng.choice((2, 3, 5)), "months": rng.choice((6, 12, 24)),
+              "hours": rng.choice((24, 48, 72)), "law": rng.choice(LAWS)}
+    lines = [f"MASTER SERVICES AGREEMENT No. {seed:04d}", "",
+             f"This Agreement is made between {client} (the \"Client\") and {supplier} "
+             f"(the \"Supplier\") on {rng.randint(1, 28)} March {rng.randint(2019, 2025)}.", ""]
+    headings = list(CLAUSES)
+    for n in range(1, sections + 1):
+        heading = headings[(n - 1) % len(headings)]
+        lines.append(f"{n}. {heading}")
+        sentences = list(CLAUSES[heading]) + rng.sample(FILLER, rng.randint(2, len(FILLER)))
+        for k, sentence in enumerate(sentences, 1):
+            lines.append(f"{n}.{k} " + sentence.format(**values))
+        lines.append("")
+    lines.append(f"Signed for and on behalf of {client} and {supplier}.")
+    return "\n".join(lines)
+
+
+def corpus(n_docs=6, sections=24, seed=0):
+    """[(file stem, text)] of synthetic contracts."""
+    return [(f"contract_{seed + i:03d}", synthetic_contract(seed + i, sections + 4 * i))
+            for i in range(n_docs)]
+
+
+def _pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(text, path, lines_per_page=PDF_LINES, width=PDF_WIDTH):
+    """Write text as a plain Helvetica PDF (no dependencies), wrapping long lines."""
+    wrapped = []
+    for line in text.encode("latin-1", "replace").decode("latin-1").split("\n"):
+        while len(line) > width:
+            cut = line.rfind(" ", 0, width)
+            cut = cut if cut > 0 else width
+            wrapped.append(line[:cut])
+            line = line[cut:].lstrip()
+        wrapped.append(line)
+    pages = [wrapped[i:i + lines_per_page] for i in range(0, len(wrapped), lines_per_page)] or [[]]
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        ops = ["BT /F1 10 Tf 14 TL 50 770 Td"] + [f"({_pdf_escape(line)}) '" for line in page] + ["ET"]
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{k} 0 R" for k in kids).encode(), len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.writelines(b"%010d 00000 n \n" % offset for offset in offsets)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+              % (len(objects) + 1, xref))
+    Path(path).write_bytes(out.getvalue())
+
+
+# -------------------------
+# Statistics
+# -------------------------
+def percentile(values, q):
+    """q-th percentile (0-100) with linear interpolation between closest ranks."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def summarize_latencies(latencies, wall_time):
+    """Throughput (operations per second) and latency percentiles in milliseconds."""
+    return {
+        "n": len(latencies),
+        "throughput": len(latencies) / wall_time if wall_time else 0.0,
+        "mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+    }
+
+
+def _timed(fn, items):
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+
+def _timed_concurrent(fn, items, users):
+    """Run fn over items with `users` simulated users, each an interactive scheduler session."""
+    def user(n):
+        latencies = []
+        with request_class(INTERACTIVE, session=f"bench-user-{n}"):
+            for item in items[n::users]:
+                t = time.perf_counter()
+                fn(item)
+                latencies.append(time.perf_counter() - t)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        per_user = list(pool.map(user, range(users)))
+    return [x for latencies in per_user for x in latencies], time.perf_counter() - start
+
+
+# -------------------------
+# Apps
+# -------------------------
+class AppBench(abc.ABC):
+    """One app's pipeline over the shared corpus, driven through the app's
+    clauseease.pipelines class so the benchmark runs the code the app runs."""
+
+    name = ""
+    pipeline_class = None
+
+    def __init__(self, client, docs, pdfs):
+        self.client = client
+        self.docs = docs            # [(stem, text)]
+        self.pdfs = pdfs            # {stem: path} or {} when no PDF reader is installed
+        self.pipeline = self.pipeline_class()
+        self.model = self.pipeline.model
+        self._tmp = tempfile.TemporaryDirectory(prefix=f"clauseease-bench-{self.name}-")
+        self._prepared = False
+
+    # Stages timed per document or per question; unsupported ones return NotImplemented
+    def ingest(self, stem):
+        return self.extract(self.pdfs[stem])
+
+    def extract(self, path):
+        return self.pipeline.extract_pdf(path)
+
+    @abc.abstractmethod
+    def chunk(self, text):
+        """The app's chunks of one document."""
+
+    def prepare(self):
+        """Untimed set-up for retrieval and Q&A (chunking and indexing every document)."""
+        self.chunks = {stem: list(self.chunk(text)) for stem, text in self.docs}
+
+    def search(self, doc_question):
+        return NotImplemented
+
+    def summarize(self, stem):
+        return NotImplemented
+
+    @abc.abstractmethod
+    def answer(self, doc_question):
+        """The app's answer to one (stem, question)."""
+
+    def _ensure_prepared(self):
+        if not self._prepared:
+            self.prepare()
+            self._prepared = True
+
+
+class ChatbotBench(AppBench):
+    """chatbot.py: token chunks, per-chunk summaries, questions without document context."""
+
+    name = "chatbot"
+    pipeline_class = ChatbotPipeline
+
+    def extract(self, path):
+        return self.pipeline.extract(path)
+
+    def chunk(self, text):
+        return self.pipeline.chunk(text)
+
+    def summarize(self, stem):
+        prompt = self.pipeline.summary_prompt
+        call = lambda chunk: self.client.generate(prompt(chunk), model=self.model,
+                                                  options=self.pipeline.options, cache=False).text
+        with request_class(BATCH):
+            summaries, errors = map_ordered(call, self.chunks[stem], max_workers=default_parallelism())
+        for error in errors:
+            if error is not None:
+                raise error
+        return summaries
+
+    def answer(self, doc_question):
+        _, question = doc_question
+        return "".join(self.client.generate_stream(question, model=self.model, options=self.pipeline.options))
+
+
+class KrushnaBench(AppBench):
+    """Krushna Chaudhari's app: token chunks, simplify + glossary, BM25 over sentences."""
+
+    name = "krushna"
+    pipeline_class = KrushnaPipeline
+
+    def extract(self, path):
+        return self.pipeline.extract(path, path)
+
+    def chunk(self, text):
+        return self.pipeline.chunk(text)
+
+    def prepare(self):
+        super().prepare()
+        self.sentences = {stem: self.pipeline.sentence_index("", "", text) for stem, text in self.docs}
+
+    def search(self, doc_question):
+        stem, question = doc_question
+        return self.pipeline.search(self.sentences[stem], question, k=6)
+
+    def _generate(self, prompt):
+        return self.client.generate(prompt, model=self.model, options=self.pipeline.options, cache=False).text
+
+    def summarize(self, stem):
+        # The corpus is English, so every chunk takes the simplify-only prompt, one at a time
+        with request_class(BATCH):
+            simplified = [self._generate(self.pipeline.simplify_prompt(chunk)) for chunk in self.chunks[stem]]
+            terms = self.pipeline.glossary_candidates(dict(self.docs)[stem])
+            GlossaryBuilder(self.client, self.model, options=self.pipeline.options, cache=False,
+                            store=ResultCache("glossary", self._tmp.name)).define(terms)
+        return simplified
+
+    def answer(self, doc_question):
+        return self._generate(self.pipeline.answer_prompt(self.search(doc_question), doc_question[1]))
+
+
+class ShamruthaBench(AppBench):
+    """Shamrutha S's app: paragraph chunks of 1000 characters, TF-IDF top 3, streamed answer."""
+
+    name = "shamrutha"
+    pipeline_class = ShamruthaPipeline
+
+    def chunk(self, text):
+        return self.pipeline.chunk(text)
+
+    def prepare(self):
+        super().prepare()
+        self.retrievers = {stem: self.pipeline.retriever(chunks) for stem, chunks in self.chunks.items()}
+
+    def search(self, doc_question):
+        stem, question = doc_question
+        return "\n\n".join(self.pipeline.relevant_chunks(question, self.chunks[stem], self.retrievers[stem]))
+
+    def answer(self, doc_question):
+        prompt = self.pipeline.prompt(doc_question[1], self.search(doc_question))
+        return "".join(self.client.generate_stream(prompt, model=self.model))
+
+
+class PreetiBench(AppBench):
+    """Preeti Gupta's app: 500-word chunks, BM25 context packed into 60% of num_ctx."""
+
+    name = "preeti"
+    pipeline_class = PreetiPipeline
+
+    def chunk(self, text):
+        return self.pipeline.chunk(text)
+
+    def prepare(self):
+        self.chunks = {}
+        self.indexes = {}
+        for stem, text in self.docs:
+            texts = [text[s:e] for s, e in self.chunk(text)]
+            self.chunks[stem] = texts
+            self.indexes[stem] = self.pipeline.chunk_index(range(len(texts)), texts)
+
+    def search(self, doc_question):
+        stem, question = doc_question
+        texts = self.chunks[stem]
+        ids, _ = self.pipeline.select_chunks(question, texts, self.indexes[stem], self.pipeline.context_budget())
+        return self.pipeline.document_context(stem + ".pdf", sum(len(t.split()) for t in texts), ids, texts,
+                                              [len(t.split()) for t in texts])
+
+    def answer(self, doc_question):
+        prompt = self.pipeline.document_prompt(self.search(doc_question), doc_question[1])
+        return "".join(self.client.generate_stream(prompt, model=self.model,
+                                                   options={"num_ctx": self.pipeline.num_ctx()}))
+
+
+class RagBench(AppBench):
+    """Mudit Sharma's RAG app: character chunks embedded into Chroma, hybrid BM25 + dense retrieval."""
+
+    name = "rag"
+    pipeline_class = RagPipeline
+
+    def __init__(self, client, docs, pdfs):
+        super().__init__(client, docs, pdfs)
+        chromadb = load("chromadb")
+        self.cache = EmbeddingCache(os.path.join(self._tmp.name, "embeddings.sqlite3"))
+        self.index = DocumentIndex(chromadb.EphemeralClient(), self.pipeline.embedding_model,
+                                   name=f"bench_{uuid.uuid4().hex[:8]}")
+        self.bm25 = BM25Index()
+        self.indexed = set()
+
+    def _embed(self, texts):
+        return embed_with_cache(self.client, self.cache, texts, self.pipeline.embedding_model)
+
+    def _records(self, stem):
+        if stem in self.pdfs:
+            return iter_pdf_pages(self.pdfs[stem])
+        return iter_text_lines(io.BytesIO(dict(self.docs)[stem].encode()))
+
+    def ingest(self, stem):
+        """What the upload job does: extract, chunk, embed in parallel batches, store."""
+        chunks = self.pipeline.chunk_records(self._records(stem), self.pipeline.chunk_size())
+        with request_class(BATCH):
+            error = self.pipeline.store_chunks(self.index, stem, stem + ".pdf", chunks, list(range(len(chunks))),
+                                               self._embed, default_parallelism())
+        if error is not None:
+            raise error
+        self.pipeline.add_sparse(self.bm25, self.index, stem, chunks)
+        self.indexed.add(stem)
+
+    def chunk(self, text):
+        return self.pipeline.chunk_records(iter_text_lines(io.BytesIO(text.encode())), self.pipeline.chunk_size())
+
+    def prepare(self):
+        for stem, _ in self.docs:
+            if stem not in self.indexed:
+                self.ingest(stem)
+        self.retriever = self.pipeline.retriever(self.index, self.bm25, lambda text: self._embed([text])[0])
+
+    def search(self, doc_question):
+        stem, question = doc_question
+        return "\n\n".join(text for _, text, _ in self.retriever.retrieve(question, k=3, doc_ids=[stem]))
+
+    def answer(self, doc_question):
+        prompt = self.pipeline.prompt(self.search(doc_question), doc_question[1])
+        return self.client.chat([{"role": "user", "content": prompt}], model=self.model,
+                                options={"num_ctx": self.pipeline.num_ctx}).text
+
+
+APPS = {bench.name: bench for bench in (ChatbotBench, KrushnaBench, ShamruthaBench, PreetiBench, RagBench)}
+
+
+# -------------------------
+# Runner
+# -------------------------
+def _pdf_reader_available():
+    try:
+        load("pypdf")
+    except ImportError:
+        try:
+            load("PyPDF2")
+        except ImportError:
+            return False
+    return True
+
+
+def run_scenario(bench, scenario, questions, users):
+    """Stats dict for one app and scenario, or None when the app has no such stage."""
+    stems = [stem for stem, _ in bench.docs]
+    if scenario == "ingestion":
+        if not bench.pdfs and not isinstance(bench, RagBench):
+            return None
+        latencies, wall = _timed(bench.ingest, stems)
+    elif scenario == "chunking":
+        texts = [text for _, text in bench.docs]
+        latencies, wall = _timed(lambda text: list(bench.chunk(text)), texts)
+    elif scenario == "summarize":
+        if type(bench).summarize is AppBench.summarize:
+            return None
+        bench._ensure_prepared()
+        latencies, wall = _timed(bench.summarize, stems)
+    elif scenario == "retrieval":
+        if type(bench).search is AppBench.search:
+            return None
+        bench._ensure_prepared()
+        latencies, wall = _timed(bench.search, questions)
+    else:
+        bench._ensure_prepared()
+        latencies, wall = _timed_concurrent(bench.answer, questions, users)
+    return summarize_latencies(latencies, wall)
+
+
+def run(apps=None, scenarios=SCENARIOS, n_docs=6, sections=24, n_questions=20, users=4,
+        latency=0.02, tokens_per_second=400.0, seed=0, out=print):
+    """Run the benchmark; returns {"config": ..., "results": {"app/scenario": stats}}."""
+    config = {"n_docs": n_docs, "sections": sections, "n_questions": n_questions, "users": users,
+              "latency": latency, "tokens_per_second": tokens_per_second, "seed": seed}
+    docs = corpus(n_docs, sections, seed)
+    rng = random.Random(seed)
+    questions = [(rng.choice(docs)[0], rng.choice(QUESTIONS)) for _ in range(n_questions)]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="clauseease-corpus-") as tmp, \
+            FakeOllama(latency=latency, tokens_per_second=tokens_per_second) as server:
+        pdfs = {}
+        if "ingestion" in scenarios and _pdf_reader_available():
+            for stem, text in docs:
+                pdfs[stem] = os.path.join(tmp, stem + ".pdf")
+                write_pdf(text, pdfs[stem])
+        elif "ingestion" in scenarios:
+            out("no PDF reader installed (pypdf or PyPDF2): PDF ingestion is skipped")
+        for name in apps or APPS:
+            # Fresh client and scheduler per app: no response cache, no queue shared with other apps
+            client = OllamaClient(server.url, cache=None, scheduler=OllamaScheduler())
+            bench = APPS[name](client, docs, pdfs)
+            for scenario in SCENARIOS:
+                if scenario not in scenarios:
+                    continue
+                stats = run_scenario(bench, scenario, questions, users)
+                if stats is not None:
+                    results[f"{name}/{scenario}"] = stats
+                    out(f"  {name}/{scenario}: {stats['n']} ops, p50 {stats['p50_ms']:.1f} ms")
+    return {"config": config, "results": results,
+            "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()}}
+
+
+def compare(results, baseline, threshold=THRESHOLD, noise_floor_ms=NOISE_FLOOR_MS):
+    """[(key, metric, baseline, current, relative change, regressed)] for keys in both runs.
+    Latencies regress when they grow by more than threshold (and noise_floor_ms),
+    throughput when it drops by more than threshold in a scenario slower than the floor."""
+    rows = []
+    for key, stats in results["results"].items():
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        for metric in ("throughput", "p50_ms", "p95_ms", "p99_ms"):
+            old, new = before[metric], stats[metric]
+            change = (new - old) / old if old else 0.0
+            if metric == "throughput":
+                regressed = -change > threshold and before["mean_ms"] >= noise_floor_ms
+            else:
+                regressed = change > threshold and new - old >= noise_floor_ms
+            rows.append((key, metric, old, new, change, regressed))
+    return rows
+
+
+def format_report(results):
+    lines = [f"{'scenario':24} {'ops':>5} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for key, s in results["results"].items():
+        lines.append(f"{key:24} {s['n']:5d} {s['throughput']:9.2f} {s['p50_ms']:9.1f} "
+                     f"{s['p95_ms']:9.1f} {s['p99_ms']:9.1f}")
+    return "\n".join(lines)
+
+
+def format_comparison(rows):
+    lines = [f"{'scenario':24} {'metric':10} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for key, metric, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"{key:24} {metric:10} {old:10.2f} {new:10.2f} {change:+8.1%}{flag}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the apps' pipelines against a fake Ollama.")
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--docs", type=int, default=6, help="synthetic contracts in the corpus")
+    parser.add_argument("--sections", type=int, default=24, help="clauses in the smallest contract")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--users", type=int, default=4, help="concurrent users in the Q&A scenario")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake Ollama per-request latency (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.apps, args.scenarios, args.docs, args.sections, args.questions, args.users,
+                  args.latency, args.tokens_per_second, args.seed)
+    print(format_report(results))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    # Timings from other settings or another machine say nothing about this change
+    for key in ("config", "machine"):
+        if baseline.get(key) != results[key]:
+            print(f"not compared: the baseline {key} differs: {baseline.get(key)}")
+            print("run with --save-baseline to record one for this run")
+            return 0
+    rows = compare(results, baseline, args.threshold)
+    print()
+    print(format_comparison(rows))
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
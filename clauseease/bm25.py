@@ -0,0 +1,132 @@
+"""Okapi BM25 over an inverted index, for exact-term retrieval."""
+import heapq
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+
+# Keeps clause numbers ("12.3", "4-b") and hyphenated terms as single tokens
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an the and or but if of in on at to by for from with as is are was were be been being
+it its this that these those there here what which who whom when where why how do does did
+can could shall should will would may might must not no any all i you he she we they me my
+your our their about into than then so such
+""".split())
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """term -> {key: term frequency} postings plus per-key lengths.
+
+    Keys are caller-chosen (chunk ids, sentence numbers, ...; strings if the
+    index is saved to JSON). Search
+    only touches the postings of the query terms, and top-k uses a heap.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.lengths = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __contains__(self, key):
+        return key in self.lengths
+
+    def add(self, key, text):
+        """Index text under key (replacing whatever key held before)."""
+        tokens = tokenize(text)
+        with self._lock:
+            if key in self.lengths:
+                self.remove(key)
+            counts = {}
+            for t in tokens:
+                counts[t] = counts.get(t, 0) + 1
+            for t, tf in counts.items():
+                self.postings.setdefault(t, {})[key] = tf
+            self.lengths[key] = len(tokens)
+            self.total_length += len(tokens)
+
+    def remove(self, key):
+        with self._lock:
+            if key not in self.lengths:
+                return
+            for t in list(self.postings):
+                docs = self.postings[t]
+                if docs.pop(key, None) is not None and not docs:
+                    del self.postings[t]
+            self.total_length -= self.lengths.pop(key)
+
+    def idf(self, term):
+        n = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.lengths) - n + 0.5) / (n + 0.5))
+
+    def scores(self, query, keep=None):
+        """{key: BM25 score} for keys containing at least one query term."""
+        with self._lock:
+            if not self.lengths:
+                return {}
+            avg = self.total_length / len(self.lengths) or 1.0
+            scores = {}
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = self.idf(term)
+                for key, tf in docs.items():
+                    if keep is not None and not keep(key):
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[key] / avg)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / norm
+            return scores
+
+    def search(self, query, k=10, keep=None):
+        """Top-k (key, score) pairs, best first. keep(key) can filter candidates."""
+        scores = self.scores(query, keep)
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+
+    def to_dict(self):
+        with self._lock:
+            return {"k1": self.k1, "b": self.b, "postings": self.postings, "lengths": self.lengths}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data.get("k1", 1.5), data.get("b", 0.75))
+        index.postings = data["postings"]
+        index.lengths = data["lengths"]
+        index.total_length = sum(index.lengths.values())
+        return index
+
+    def save(self, path):
+        """Write the index atomically: a temporary file per save, swapped in under the lock."""
+        path = os.fspath(path)
+        with self._lock:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                       prefix=os.path.basename(path) + ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self.to_dict(), f)
+                os.replace(tmp, path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+
+    @classmethod
+    def load(cls, path):
+        """Index saved at path, or an empty one if the file is missing or unreadable."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return cls()
@@ -0,0 +1,233 @@
+"""Single-pass chunking into (start, end) spans, plus streaming chunkers for records.
+
+chunk_spans() never copies text: each chunk is a Span into the source string
+and ChunkView slices it only when a chunk is read. Strategies:
+
+    word       size words per chunk, overlap words shared with the previous one
+    char       size characters, overlap characters
+    sentence   whole sentences packed up to size characters, overlap sentences
+    paragraph  whole lines/paragraphs packed up to size characters, overlap paragraphs
+    token      whole words packed up to size estimated tokens for model, overlap tokens
+
+A sentence or paragraph longer than size is split by characters; a whitespace-free
+run longer than size is split between its word/punctuation pieces first.
+"""
+import re
+from collections import deque
+from collections.abc import Sequence
+
+from clauseease.tokens import chars_per_token, estimate_from_counts, piece_spans, word_tokens
+
+STRATEGIES = ("word", "char", "sentence", "paragraph", "token")
+
+WORD_RE = re.compile(r"\S+")
+# Up to ., ! or ? followed by whitespace, so clause numbers like "12.3" stay inside
+SENTENCE_RE = re.compile(r"\S.*?(?:[.!?]+(?=\s)|\Z)", re.S)
+PARAGRAPH_RE = re.compile(r"\S(?:[^\n]*\S)?")
+
+
+class Span:
+    """Chunk boundaries in the source text; unpacks as (start, end)."""
+
+    __slots__ = ("start", "end")
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        yield self.start
+        yield self.end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"Span({self.start}, {self.end})"
+
+
+class ChunkView(Sequence):
+    """Chunk strings of text, sliced on access from (start, end) spans."""
+
+    def __init__(self, text, spans):
+        self.text = text
+        self.spans = spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        start, end = self.spans[i]
+        return self.text[start:end]
+
+
+def _char_spans(start, end, size, overlap):
+    step = max(1, size - overlap)
+    for pos in range(start, end, step):
+        yield Span(pos, min(pos + size, end))
+
+
+def _word_spans(text, size, overlap):
+    # Same chunks as " ".join(words[i:i + size]) with step size - overlap,
+    # but each chunk keeps the document's own whitespace
+    step = max(1, size - overlap)
+    window = deque()
+    for m in WORD_RE.finditer(text):
+        window.append(m.span())
+        if len(window) == size:
+            yield Span(window[0][0], window[-1][1])
+            for _ in range(min(step, len(window))):
+                window.popleft()
+    while window:
+        yield Span(window[0][0], window[-1][1])
+        for _ in range(min(step, len(window))):
+            window.popleft()
+
+
+def _packed_spans(text, pattern, size, overlap):
+    window = deque()
+    for m in pattern.finditer(text):
+        start, end = m.span()
+        if window and end - window[0][0] > size:
+            yield Span(window[0][0], window[-1][1])
+            while len(window) > overlap:
+                window.popleft()
+            while window and end - window[0][0] > size:
+                window.popleft()    # the carried-over units must leave room for this one
+        if not window and end - start > size:
+            yield from _char_spans(start, end, size, 0)
+            continue
+        window.append((start, end))
+    if window:
+        yield Span(window[0][0], window[-1][1])
+
+
+def _run_spans(text, start, end, size, ratio):
+    """Spans of one whitespace-free run, packed piece by piece up to size estimated tokens.
+    A single piece longer than the budget (a CJK or Thai word run) is cut by characters."""
+    max_chars = max(1, int(size * ratio))
+    chunk_start = None
+    pieces = 0
+    for s, e in piece_spans(text, start, end):
+        if e - s > max_chars:
+            if chunk_start is not None:
+                yield Span(chunk_start, s)
+                chunk_start = None
+            yield from _char_spans(s, e, max_chars, 0)
+            continue
+        if chunk_start is not None and estimate_from_counts(e - chunk_start, pieces + 1, ratio) > size:
+            yield Span(chunk_start, s)
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start, pieces = s, 0
+        pieces += 1
+    if chunk_start is not None:
+        yield Span(chunk_start, end)
+
+
+def _token_spans(text, size, overlap, model):
+    # Running totals give exactly estimate_tokens() of the chunk text, so no chunk
+    # is estimated above size
+    ratio = chars_per_token(model)
+    window = deque()    # (start, end, pieces)
+    pieces = 0
+
+    def cost(end):
+        return estimate_from_counts(end - window[0][0], pieces, ratio) if window else 0
+
+    for m in WORD_RE.finditer(text):
+        start, end = m.span()
+        n = word_tokens(m.group())
+        if estimate_from_counts(end - start, n, ratio) > size:
+            # One run with no whitespace (CJK or Thai text, a URL, base64) bigger
+            # than a chunk: flush, then split the run itself
+            if window:
+                yield Span(window[0][0], window[-1][1])
+                window.clear()
+                pieces = 0
+            yield from _run_spans(text, start, end, size, ratio)
+            continue
+        if window and estimate_from_counts(end - window[0][0], pieces + n, ratio) > size:
+            yield Span(window[0][0], window[-1][1])
+            # Carry over up to overlap tokens, leaving room for this word
+            while window and (cost(window[-1][1]) > overlap
+                              or estimate_from_counts(end - window[0][0], pieces + n, ratio) > size):
+                pieces -= window.popleft()[2]
+        window.append((start, end, n))
+        pieces += n
+    if window:
+        yield Span(window[0][0], window[-1][1])
+
+
+def chunk_spans(text, strategy="word", size=500, overlap=0, model=None):
+    """[Span] covering text, in order, in a single pass (see the module docstring).
+
+    model only matters for the token strategy, whose estimates follow that
+    model's calibrated chars-per-token ratio.
+    """
+    if size <= 0:
+        raise ValueError("chunk size must be positive")
+    if strategy == "word":
+        spans = _word_spans(text, size, overlap)
+    elif strategy == "char":
+        spans = _char_spans(0, len(text), size, overlap)
+    elif strategy == "sentence":
+        spans = _packed_spans(text, SENTENCE_RE, size, overlap)
+    elif strategy == "paragraph":
+        spans = _packed_spans(text, PARAGRAPH_RE, size, overlap)
+    elif strategy == "token":
+        spans = _token_spans(text, size, overlap, model)
+    else:
+        raise ValueError(f"unknown chunking strategy {strategy!r}; expected one of {STRATEGIES}")
+    return list(spans)
+
+
+def chunk_view(text, strategy="word", size=500, overlap=0, model=None):
+    """chunk_spans() wrapped in a ChunkView, for callers that want the chunk strings."""
+    return ChunkView(text, chunk_spans(text, strategy, size, overlap, model))
+
+
+def _windows(pieces, size, step):
+    """Slide a size-wide window forward by step over a growing buffer."""
+    buf = []
+    for piece in pieces:
+        buf.extend(piece)
+        while len(buf) >= size:
+            yield buf[:size]
+            del buf[:step]
+    while buf:
+        yield buf[:size]
+        del buf[:step]
+
+
+# Streaming forms of the word and char strategies, for callers that never hold
+# the whole document (the RAG app feeds PDF pages straight in)
+
+def iter_word_chunks(records, size, overlap=0):
+    """Chunks of `size` words (sharing `overlap` words) as records stream in.
+
+    Produces the same chunks as " ".join(words[i:i + size]) over the whole
+    text, without ever holding the whole text.
+    """
+    step = max(1, size - overlap)
+    for window in _windows((r.text.split() for r in records), size, step):
+        yield " ".join(window)
+
+
+def iter_char_chunks(records, size, overlap=0, separator=""):
+    """Chunks of `size` characters (sharing `overlap`) over the records joined by separator."""
+    step = max(1, size - overlap)
+    buf = ""
+    for r in records:
+        buf += r.text + separator
+        while len(buf) >= size:
+            yield buf[:size]
+            buf = buf[step:]
+    while buf:
+        yield buf[:size]
+        buf = buf[step:]
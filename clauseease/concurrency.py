@@ -0,0 +1,61 @@
+"""Bounded thread-pool helpers for fanning LLM calls out to Ollama."""
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_PARALLEL = 4       # Ollama's own default for OLLAMA_NUM_PARALLEL
+
+
+def default_parallelism():
+    """How many requests one Ollama model serves at once (OLLAMA_NUM_PARALLEL)."""
+    try:
+        return max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", DEFAULT_PARALLEL)))
+    except ValueError:
+        return DEFAULT_PARALLEL
+
+
+def imap_unordered(fn, items, max_workers=None):
+    """Yield (index, result, error) for each item as soon as it finishes.
+
+    At most max_workers calls are in flight. The consumer runs in the calling
+    thread, so it can write results out (or update widgets) while the rest of
+    the work is still running. Each call runs in a copy of the caller's
+    context, so it keeps the caller's request class (see clauseease.scheduler).
+    """
+    items = list(items)
+    if not items:
+        return
+    workers = max(1, min(max_workers or default_parallelism(), len(items)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(contextvars.copy_context().run, fn, item): i
+                   for i, item in enumerate(items)}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                yield futures[future], None, e
+            else:
+                yield futures[future], result, None
+    finally:
+        # If the consumer stops early, don't start the items still queued
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def map_ordered(fn, items, max_workers=None, on_done=None):
+    """Run fn over items with at most max_workers in flight.
+
+    Returns (results, errors), both in input order. A failing item does not
+    stop the others: its result is None and its error holds the exception.
+    on_done(done, total) runs in the calling thread after each item finishes,
+    so it may safely update Streamlit widgets.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    for done, (i, result, error) in enumerate(imap_unordered(fn, items, max_workers), 1):
+        results[i] = result
+        errors[i] = error
+        if on_done:
+            on_done(done, len(items))
+    return results, errors
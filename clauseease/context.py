@@ -0,0 +1,35 @@
+"""Token-budgeted prompt context assembly."""
+from clauseease.tokens import estimate_tokens
+
+
+def rank_chunks(question, index, n_chunks, candidates=50):
+    """Chunk ids best first: BM25 hits for the question, then the rest in document order."""
+    ranked = [key for key, _ in index.search(question, candidates)]
+    seen = set(ranked)
+    return ranked + [i for i in range(n_chunks) if i not in seen]
+
+
+def pack_chunks(ranked_ids, texts, budget_tokens, overhead=0, estimate=estimate_tokens):
+    """Greedily take chunks in rank order while they fit in budget_tokens.
+
+    overhead is added per chunk for the labels the caller wraps around it.
+    Returns (chunk ids in document order, tokens used).
+    """
+    chosen = []
+    used = 0
+    for i in ranked_ids:
+        cost = estimate(texts[i]) + overhead
+        if used + cost > budget_tokens:
+            continue    # a smaller, lower-ranked chunk may still fit
+        chosen.append(i)
+        used += cost
+    return sorted(chosen), used
+
+
+def build_context(question, texts, index, budget_tokens, overhead=0):
+    """Pick the most relevant chunks of texts for question within budget_tokens.
+
+    index is a BM25Index keyed by chunk position. Returns (chunk ids in
+    document order, tokens used).
+    """
+    return pack_chunks(rank_chunks(question, index, len(texts)), texts, budget_tokens, overhead)
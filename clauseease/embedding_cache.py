@@ -0,0 +1,146 @@
+"""Chunk-level embedding cache shared across documents, sessions and restarts."""
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+from array import array
+
+from clauseease.result_cache import CACHE_DIR
+from clauseease.tracing import get_tracer
+
+DEFAULT_PATH = CACHE_DIR / "embeddings.sqlite3"
+DTYPE = os.environ.get("CLAUSEEASE_EMBEDDING_DTYPE", "float32")   # or "float16"
+
+
+def normalize_chunk(text):
+    """Collapse whitespace so re-wrapped copies of a clause share one entry."""
+    return " ".join(text.split())
+
+
+def chunk_hash(text):
+    return hashlib.sha256(normalize_chunk(text).encode("utf-8")).hexdigest()
+
+
+def encode_vector(vector, dtype=DTYPE):
+    if dtype == "float16":
+        return struct.pack(f"<{len(vector)}e", *vector)
+    return array("f", vector).tobytes()
+
+
+def decode_vector(blob, dtype):
+    if dtype == "float16":
+        return list(struct.unpack(f"<{len(blob) // 2}e", blob))
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingDimensionError(ValueError):
+    """A model produced vectors of a different size than recorded before."""
+
+
+class EmbeddingCache:
+    """(embedding model, normalized chunk hash) -> vector, stored as compact blobs.
+
+    The dimension of every model is recorded the first time it is seen, and
+    vectors of any other size are rejected.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, dtype=DTYPE):
+        self.path = str(path)
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT, hash TEXT, dtype TEXT, vector BLOB, PRIMARY KEY (model, hash))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, dim INTEGER)")
+        self._db.commit()
+
+    def dimension(self, model):
+        """Recorded vector size for model, or None if it has never been cached."""
+        with self._lock:
+            row = self._db.execute("SELECT dim FROM models WHERE model = ?", (model,)).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, model, texts):
+        """Cached vectors in input order, with None for every miss."""
+        hashes = [chunk_hash(t) for t in texts]
+        found = {}
+        with self._lock:
+            unique = list(set(hashes))
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT hash, dtype, vector FROM embeddings WHERE model = ?"
+                    f" AND hash IN ({','.join('?' * len(part))})", [model, *part]).fetchall()
+                found.update((h, decode_vector(blob, dtype)) for h, dtype, blob in rows)
+            vectors = [found.get(h) for h in hashes]
+            hits = sum(v is not None for v in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        """Store vectors for texts; raises EmbeddingDimensionError on a size mismatch."""
+        if not vectors:
+            return
+        dims = {len(v) for v in vectors}
+        known = self.dimension(model)
+        if len(dims) > 1 or (known is not None and dims != {known}):
+            raise EmbeddingDimensionError(
+                f"{model} returned {sorted(dims)}-dimensional vectors, expected {known}")
+        with self._lock:
+            if known is None:
+                self._db.execute("INSERT OR IGNORE INTO models (model, dim) VALUES (?, ?)",
+                                 (model, dims.pop()))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, dtype, vector) VALUES (?, ?, ?, ?)",
+                [(model, chunk_hash(t), self.dtype, encode_vector(v, self.dtype))
+                 for t, v in zip(texts, vectors)],
+            )
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"entries": count, "hits": self.hits, "misses": self.misses, "dtype": self.dtype}
+
+
+def embed_with_cache(client, cache, texts, model):
+    """Vectors for texts: cache first, then one batched Ollama call for the misses."""
+    texts = list(texts)
+    vectors = cache.get_many(model, texts)
+    missing = {}
+    for i, v in enumerate(vectors):
+        if v is None:
+            missing.setdefault(normalize_chunk(texts[i]), []).append(i)
+    misses = sum(len(idxs) for idxs in missing.values())
+    get_tracer().record_cache("embedding", len(texts) - misses, misses)
+    if missing:
+        fresh_texts = [texts[idxs[0]] for idxs in missing.values()]
+        fresh = client.embed(fresh_texts, model=model)
+        cache.put_many(model, fresh_texts, fresh)
+        for idxs, vector in zip(missing.values(), fresh):
+            for i in idxs:
+                vectors[i] = vector
+    return vectors
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Process-wide EmbeddingCache at the default path."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
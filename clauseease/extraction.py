@@ -0,0 +1,226 @@
+"""Streaming document extraction: page and paragraph records with offsets.
+
+Run as a batch job with: python -m clauseease.extraction contract.pdf ... --out-dir texts/
+"""
+import argparse
+import codecs
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from clauseease.lazy import load
+
+SEPARATOR = "\n"           # records are joined with this; offsets assume it
+PARALLEL_MIN_PAGES = 24    # below this, starting worker processes costs more than it saves
+RANGES_PER_WORKER = 2      # smaller page ranges even out slow pages across workers
+
+
+def default_workers():
+    """Processes for PDF extraction: CLAUSEEASE_PDF_WORKERS, else one per usable CPU (1 disables)."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    try:
+        return max(1, int(os.environ.get("CLAUSEEASE_PDF_WORKERS", cpus)))
+    except ValueError:
+        return 1
+
+
+class TextRecord:
+    """One page (PDF) or paragraph (DOCX/TXT) of a document.
+
+    start/end are offsets of text in the document as join_records() builds it.
+    """
+
+    __slots__ = ("kind", "number", "start", "end", "text")
+
+    def __init__(self, kind, number, start, text):
+        self.kind = kind
+        self.number = number
+        self.start = start
+        self.end = start + len(text)
+        self.text = text
+
+    def __repr__(self):
+        return f"TextRecord({self.kind} {self.number}, {self.start}:{self.end})"
+
+
+def _records(kind, texts):
+    offset = 0
+    for n, text in enumerate(texts):
+        yield TextRecord(kind, n, offset, text)
+        offset += len(text) + len(SEPARATOR)
+
+
+def _pdf_reader(source):
+    """PdfReader from pypdf, or PyPDF2 where only that is installed; imported on first use."""
+    try:
+        module = load("pypdf")
+    except ImportError:     # the older apps only install PyPDF2
+        module = load("PyPDF2")
+    return module.PdfReader(source)
+
+
+def _page_texts(reader, start, stop):
+    for n in range(start, stop):
+        try:
+            yield reader.pages[n].extract_text() or ""
+        except Exception:
+            yield ""    # a broken page should not lose the rest of the document
+
+
+_worker_reader = None
+
+
+def _open_worker(path):
+    """Worker initializer: parse the PDF once per process, not once per page range."""
+    global _worker_reader
+    _worker_reader = _pdf_reader(path)
+
+
+def _extract_range(page_range):
+    """Worker: text of pages [start, stop) of the PDF _open_worker() opened."""
+    start, stop = page_range
+    return list(_page_texts(_worker_reader, start, stop))
+
+
+def _page_ranges(n_pages, workers):
+    size = -(-n_pages // (workers * RANGES_PER_WORKER))
+    return [(start, min(start + size, n_pages)) for start in range(0, n_pages, size)]
+
+
+def _spill(source):
+    """Copy a file object to a temporary .pdf in 1 MB blocks and return its path."""
+    source.seek(0)
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="clauseease-")
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(source, out, 1 << 20)
+    return path
+
+
+def _pdf_pages(source, workers, min_pages):
+    reader = _pdf_reader(source)
+    n_pages = len(reader.pages)
+    workers = min(workers or default_workers(), n_pages)
+    if workers <= 1 or n_pages < min_pages:
+        yield from _page_texts(reader, 0, n_pages)
+        return
+
+    # Workers get a path, never the PDF bytes: uploads are written to disk once,
+    # and each job only carries its page range
+    spilled = None
+    if isinstance(source, (str, Path)):
+        path = str(source)
+    else:
+        path = spilled = _spill(source)
+    done = 0
+    try:
+        # spawn, not fork: the Streamlit server is multithreaded, and a forked
+        # child would inherit its locks in whatever state they were in
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_open_worker, initargs=(path,)) as pool:
+            # map() hands back ranges in page order while later ranges are still running
+            for texts in pool.map(_extract_range, _page_ranges(n_pages, workers)):
+                for text in texts:
+                    done += 1
+                    yield text
+    except (BrokenProcessPool, OSError):
+        # No worker processes here (sandbox, frozen app): finish in this process
+        yield from _page_texts(reader, done, n_pages)
+    finally:
+        if spilled:
+            os.remove(spilled)
+
+
+def iter_pdf_pages(source, workers=None, min_pages=PARALLEL_MIN_PAGES):
+    """Yield one record per PDF page, in page order.
+
+    source is a path or binary file object (not copied for serial reads;
+    for parallel reads a file object is written once to a temporary file).
+    PDFs with at least min_pages pages are split into page ranges across
+    `workers` processes (default_workers()); smaller ones, or workers=1,
+    are read serially in this process.
+    """
+    return _records("page", _pdf_pages(source, workers, min_pages))
+
+
+def iter_docx_paragraphs(source):
+    """Yield one record per DOCX paragraph."""
+    docx = load("docx")
+    return _records("paragraph", (p.text for p in docx.Document(source).paragraphs))
+
+
+def _text_paragraphs(source, encoding, errors):
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            yield from _text_paragraphs(f, encoding, errors)
+        return
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    pending = ""
+    for block in iter(lambda: source.read(1 << 16), b""):
+        pending += decoder.decode(block)
+        *lines, pending = pending.split("\n")
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    yield pending
+
+
+def iter_text_lines(source, encoding="utf-8", errors="ignore"):
+    """Yield one record per line of a text file, decoding it 64 KB at a time."""
+    return _records("paragraph", _text_paragraphs(source, encoding, errors))
+
+
+def iter_records(source, filename):
+    """Pick the reader by file extension (.pdf, .docx, anything else as text)."""
+    suffix = Path(filename).suffix.lower()
+    if suffix == ".pdf":
+        return iter_pdf_pages(source)
+    if suffix == ".docx":
+        return iter_docx_paragraphs(source)
+    return iter_text_lines(source)
+
+
+def join_records(records, separator=SEPARATOR, header=None, trailing=True):
+    """Full text from records in one join. header(record) may prefix each record."""
+    parts = []
+    for r in records:
+        if header:
+            parts.append(header(r))
+        parts.append(r.text)
+        parts.append(separator)
+    if parts and not trailing:
+        parts.pop()
+    return "".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract text from documents, PDFs in parallel.")
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--out-dir", type=Path, help="write <name>.txt here (default: next to each file)")
+    parser.add_argument("--workers", type=int, default=None, help="processes per PDF (default: CPU count)")
+    parser.add_argument("--min-pages", type=int, default=PARALLEL_MIN_PAGES,
+                        help="smallest PDF to extract in parallel")
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        start = time.perf_counter()
+        if path.suffix.lower() == ".pdf":
+            records = iter_pdf_pages(str(path), args.workers, args.min_pages)
+        else:
+            records = iter_records(path, path.name)
+        records = list(records)
+        out = (args.out_dir or path.parent) / (path.stem + ".txt")
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(join_records(records), encoding="utf-8")
+        print(f"{path}: {len(records)} {records[0].kind if records else 'page'}s "
+              f"in {time.perf_counter() - start:.2f}s -> {out}")
+
+
+if __name__ == "__main__":
+    main()
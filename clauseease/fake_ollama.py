@@ -0,0 +1,252 @@
+"""Local stand-in for the Ollama HTTP API, for benchmarks without a real model.
+
+    python -m clauseease.fake_ollama --port 11434 --latency 0.05 --tokens-per-second 40
+
+Answers are deterministic filler built from the prompt's own words; timing
+follows the configured first-response latency, prompt processing rate and
+generation rate, and at most `parallel` requests are served at once like
+OLLAMA_NUM_PARALLEL. Embeddings are hashed bag-of-words vectors, so texts
+sharing words are close and retrieval results stay meaningful.
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from clauseease.concurrency import DEFAULT_PARALLEL
+
+DEFAULT_MODELS = ("tinyllama", "llama3:latest", "llama3.2", "nomic-embed-text")
+LATENCY = 0.05                 # seconds before any work (request overhead, model already loaded)
+TOKENS_PER_SECOND = 40.0       # generation rate
+PROMPT_TOKENS_PER_SECOND = 800.0
+COMPLETION_TOKENS = 48         # tokens per answer unless options.num_predict says otherwise
+EMBEDDING_DIM = 256
+CHARS_PER_TOKEN = 4            # how the fake server counts prompt tokens
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def fake_embedding(text, dim=EMBEDDING_DIM):
+    """Unit vector of hashed word counts."""
+    vector = [0.0] * dim
+    for word in _WORD_RE.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vector[h % dim] += 1.0 if h >> 63 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def fake_words(prompt, n):
+    """n filler words drawn deterministically from the prompt."""
+    words = _WORD_RE.findall(prompt) or ["ok"]
+    seed = int(hashlib.blake2b(prompt.encode(), digest_size=8).hexdigest(), 16)
+    return [words[(seed + 7 * i) % len(words)] for i in range(n)]
+
+
+def fake_json(schema, words):
+    """A value matching the parts of a JSON schema Ollama's format option uses."""
+    if not isinstance(schema, dict):       # format="json"
+        return {"answer": " ".join(words)}
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: fake_json(sub, words) for key, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [fake_json(schema.get("items", {}), words)]
+    if kind in ("integer", "number"):
+        return len(words)
+    if kind == "boolean":
+        return True
+    return " ".join(words[:12])
+
+
+class FakeOllama:
+    """Threaded HTTP server answering /api/generate, /api/chat, /api/embed(dings) and /api/tags.
+
+    Use as a context manager, or call start()/stop(); url is the base URL to
+    hand to OllamaClient.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=LATENCY,
+                 tokens_per_second=TOKENS_PER_SECOND, prompt_tokens_per_second=PROMPT_TOKENS_PER_SECOND,
+                 completion_tokens=COMPLETION_TOKENS, parallel=DEFAULT_PARALLEL,
+                 models=DEFAULT_MODELS, embedding_dim=EMBEDDING_DIM):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.models = list(models)
+        self.embedding_dim = embedding_dim
+        self.requests = 0
+        self._slots = threading.BoundedSemaphore(max(1, parallel))
+        self._count_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name="fake-ollama")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, data):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send(200, {"models": [{"name": m, "model": m} for m in server.models]})
+                elif self.path == "/api/version":
+                    self._send(200, {"version": "0.0.0-fake"})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send(400, {"error": "invalid JSON"})
+                    return
+                routes = {"/api/generate": server._generate, "/api/chat": server._generate,
+                          "/api/embed": server._embed, "/api/embeddings": server._embed}
+                route = routes.get(self.path)
+                if route is None:
+                    self._send(404, {"error": "not found"})
+                elif payload.get("model") not in server.models:
+                    self._send(404, {"error": f"model '{payload.get('model')}' not found"})
+                else:
+                    with server._count_lock:
+                        server.requests += 1
+                    with server._slots:
+                        route(self, payload)
+
+        return Handler
+
+    def _generate(self, handler, payload):
+        chat = "messages" in payload
+        if chat:
+            prompt = "\n".join(m.get("content", "") for m in payload["messages"])
+        else:
+            prompt = payload.get("prompt", "") + (payload.get("system") or "")
+        n_prompt = _tokens(prompt)
+        n_out = int((payload.get("options") or {}).get("num_predict") or self.completion_tokens)
+        words = fake_words(prompt, n_out)
+        if payload.get("format"):
+            text = json.dumps(fake_json(payload["format"], words))
+            pieces = [text]
+        else:
+            pieces = [w if i == 0 else " " + w for i, w in enumerate(words)]
+        start = time.perf_counter()
+        prompt_seconds = n_prompt / self.prompt_tokens_per_second
+        time.sleep(self.latency + prompt_seconds)
+        step = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+        def chunk(piece, done):
+            data = {"model": payload["model"], "done": done}
+            if chat:
+                data["message"] = {"role": "assistant", "content": piece}
+            else:
+                data["response"] = piece
+            return data
+
+        def final(text):
+            data = chunk(text, True)
+            data.update(prompt_eval_count=n_prompt, eval_count=n_out,
+                        total_duration=int((time.perf_counter() - start) * 1e9),
+                        load_duration=0, prompt_eval_duration=int(prompt_seconds * 1e9),
+                        eval_duration=int(n_out * step * 1e9))
+            return data
+
+        if payload.get("stream", True):
+            handler.send_response(200)
+            handler.send_header("Content-Type", "application/x-ndjson")
+            handler.send_header("Transfer-Encoding", "chunked")
+            handler.end_headers()
+            for piece in pieces:
+                time.sleep(step * (n_out if len(pieces) == 1 else 1))
+                self._write_chunk(handler, chunk(piece, False))
+            self._write_chunk(handler, final(""))
+            handler.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(step * n_out)
+            handler._send(200, final("".join(pieces)))
+
+    @staticmethod
+    def _write_chunk(handler, data):
+        line = json.dumps(data).encode() + b"\n"
+        handler.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        handler.wfile.flush()
+
+    def _embed(self, handler, payload):
+        texts = payload["input"] if "input" in payload else [payload.get("prompt", "")]
+        if isinstance(texts, str):
+            texts = [texts]
+        time.sleep(self.latency + sum(_tokens(t) for t in texts) / self.prompt_tokens_per_second)
+        vectors = [fake_embedding(t, self.embedding_dim) for t in texts]
+        if "input" in payload:
+            handler._send(200, {"model": payload["model"], "embeddings": vectors,
+                                "prompt_eval_count": sum(_tokens(t) for t in texts)})
+        else:
+            handler._send(200, {"embedding": vectors[0]})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama API for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--tokens-per-second", type=float, default=TOKENS_PER_SECOND)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=PROMPT_TOKENS_PER_SECOND)
+    parser.add_argument("--completion-tokens", type=int, default=COMPLETION_TOKENS)
+    parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL)
+    args = parser.parse_args(argv)
+    server = FakeOllama(args.host, args.port, args.latency, args.tokens_per_second,
+                        args.prompt_tokens_per_second, args.completion_tokens, args.parallel)
+    print(f"fake Ollama listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
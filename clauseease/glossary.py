@@ -0,0 +1,110 @@
+"""Glossary definitions from one schema-constrained call, cached per term."""
+import json
+import re
+
+from clauseease.ollama_client import OllamaError
+from clauseease.result_cache import content_hash, get_result_cache
+
+GLOSSARY_PROMPT = (
+    "Provide a very short plain-English explanation (1-2 sentences) for each term below, "
+    "using simple language:\n\n{terms}\n\n"
+    "Return a JSON object mapping each term, spelled exactly as listed, to its explanation."
+)
+
+# "Term": "explanation" pairs, for answers that are not valid JSON as a whole
+_PAIR_RE = re.compile(r'"([^"\n]+)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_OBJECT_RE = re.compile(r"\{[\s\S]*\}")
+
+
+def glossary_schema(terms):
+    """JSON schema for Ollama's format option: one required string per term."""
+    return {
+        "type": "object",
+        "properties": {t: {"type": "string"} for t in terms},
+        "required": list(terms),
+    }
+
+
+def parse_glossary(text, terms):
+    """{term: explanation} for the requested terms found in a model answer.
+
+    Accepts a clean JSON object, JSON wrapped in other text, or a truncated
+    object whose complete "term": "explanation" pairs are still usable. Keys
+    are matched to the requested terms case-insensitively; anything else is
+    dropped.
+    """
+    if not text:
+        return {}
+    data = None
+    for candidate in (text, *_OBJECT_RE.findall(text)):
+        try:
+            data = json.loads(candidate)
+            break
+        except ValueError:
+            continue
+    if not isinstance(data, dict):
+        data = {}
+        for key, value in _PAIR_RE.findall(text):
+            try:
+                data[key] = json.loads(f'"{value}"')
+            except ValueError:
+                data[key] = value
+    wanted = {t.lower(): t for t in terms}
+    found = {}
+    for key, value in data.items():
+        term = wanted.get(str(key).strip().lower())
+        if term and isinstance(value, str) and value.strip():
+            found[term] = value.strip()
+    return found
+
+
+class GlossaryBuilder:
+    """Defines glossary terms with at most two model calls per document.
+
+    Definitions are kept per (model, term) in a result cache shared across
+    documents, so only terms never seen before reach the model. Those are asked
+    for in one call constrained to a JSON schema; terms still missing from the
+    answer are re-asked together once. With cache=False neither stored
+    definitions nor cached responses are reused.
+    """
+
+    def __init__(self, client, model, options=None, cache=True, store=None):
+        self.client = client
+        self.model = model
+        self.options = options
+        self.cache = cache
+        self.store = store or get_result_cache("glossary")
+        self.calls = 0
+
+    def _key(self, term):
+        return content_hash(self.model, term.lower())
+
+    def _ask(self, terms, cache):
+        prompt = GLOSSARY_PROMPT.format(terms="\n".join(f"- {t}" for t in terms))
+        self.calls += 1
+        try:
+            out = self.client.generate(prompt, model=self.model, options=self.options,
+                                       format=glossary_schema(terms), cache=cache).text
+        except OllamaError:
+            return {}
+        return parse_glossary(out, terms)
+
+    def define(self, terms):
+        """{term: explanation} in the order of terms; terms the model never defined are left out."""
+        found = {}
+        if self.cache:
+            for t in terms:
+                hit = self.store.get(self._key(t))
+                if hit:
+                    found[t] = hit["definition"]
+        missing = [t for t in terms if t not in found]
+        for attempt in range(2):    # the batch, then one re-ask for whatever it left out
+            if not missing:
+                break
+            # the re-ask skips the response cache, which may hold the answer that failed
+            new = self._ask(missing, cache=self.cache and attempt == 0)
+            for t, definition in new.items():
+                self.store.put(self._key(t), {"term": t, "definition": definition})
+            found.update(new)
+            missing = [t for t in missing if t not in found]
+        return {t: found[t] for t in terms if t in found}
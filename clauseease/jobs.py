@@ -0,0 +1,241 @@
+"""Background document jobs: a worker pool with job state and checkpoints in SQLite.
+
+A job is identified by a caller-chosen id (usually a content hash), so reruns
+and other sessions attach to the running job instead of starting it again.
+Handlers save a checkpoint after each unit of work (one chunk, one batch);
+a job left queued or running by a previous process is resubmitted by resume()
+and its handler skips every step it already checkpointed.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from clauseease.result_cache import CACHE_DIR, content_hash
+from clauseease.scheduler import BATCH, current_request, request_class
+from clauseease.tracing import span_session
+
+DEFAULT_PATH = CACHE_DIR / "jobs.sqlite3"
+UPLOAD_DIR = CACHE_DIR / "uploads"
+MAX_WORKERS = int(os.environ.get("CLAUSEEASE_JOB_WORKERS", "2"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def stash_upload(data, filename):
+    """Keep an upload on disk under its content hash so a job can reopen it after a restart.
+    Returns (path, digest)."""
+    digest = content_hash(data)
+    path = Path(UPLOAD_DIR) / (digest + Path(filename).suffix.lower())
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    return str(path), digest
+
+
+class JobRecord:
+    """Snapshot of one job's row."""
+
+    def __init__(self, id, kind, status, params, done, total, message, result, error,
+                 created, updated):
+        self.id = id
+        self.kind = kind
+        self.status = status
+        self.params = json.loads(params) if params else {}
+        self.done = done
+        self.total = total
+        self.message = message
+        self.result = json.loads(result) if result else None
+        self.error = error
+        self.created = created
+        self.updated = updated
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def fraction(self):
+        return min(1.0, self.done / self.total) if self.total else 0.0
+
+
+class JobStore:
+    """Job rows and per-step checkpoints, shared across sessions and restarts."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT, status TEXT, params TEXT, done INTEGER,"
+            " total INTEGER, message TEXT, result TEXT, error TEXT, created REAL, updated REAL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " job_id TEXT, step INTEGER, value TEXT, PRIMARY KEY (job_id, step))"
+        )
+        self._db.commit()
+
+    def _write(self, sql, args):
+        with self._lock:
+            self._db.execute(sql, args)
+            self._db.commit()
+
+    def create(self, job_id, kind, params):
+        """Insert a queued job unless job_id already exists. Returns its JobRecord."""
+        now = time.time()
+        self._write("INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, 0, 0, '', NULL, NULL, ?, ?)",
+                    (job_id, kind, QUEUED, json.dumps(params), now, now))
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return JobRecord(*row) if row else None
+
+    def set_status(self, job_id, status, result=None, error=None):
+        self._write("UPDATE jobs SET status = ?, result = ?, error = ?, updated = ? WHERE id = ?",
+                    (status, None if result is None else json.dumps(result), error,
+                     time.time(), job_id))
+
+    def progress(self, job_id, done, total, message):
+        self._write("UPDATE jobs SET done = ?, total = ?, message = ?, updated = ? WHERE id = ?",
+                    (done, total, message, time.time(), job_id))
+
+    def unfinished(self, kind):
+        """Jobs of kind that were queued or running when their process stopped."""
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM jobs WHERE kind = ? AND status IN (?, ?)",
+                                    (kind, QUEUED, RUNNING)).fetchall()
+        return [JobRecord(*row) for row in rows]
+
+    def checkpoint(self, job_id, step, value):
+        self._write("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)",
+                    (job_id, step, json.dumps(value)))
+
+    def checkpoints(self, job_id):
+        """{step: value} saved so far for job_id."""
+        with self._lock:
+            rows = self._db.execute("SELECT step, value FROM checkpoints WHERE job_id = ?",
+                                    (job_id,)).fetchall()
+        return {step: json.loads(value) for step, value in rows}
+
+    def clear_checkpoints(self, job_id):
+        self._write("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+
+class JobContext:
+    """What a handler gets: the job's params, its checkpoints and a progress reporter."""
+
+    def __init__(self, store, record):
+        self.store = store
+        self.id = record.id
+        self.params = record.params
+        self.total = record.total
+
+    def checkpoints(self):
+        return self.store.checkpoints(self.id)
+
+    def checkpoint(self, step, value):
+        """Save the JSON-serialisable result of one step (e.g. chunk number)."""
+        self.store.checkpoint(self.id, step, value)
+
+    def progress(self, done, total=None, message=""):
+        if total is not None:
+            self.total = total
+        self.store.progress(self.id, done, self.total, message)
+
+
+class JobQueue:
+    """Runs registered handlers on a thread pool; at most one run per job id at a time.
+
+    Handlers are looked up by kind when a job starts, so a Streamlit rerun can
+    register its freshly defined function again.
+    """
+
+    def __init__(self, store=None, max_workers=MAX_WORKERS):
+        self.store = store or JobStore()
+        self.handlers = {}
+        self._futures = {}
+        self._owners = {}          # job id -> session that submitted it, for its spans
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                        thread_name_prefix="clauseease-job")
+
+    def register(self, kind, handler):
+        """handler(JobContext) does the work and returns a JSON-serialisable result."""
+        self.handlers[kind] = handler
+
+    def _active(self, job_id):
+        future = self._futures.get(job_id)
+        return future is not None and not future.done()
+
+    def submit(self, kind, job_id, params, retry=False):
+        """Start job_id unless it is done, already running here, or failed (pass retry=True).
+        Returns its JobRecord."""
+        with self._lock:
+            record = self.store.create(job_id, kind, params)
+            if record.status == DONE or self._active(job_id):
+                return record
+            if record.status == FAILED and not retry:
+                return record
+            self.store.set_status(job_id, QUEUED)
+            self._owners[job_id] = current_request()[1]
+            self._futures[job_id] = self._pool.submit(self._run, job_id)
+        return self.store.get(job_id)
+
+    def resume(self, kind):
+        """Resubmit jobs of kind left unfinished by an earlier process. Returns how many."""
+        resumed = 0
+        for record in self.store.unfinished(kind):
+            if not self._active(record.id):
+                self.submit(kind, record.id, record.params)
+                resumed += 1
+        return resumed
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _run(self, job_id):
+        record = self.store.get(job_id)
+        handler = self.handlers.get(record.kind)
+        if handler is None:
+            self.store.set_status(job_id, FAILED, error=f"no handler registered for {record.kind!r}")
+            return
+        self.store.set_status(job_id, RUNNING)
+        try:
+            # Job calls queue behind interactive ones; each job takes its own turn among batch
+            # work, while its spans show up in the diagnostics of the session that submitted it
+            with request_class(BATCH, session=f"job:{job_id}"), \
+                    span_session(self._owners.pop(job_id, None)):
+                result = handler(JobContext(self.store, record))
+        except Exception as e:
+            # checkpoints stay, so a retry continues from the last finished step
+            self.store.set_status(job_id, FAILED, error=str(e) or type(e).__name__)
+            return
+        self.store.set_status(job_id, DONE, result=result)
+        self.store.clear_checkpoints(job_id)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide JobQueue shared by all Streamlit sessions."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,55 @@
+"""Deferred imports of heavy dependencies, with a report of what each one cost.
+
+    python -m clauseease.lazy     # cold import time of each heavy dependency
+"""
+import importlib
+import subprocess
+import sys
+import threading
+import time
+
+# Dependencies that take a noticeable share of a second (or more) to import
+HEAVY_MODULES = ("streamlit", "chromadb", "spacy", "langdetect", "textstat", "docx",
+                 "pypdf", "PyPDF2", "numpy", "scipy")
+
+_import_times = {}         # module name -> seconds its first load() took
+_lock = threading.Lock()
+
+
+def load(name):
+    """Import module `name` on first use and remember how long that took."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        _import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def import_report():
+    """[(module, seconds)] for modules imported through load() in this process, slowest first."""
+    with _lock:
+        return sorted(_import_times.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def cold_import_time(name, python=sys.executable):
+    """Seconds a fresh interpreter needs to import name, or None if it is not installed."""
+    code = ("import time; t = time.perf_counter(); import {0}; "
+            "print(time.perf_counter() - t)").format(name)
+    done = subprocess.run([python, "-c", code], capture_output=True, text=True)
+    if done.returncode != 0:
+        return None
+    return float(done.stdout.strip())
+
+
+def main():
+    for name in HEAVY_MODULES:
+        seconds = cold_import_time(name)
+        shown = "not installed" if seconds is None else f"{seconds:.3f}s"
+        print(f"{name:12} {shown}")
+
+
+if __name__ == "__main__":
+    main()
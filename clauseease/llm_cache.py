@@ -0,0 +1,138 @@
+"""Persistent Ollama response cache in SQLite with LRU, size and TTL eviction."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from clauseease.result_cache import CACHE_DIR
+
+DEFAULT_PATH = CACHE_DIR / "llm_responses.sqlite3"
+MAX_ENTRIES = 20000
+MAX_BYTES = 256 * 1024 * 1024
+TTL_SECONDS = 30 * 24 * 3600
+EVICT_EVERY = 50           # run eviction after this many writes
+
+# Set CLAUSEEASE_LLM_CACHE=off to bypass the cache for every call
+ENABLED = os.environ.get("CLAUSEEASE_LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+
+def cache_key(model, prompt, options=None, system=None, format=None):
+    """Stable key for one request: model + options + system/format + prompt."""
+    spec = json.dumps({"model": model, "options": options or {}, "system": system or "",
+                       "format": format or ""}, sort_keys=True)
+    h = hashlib.sha256(spec.encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """Maps cache_key(...) to a stored response dict, shared across sessions and restarts."""
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES,
+                 ttl=TTL_SECONDS, enabled=ENABLED):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, value TEXT, size INTEGER,"
+            " created REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._db.commit()
+        self.evict()
+
+    def get(self, key):
+        """Stored response dict for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM responses WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, model, value):
+        """Store a response dict (must be JSON-serialisable)."""
+        blob = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, blob, len(blob), now, now),
+            )
+            self._db.commit()
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under both limits."""
+        with self._lock:
+            if self.ttl:
+                self._db.execute("DELETE FROM responses WHERE created < ?",
+                                 (time.time() - self.ttl,))
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            if count > self.max_entries or size > self.max_bytes:
+                rows = self._db.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used").fetchall()
+                doomed = []
+                for key, row_size in rows:
+                    if count <= self.max_entries and size <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    count -= 1
+                    size -= row_size
+                self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": count,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide ResponseCache at the default path."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
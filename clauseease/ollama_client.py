@@ -0,0 +1,383 @@
+"""Pooled HTTP client for the local Ollama server, shared by every app."""
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from clauseease.llm_cache import cache_key, get_response_cache
+from clauseease.scheduler import get_scheduler
+from clauseease.tokens import observe
+from clauseease.tracing import get_tracer
+
+# -------------------------
+# CONFIG
+# -------------------------
+DEFAULT_URL = "http://localhost:11434"
+CONNECT_TIMEOUT = 3        # seconds to open the TCP connection
+READ_TIMEOUT = 120         # seconds to wait for a full (non-streamed) answer
+MAX_RETRIES = 2            # extra attempts after the first one
+BACKOFF_SECONDS = 0.5      # doubled after every failed attempt
+POOL_SIZE = int(os.environ.get("CLAUSEEASE_POOL_SIZE", "8"))
+
+# Server not up yet or restarting. A 500 or a read timeout means the model was
+# already working on the prompt, and sending it again only doubles the cost
+RETRY_STATUS = {502, 503, 504}
+
+
+def _base_url():
+    """Read OLLAMA_HOST the same way the ollama CLI does."""
+    host = os.environ.get("OLLAMA_HOST", "").strip()
+    if not host:
+        return DEFAULT_URL
+    if "://" not in host:
+        host = "http://" + host
+    return host.rstrip("/")
+
+
+class OllamaError(Exception):
+    """Raised when Ollama is unreachable or answers with an error."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class OllamaResponse:
+    """Text of one completion plus the token counts and timings Ollama reports."""
+
+    def __init__(self, text, model, prompt_tokens=0, completion_tokens=0,
+                 total_duration=0.0, load_duration=0.0, prompt_eval_duration=0.0,
+                 eval_duration=0.0, wall_time=0.0, ttft=None, cached=False):
+        self.text = text
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_duration = total_duration
+        self.load_duration = load_duration
+        self.prompt_eval_duration = prompt_eval_duration
+        self.eval_duration = eval_duration
+        self.wall_time = wall_time
+        self.ttft = ttft
+        self.cached = cached
+
+    @classmethod
+    def from_json(cls, data, text, wall_time, ttft=None):
+        """Build a response from Ollama's final JSON object (durations are in ns)."""
+        return cls(
+            text=text,
+            model=data.get("model", ""),
+            prompt_tokens=data.get("prompt_eval_count", 0) or 0,
+            completion_tokens=data.get("eval_count", 0) or 0,
+            total_duration=(data.get("total_duration", 0) or 0) / 1e9,
+            load_duration=(data.get("load_duration", 0) or 0) / 1e9,
+            prompt_eval_duration=(data.get("prompt_eval_duration", 0) or 0) / 1e9,
+            eval_duration=(data.get("eval_duration", 0) or 0) / 1e9,
+            wall_time=wall_time,
+            ttft=ttft,
+        )
+
+    @classmethod
+    def from_cache(cls, data):
+        """Rebuild a response stored by the ResponseCache."""
+        fields = ("text", "model", "prompt_tokens", "completion_tokens", "total_duration",
+                  "load_duration", "prompt_eval_duration", "eval_duration", "wall_time")
+        return cls(**{k: data[k] for k in fields if k in data}, cached=True)
+
+    @property
+    def tokens_per_second(self):
+        if not self.eval_duration:
+            return 0.0
+        return self.completion_tokens / self.eval_duration
+
+    def to_dict(self):
+        return {
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_duration": self.total_duration,
+            "load_duration": self.load_duration,
+            "prompt_eval_duration": self.prompt_eval_duration,
+            "eval_duration": self.eval_duration,
+            "wall_time": self.wall_time,
+            "ttft": self.ttft,
+            "tokens_per_second": self.tokens_per_second,
+            "cached": self.cached,
+        }
+
+
+class OllamaStream:
+    """Iterates over the text pieces of a streamed completion as they arrive.
+
+    Once iteration ends, ``response`` holds the OllamaResponse for the whole
+    answer, with ``ttft`` set to the seconds until the first token. The
+    scheduler slot is held until then (or until close()), and the tracing
+    span, if any, ends there too.
+    """
+
+    def __init__(self, http_response, model, start, prompt_chars=0, slot=None, span=None):
+        self._http = http_response
+        self._slot = slot
+        self._span = span
+        self.model = model
+        self.start = start
+        self.prompt_chars = prompt_chars
+        self.ttft = None
+        self.response = None
+
+    def __iter__(self):
+        pieces = []
+        final = {"model": self.model}
+        try:
+            for line in self._http.iter_lines():
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    continue
+                if data.get("error"):
+                    raise OllamaError(f"Ollama error: {data['error']}")
+                piece = data.get("response") or data.get("message", {}).get("content", "")
+                if piece:
+                    if self.ttft is None:
+                        self.ttft = time.perf_counter() - self.start
+                    pieces.append(piece)
+                    yield piece
+                if data.get("done"):
+                    final = data
+                    break
+        except requests.RequestException as e:
+            raise OllamaError(f"Connection error: {e}")
+        finally:
+            self.response = OllamaResponse.from_json(final, "".join(pieces),
+                                                     time.perf_counter() - self.start,
+                                                     ttft=self.ttft)
+            observe(self.model, self.prompt_chars, self.response.prompt_tokens)
+            self.close()
+
+    def close(self):
+        """Drop the connection, free the scheduler slot and end the span, e.g. for a
+        stream never read."""
+        self._http.close()
+        if self._slot is not None:
+            self._slot.release()
+        if self._span is not None:
+            tracer = get_tracer()
+            if self.response is not None:
+                tracer.record_llm(self.response, span=self._span)
+                tracer.finish(self._span, self.response.wall_time)
+            else:
+                tracer.finish(self._span, time.perf_counter() - self.start)
+            self._span = None
+
+
+class OllamaClient:
+    """Keep-alive connection pool with consistent timeouts and retries.
+
+    With a scheduler, every model request first waits for a slot on its model
+    (see clauseease.scheduler); cache hits never queue.
+    """
+
+    def __init__(self, base_url=None, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF_SECONDS, pool_size=POOL_SIZE, cache=None, scheduler=None):
+        self.base_url = (base_url or _base_url()).rstrip("/")
+        self.cache = cache
+        self.scheduler = scheduler
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _timeout(self, timeout):
+        return (self.connect_timeout, timeout or self.read_timeout)
+
+    def _request(self, method, path, payload=None, timeout=None, stream=False):
+        """Send a request, retrying connection failures and 502/503/504 with backoff.
+        Read timeouts are raised at once: the request may still be running in Ollama."""
+        url = f"{self.base_url}{path}"
+        delay = self.backoff
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                r = self.session.request(method, url, json=payload,
+                                         timeout=self._timeout(timeout), stream=stream)
+            except requests.ConnectionError as e:     # includes ConnectTimeout
+                last_error = OllamaError(f"Connection error: {e}")
+            except requests.Timeout as e:
+                raise OllamaError(f"Ollama did not answer within {timeout or self.read_timeout}s: {e}")
+            else:
+                if r.status_code == 200:
+                    return r
+                last_error = OllamaError(f"Ollama error: HTTP {r.status_code} - {r.text}",
+                                         status=r.status_code)
+                r.close()
+                if r.status_code not in RETRY_STATUS:
+                    break
+            if attempt < self.max_retries:
+                time.sleep(delay)
+                delay *= 2
+        raise last_error
+
+    def _acquire(self, payload):
+        """Wait for the scheduler to admit this request's model. Returns a Slot or None."""
+        if self.scheduler is None or not payload or "model" not in payload:
+            return None
+        return self.scheduler.acquire(payload["model"])
+
+    def _slot(self, payload):
+        """_acquire(), recording the queue wait on the current span."""
+        slot = self._acquire(payload)
+        if slot is not None:
+            get_tracer().record_wait(payload["model"], slot.waited)
+        return slot
+
+    def _json(self, method, path, payload=None, timeout=None):
+        slot = self._slot(payload)
+        try:
+            r = self._request(method, path, payload, timeout)
+        finally:
+            if slot is not None:
+                slot.release()
+        try:
+            return r.json()
+        except ValueError as e:
+            raise OllamaError(f"Invalid JSON from Ollama: {e}")
+
+    def version(self, timeout=None):
+        return self._json("GET", "/api/version", timeout=timeout)
+
+    def tags(self, timeout=None):
+        """Names of the models pulled into the local Ollama."""
+        models = self._json("GET", "/api/tags", timeout=timeout).get("models", [])
+        return [m["name"] for m in models]
+
+    def generate(self, prompt, model, options=None, system=None, format=None, timeout=None,
+                 cache=False):
+        """Blocking /api/generate call. Returns an OllamaResponse.
+
+        With cache=True the response cache is consulted first and filled on a
+        miss; pass cache=False (or disable the cache) to bypass it.
+        """
+        tracer = get_tracer()
+        with tracer.span("llm.generate", model=model):
+            store = self.cache if cache and self.cache is not None and self.cache.enabled else None
+            if store is not None:
+                key = cache_key(model, prompt, options, system, format)
+                hit = store.get(key)
+                tracer.record_cache("response", int(hit is not None), int(hit is None))
+                if hit is not None:
+                    response = OllamaResponse.from_cache(hit)
+                    tracer.record_llm(response)
+                    return response
+            payload = {"model": model, "prompt": prompt, "stream": False}
+            if options:
+                payload["options"] = options
+            if system:
+                payload["system"] = system
+            if format:
+                payload["format"] = format
+            start = time.perf_counter()
+            data = self._json("POST", "/api/generate", payload, timeout)
+            response = OllamaResponse.from_json(data, data.get("response", ""),
+                                                time.perf_counter() - start)
+            tracer.record_llm(response)
+            # Real prompt sizes calibrate the token estimates used for chunking
+            observe(model, len(prompt) + len(system or ""), response.prompt_tokens)
+            if store is not None and response.text.strip():
+                store.put(key, model, dict(response.to_dict(), text=response.text))
+            return response
+
+    def generate_stream(self, prompt, model, options=None, system=None, timeout=None):
+        """Streaming /api/generate call. Returns an OllamaStream to iterate over."""
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        if system:
+            payload["system"] = system
+        tracer = get_tracer()
+        slot = self._acquire(payload)
+        # The span ends when the stream does, so it is opened here and finished by the stream
+        span = tracer.open_span("llm.generate_stream", model=model)
+        if slot is not None:
+            tracer.record_wait(model, slot.waited, span=span)
+        start = time.perf_counter()
+        try:
+            r = self._request("POST", "/api/generate", payload, timeout, stream=True)
+        except Exception:
+            if slot is not None:
+                slot.release()
+            tracer.finish(span, time.perf_counter() - start)
+            raise
+        return OllamaStream(r, model, start, len(prompt) + len(system or ""), slot=slot, span=span)
+
+    def chat(self, messages, model, options=None, format=None, timeout=None):
+        """Blocking /api/chat call. Returns an OllamaResponse."""
+        payload = {"model": model, "messages": messages, "stream": False}
+        if options:
+            payload["options"] = options
+        if format:
+            payload["format"] = format
+        tracer = get_tracer()
+        with tracer.span("llm.chat", model=model):
+            start = time.perf_counter()
+            data = self._json("POST", "/api/chat", payload, timeout)
+            text = data.get("message", {}).get("content", "")
+            response = OllamaResponse.from_json(data, text, time.perf_counter() - start)
+            tracer.record_llm(response)
+        observe(model, sum(len(m.get("content", "")) for m in messages), response.prompt_tokens)
+        return response
+
+    def embed(self, texts, model, timeout=None):
+        """Embedding vectors for a batch of texts in one /api/embed request.
+
+        Falls back to one /api/embeddings call per text on Ollama versions
+        that predate the batch endpoint.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        tracer = get_tracer()
+        with tracer.span("llm.embed", model=model, texts=len(texts)):
+            try:
+                data = self._json("POST", "/api/embed", {"model": model, "input": texts}, timeout)
+            except OllamaError as e:
+                if e.status != 404:
+                    raise
+                return [self.embeddings(t, model, timeout) for t in texts]
+            tracer.record_llm(OllamaResponse.from_json(data, "", 0.0))
+        vectors = data.get("embeddings") or []
+        if len(vectors) != len(texts):
+            raise OllamaError(f"Model {model} returned {len(vectors)} embeddings for {len(texts)} inputs")
+        return vectors
+
+    def embeddings(self, text, model, timeout=None):
+        """Embedding vector for one text via /api/embeddings."""
+        payload = {"model": model, "prompt": text}
+        tracer = get_tracer()
+        with tracer.span("llm.embeddings", model=model):
+            data = self._json("POST", "/api/embeddings", payload, timeout)
+            tracer.record_llm(OllamaResponse("", model))
+        if not data.get("embedding"):
+            raise OllamaError(f"Model {model} returned no embedding")
+        return data["embedding"]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url=None):
+    """Process-wide client per base URL, so every session shares one pool."""
+    key = (base_url or _base_url()).rstrip("/")
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = OllamaClient(key, cache=get_response_cache(), scheduler=get_scheduler())
+        return _clients[key]
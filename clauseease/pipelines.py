@@ -0,0 +1,326 @@
+"""Each app's document pipeline: extraction options, chunking, retrieval and prompts.
+
+The Streamlit scripts and clauseease.benchmark both call these, so the
+benchmark measures the code the apps run. Nothing here imports Streamlit;
+widgets, session state and error display stay in the scripts.
+"""
+import re
+
+from clauseease.bm25 import BM25Index
+from clauseease.chunking import chunk_spans, chunk_view, iter_char_chunks
+from clauseease.concurrency import imap_unordered
+from clauseease.context import build_context
+from clauseease.extraction import (iter_docx_paragraphs, iter_pdf_pages, iter_text_lines,
+                                   join_records)
+from clauseease.retrieval import HybridRetriever
+from clauseease.tfidf import TfidfRetriever
+from clauseease.tokens import (chunk_token_budget, context_window, default_num_ctx, estimate_tokens,
+                               tokens_to_chars)
+
+
+class ChatbotPipeline:
+    """chatbot.py: token chunks of half num_ctx, each translated and summarized."""
+
+    model = "tinyllama"
+
+    def __init__(self, model=None):
+        self.model = model or self.model
+        self.num_ctx = default_num_ctx(self.model)
+        self.chunk_tokens = chunk_token_budget(self.model)   # the rest holds the prompt and summary
+        self.options = {"num_ctx": self.num_ctx}
+
+    def extract(self, source):
+        return join_records(iter_pdf_pages(source))
+
+    def chunk(self, text, size=None):
+        return list(chunk_view(text, "token", size or self.chunk_tokens, model=self.model))
+
+    @staticmethod
+    def summary_prompt(chunk):
+        return f"""
+            Translate the following text to English and summarize it clearly:
+
+            {chunk}
+            """
+
+
+class KrushnaPipeline:
+    """Krushna Chaudhari's app: token chunks, per-chunk simplification, glossary,
+    BM25 over the document's sentences for Q&A."""
+
+    model = "tinyllama"
+    translate_simplify_schema = {
+        "type": "object",
+        "properties": {"translation": {"type": "string"}, "simplified": {"type": "string"}},
+        "required": ["translation", "simplified"],
+    }
+
+    def __init__(self, model=None):
+        self.model = model or self.model
+        # Chunks are sized in the model's tokens: half of num_ctx, leaving room for the prompt and answer
+        self.chunk_tokens = chunk_token_budget(self.model)
+        self.options = {"num_ctx": default_num_ctx(self.model)}
+
+    # The readers take a path or the uploaded file object itself, so the upload is not copied
+    @staticmethod
+    def extract(source, name):
+        if name.lower().endswith(".docx"):
+            return join_records(iter_docx_paragraphs(source), trailing=False)
+        if name.lower().endswith(".pdf"):
+            return join_records(iter_pdf_pages(source), trailing=False)
+        return join_records(iter_text_lines(source), trailing=False)
+
+    def chunk(self, text, chunk_tokens=None):
+        return chunk_view(text, "token", chunk_tokens or self.chunk_tokens, model=self.model)
+
+    @staticmethod
+    def sentences(text):
+        return re.split(r'(?<=[.!?])\s+', text)
+
+    @staticmethod
+    def simplify_prompt(chunk):
+        return (
+            "You are an assistant that simplifies legal/contract text into plain English. "
+            "Produce a short, clear, bullet or paragraph style summary preserving meaning and important terms.\n\n"
+            f"Text:\n{chunk}\n\nSimplified:"
+        )
+
+    @staticmethod
+    def translate_simplify_prompt(chunk):
+        return (
+            "Translate the following text into clear, natural English while preserving legal terms and meaning. "
+            "Then simplify that translation into plain English: a short, clear, bullet or paragraph style summary "
+            "preserving meaning and important terms. "
+            'Answer as JSON with the keys "translation" and "simplified".\n\n'
+            f"Text:\n{chunk}\n\nJSON:"
+        )
+
+    @staticmethod
+    def glossary_candidates(text, top_n=20):
+        """Most frequent capitalized words/phrases, most frequent first."""
+        candidates = re.findall(r'\b[A-Z][A-Za-z]{2,}(?:\s+[A-Z][A-Za-z]{2,}){0,3}\b', text)
+        freq = {}
+        for c in candidates:
+            freq[c] = freq.get(c, 0) + 1
+        return [t for t, _ in sorted(freq.items(), key=lambda x: x[1], reverse=True)[:top_n]]
+
+    @classmethod
+    def sentence_index(cls, simplified, translated, original):
+        """Split the document into sentences once and index them for Q&A.
+        Returns {"sentences": [...], "bm25": BM25Index keyed by sentence number}."""
+        corpus = (simplified or '') + "\n\n" + (translated or '') + "\n\n" + (original or '')
+        sents = [s for s in cls.sentences(corpus) if s.strip()]
+        index = BM25Index()
+        for i, s in enumerate(sents):
+            index.add(i, s)
+        return {"sentences": sents, "bm25": index}
+
+    @staticmethod
+    def search(sentence_index, question, k=6):
+        """The k best-matching sentences, joined."""
+        return " ".join(sentence_index["sentences"][i] for i, _ in sentence_index["bm25"].search(question, k=k))
+
+    @staticmethod
+    def answer_prompt(context, question):
+        return ("Answer the question concisely (1-3 sentences) using ONLY the context below. "
+                f"If uncertain, say 'Not mentioned'.\n\nContext:\n{context}\n\nQuestion: {question}\nAnswer:")
+
+
+class ShamruthaPipeline:
+    """Shamrutha S's app: paragraph chunks, TF-IDF top 3, streamed answer."""
+
+    model = "tinyllama"
+    chunk_chars = 1000
+    top_k = 3
+
+    def __init__(self, model=None):
+        self.model = model or self.model
+
+    @staticmethod
+    def extract_pdf(source):
+        return join_records(iter_pdf_pages(source), separator="")
+
+    @staticmethod
+    def extract_docx(source):
+        return join_records(iter_docx_paragraphs(source), trailing=False)
+
+    def chunk(self, text, max_chars=None):
+        # Whole paragraphs packed up to max_chars; longer paragraphs are split, never dropped
+        return chunk_view(text, "paragraph", max_chars or self.chunk_chars)
+
+    @staticmethod
+    def retriever(chunks):
+        return TfidfRetriever(chunks)
+
+    def relevant_chunks(self, query, chunks, retriever, top_k=None):
+        top_k = top_k or self.top_k
+        hits = retriever.top_k(query, top_k)
+        # Nothing in common with the query: fall back to the opening chunks
+        if not hits:
+            return chunks[:top_k]
+        return [chunks[i] for i, _ in hits]
+
+    @staticmethod
+    def prompt(query, context_text):
+        return f"Context:\n{context_text}\n\nUser Query:\n{query}\n\nAnswer based only on the context above."
+
+
+class PreetiPipeline:
+    """Preeti Gupta's app: overlapping word chunks, BM25 context packed into a token budget."""
+
+    model = "llama3.2"
+    chunk_size = 500
+    overlap = 50
+    context_fraction = 0.6     # share of num_ctx for document chunks; the rest is question and answer
+
+    def __init__(self, model=None):
+        self.model = model or self.model
+
+    @staticmethod
+    def extract_pdf(source):
+        return join_records(iter_pdf_pages(source), separator="",
+                            header=lambda page: f"\n--- Page {page.number + 1} ---\n")
+
+    @staticmethod
+    def extract_docx(source):
+        return join_records(iter_docx_paragraphs(source))
+
+    def chunk(self, text, chunk_size=None, overlap=None):
+        """Overlapping word chunks, as (start, end) spans into text."""
+        return chunk_spans(text, "word", chunk_size or self.chunk_size,
+                           self.overlap if overlap is None else overlap)
+
+    def num_ctx(self, model=None):
+        return default_num_ctx(model or self.model)
+
+    def context_budget(self, model=None):
+        return int(self.num_ctx(model) * self.context_fraction)
+
+    @staticmethod
+    def chunk_index(chunk_ids, texts):
+        index = BM25Index()
+        for chunk_id, text in zip(chunk_ids, texts):
+            index.add(chunk_id, text)
+        return index
+
+    @staticmethod
+    def format_chunk(chunk_id, word_count, text):
+        """Chunk block as it appears in the prompt."""
+        return f"\n\n{'='*50}\n**[Chunk {chunk_id}]** ({word_count} words)\n{'='*50}\n{text}\n"
+
+    @classmethod
+    def select_chunks(cls, question, texts, index, budget):
+        """(chunk ids, tokens used): the most relevant chunks that fit budget with their labels."""
+        label_tokens = estimate_tokens(cls.format_chunk(0, 0, ''))
+        return build_context(question, texts, index, budget, overhead=label_tokens)
+
+    @classmethod
+    def document_context(cls, filename, total_words, chunk_ids, texts, word_counts):
+        context = f"""
+📄 **Document Context Available:**
+- Filename: {filename}
+- Total Words: {total_words:,}
+- Total Chunks: {len(texts)}
+
+**Most Relevant Document Chunks ({len(chunk_ids)} of {len(texts)}):**
+"""
+        for i in chunk_ids:
+            context += cls.format_chunk(i, word_counts[i], texts[i])
+        return context
+
+    @staticmethod
+    def document_prompt(doc_context, question):
+        return f"""{doc_context}
+
+**User Question:** {question}
+
+**Instructions:**
+- Provide complete, detailed information from the document
+- List ALL items, courses, or options mentioned
+- Use bullet points for clarity
+- Include all relevant details (codes, names, requirements)
+- If asking about a specific chunk, provide ALL content from that chunk
+- Be thorough and comprehensive
+- Don't truncate or summarize unless asked
+
+**Answer:**"""
+
+    @staticmethod
+    def general_prompt(question):
+        return f"""**User Question:** {question}
+
+**Instructions:**
+- Provide clear, comprehensive answers
+- Support multiple languages
+- Be helpful and informative
+
+**Answer:**"""
+
+
+class RagPipeline:
+    """Mudit Sharma's RAG app: character chunks embedded into Chroma, hybrid BM25 + dense retrieval."""
+
+    model = "llama3:latest"
+    embedding_model = "nomic-embed-text"
+    max_top_k = 10             # most chunks one question can pull into the prompt
+    embed_batch_size = 32      # chunks per /api/embed request
+
+    def __init__(self, model=None, embedding_model=None):
+        self.model = model or self.model
+        self.embedding_model = embedding_model or self.embedding_model
+        self.num_ctx = default_num_ctx(self.model)
+
+    def chunk_tokens(self):
+        """Tokens per chunk: max_top_k chunks fill half the chat window, and one chunk fits the embedding model."""
+        return min(chunk_token_budget(self.model) // self.max_top_k, context_window(self.embedding_model))
+
+    def chunk_size(self):
+        """chunk_tokens() in characters, at the model's current calibrated chars-per-token ratio."""
+        return tokens_to_chars(self.chunk_tokens(), self.model)
+
+    @staticmethod
+    def chunk_records(records, chunk_size):
+        """Character chunks built record by record, without joining the whole document first."""
+        return list(iter_char_chunks(records, chunk_size, chunk_size // 10))
+
+    def chunk_pdf(self, source, chunk_size):
+        return self.chunk_records(iter_pdf_pages(source), chunk_size)
+
+    def store_chunks(self, index, doc_id, name, chunks, todo, embed, parallel, on_stored=None):
+        """Embed the chunks numbered in todo, several batches at once, writing each batch to
+        index as it finishes. on_stored(n) sees each stored batch's size. Returns the first
+        error, or None."""
+        batches = [todo[s:s + self.embed_batch_size] for s in range(0, len(todo), self.embed_batch_size)]
+        embed_batch = lambda idxs: embed([chunks[i] for i in idxs])
+        first_error = None
+        for b, embeddings, error in imap_unordered(embed_batch, batches, parallel):
+            if error is not None:
+                first_error = first_error or error
+                continue
+            idxs = batches[b]
+            index.add_chunks(doc_id, name, idxs, [chunks[i] for i in idxs], embeddings, len(chunks))
+            if on_stored:
+                on_stored(len(idxs))
+        return first_error
+
+    @staticmethod
+    def add_sparse(bm25, index, doc_id, chunks):
+        for i, chunk in enumerate(chunks):
+            bm25.add(index.chunk_id(doc_id, i), chunk)
+
+    @staticmethod
+    def retriever(index, bm25, embed, sparse_weight=0.5):
+        return HybridRetriever(index, bm25, embed, sparse_weight=sparse_weight)
+
+    @staticmethod
+    def prompt(context_text, question):
+        return f"""
+    You are a helpful assistant. Answer the question based ONLY on the following context.
+    If the answer is not in the context, say you don't know.
+
+    Context:
+    {context_text}
+
+    Question: 
+    {question}
+    """
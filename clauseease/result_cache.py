@@ -0,0 +1,153 @@
+"""Content-hash keyed result cache: a bounded in-memory LRU over one JSON file per key on disk."""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get("CLAUSEEASE_CACHE_DIR",
+                                Path(__file__).resolve().parent.parent / ".clauseease_cache"))
+MEMORY_ENTRIES = 64                # values kept in memory per namespace
+MEMORY_BYTES = 64 * 1024 * 1024    # ... and at most this much of their JSON
+MAX_ENTRIES = 5000                 # files kept on disk per namespace
+MAX_BYTES = 512 * 1024 * 1024
+TTL_SECONDS = 30 * 24 * 3600       # files unused this long are dropped
+EVICT_EVERY = 50                   # run disk eviction after this many writes
+
+
+def content_hash(*parts):
+    """sha256 over bytes/str parts, e.g. the uploaded file plus the settings used."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResultCache:
+    """JSON-serialisable results per key: an in-memory LRU first, then one file per key.
+
+    The memory layer holds at most memory_entries values and memory_bytes of
+    their JSON. On disk, files unused for ttl seconds are dropped, then the
+    least recently used ones until under max_entries and max_bytes.
+    """
+
+    def __init__(self, namespace, directory=CACHE_DIR, memory_entries=MEMORY_ENTRIES,
+                 memory_bytes=MEMORY_BYTES, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES,
+                 ttl=TTL_SECONDS):
+        self.directory = Path(directory) / namespace
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_entries = memory_entries
+        self.memory_bytes = memory_bytes
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()   # key -> (value, JSON size), least recently used first
+        self._memory_size = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.evict()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def _remember(self, key, value, size):
+        """Put value at the recent end of the memory layer, then trim the old end."""
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= old[1]
+            self._memory[key] = (value, size)
+            self._memory_size += size
+            while self._memory and (len(self._memory) > self.memory_entries
+                                    or self._memory_size > self.memory_bytes):
+                self._memory_size -= self._memory.popitem(last=False)[1][1]
+
+    def get(self, key):
+        """Cached value for key, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key][0]
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if self.ttl and time.time() - stat.st_mtime > self.ttl:
+                path.unlink()
+                return None
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)     # the file's mtime is its last use, for eviction
+        except (OSError, ValueError):
+            return None
+        self._remember(key, value, stat.st_size)
+        return value
+
+    def put(self, key, value):
+        """Store value in memory and write it to disk atomically."""
+        blob = json.dumps(value)
+        self._remember(key, value, len(blob))
+        tmp = self._path(key).with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(blob)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def update(self, key, **fields):
+        """Merge fields into the record for key (creating it if needed)."""
+        value = dict(self.get(key) or {})
+        value.update(fields)
+        self.put(key, value)
+        return value
+
+    def evict(self):
+        """Drop expired files, then least recently used ones until under both limits."""
+        now = time.time()
+        files = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if self.ttl and now - stat.st_mtime > self.ttl:
+                self._forget(path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+        count = len(files)
+        size = sum(f[1] for f in files)
+        for _, file_size, path in sorted(files, key=lambda f: f[0]):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            self._forget(path)
+            count -= 1
+            size -= file_size
+
+    def _forget(self, path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        with self._lock:
+            old = self._memory.pop(path.stem, None)
+            if old is not None:
+                self._memory_size -= old[1]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(namespace):
+    """Process-wide ResultCache per namespace, shared by all Streamlit sessions."""
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = ResultCache(namespace)
+        return _caches[namespace]
@@ -0,0 +1,76 @@
+"""Hybrid BM25 + vector retrieval with reciprocal rank fusion."""
+import re
+
+RRF_K = 60                 # damping constant from the original RRF paper
+CANDIDATES = 20            # hits taken from each retriever before fusion
+
+# Clause numbers ("12.3"), "Section 4" style references and quoted phrases
+EXACT_TERM_RE = re.compile(
+    r'"[^"]+"|\b\d+(?:\.\d+)+\b|\b(?:clause|section|article|schedule|annex)\s+\d+', re.I)
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=RRF_K):
+    """Fuse best-first key lists. Returns [(key, score)], best first."""
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank + 1)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def is_exact_term_query(query):
+    return bool(EXACT_TERM_RE.search(query))
+
+
+def sync_sparse_index(index, bm25):
+    """Add chunks that are in the DocumentIndex but missing from bm25. Returns how many."""
+    known = {key.split(":", 1)[0] for key in bm25.lengths}
+    added = 0
+    for doc_id in index.documents():
+        if doc_id in known:
+            continue
+        got = index.collection.get(where={"doc_id": doc_id}, include=["documents"])
+        for chunk_id, text in zip(got["ids"], got["documents"]):
+            bm25.add(chunk_id, text)
+            added += 1
+    return added
+
+
+class HybridRetriever:
+    """Ranks chunks of a DocumentIndex by BM25 and by embedding similarity, then fuses.
+
+    sparse_weight runs from 0 (dense only) to 1 (BM25 only). Queries with exact
+    terms such as clause numbers are answered from BM25 alone when it has hits,
+    which also skips the query-embedding request.
+    """
+
+    def __init__(self, index, bm25, embed_fn, sparse_weight=0.5, candidates=CANDIDATES,
+                 rrf_k=RRF_K):
+        self.index = index
+        self.bm25 = bm25
+        self.embed_fn = embed_fn
+        self.sparse_weight = sparse_weight
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def retrieve(self, query, k=3, doc_ids=None):
+        """Top-k (chunk_id, text, metadata) triples, best first."""
+        wanted = set(doc_ids or ())
+        keep = (lambda key: key.split(":", 1)[0] in wanted) if wanted else None
+        sparse = []
+        if self.sparse_weight > 0:
+            sparse = [key for key, _ in self.bm25.search(query, self.candidates, keep)]
+        if self.sparse_weight >= 1 or (sparse and is_exact_term_query(query)):
+            return self.index.get_chunks(sparse[:k])
+
+        dense = self.index.query(self.embed_fn(query), self.candidates, doc_ids)
+        if not sparse:
+            return dense[:k]
+        fused = reciprocal_rank_fusion(
+            [[hit[0] for hit in dense], sparse],
+            [1.0 - self.sparse_weight, self.sparse_weight], self.rrf_k)
+        top = [key for key, _ in fused[:k]]
+        hits = {hit[0]: hit for hit in dense}
+        hits.update((hit[0], hit) for hit in self.index.get_chunks([key for key in top if key not in hits]))
+        return [hits[key] for key in top if key in hits]
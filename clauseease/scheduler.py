@@ -0,0 +1,238 @@
+"""Process-wide admission control in front of Ollama.
+
+Every request waits here for a slot on its model. Interactive requests (chat,
+Q&A) are admitted before batch ones (summaries, glossaries, indexing jobs),
+and batch work may never take the last INTERACTIVE_RESERVE slots of a model,
+so a question waits for at most the other questions, not for a 200-chunk
+summarization. Within a priority class, sessions take turns one request at a
+time, so one session's fan-out cannot starve another session.
+
+The priority and session of a request come from the calling context:
+
+    with request_class(BATCH):
+        summarizer.map(chunks)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from clauseease.concurrency import default_parallelism
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+INTERACTIVE_RESERVE = 1    # slots per model that only interactive requests may use
+WAIT_SAMPLES = 512         # recent queue waits kept per model and priority for percentiles
+
+_request = ContextVar("clauseease_request", default=(INTERACTIVE, None))
+_KEEP = object()
+
+
+@contextmanager
+def request_class(priority, session=_KEEP):
+    """Run the block's Ollama requests with this priority (and session, if given)."""
+    _, current_session = _request.get()
+    token = _request.set((priority, current_session if session is _KEEP else session))
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+def set_session(session):
+    """Tag the rest of the current thread's requests with session (e.g. a Streamlit session id)."""
+    priority, _ = _request.get()
+    _request.set((priority, session))
+
+
+def current_request():
+    """(priority, session) that a request made here would be queued under."""
+    return _request.get()
+
+
+def model_caps(spec=None):
+    """{model: max concurrent requests} from CLAUSEEASE_MODEL_CAPS, e.g. "llama3:latest=2,nomic-embed-text=8"."""
+    spec = os.environ.get("CLAUSEEASE_MODEL_CAPS", "") if spec is None else spec
+    caps = {}
+    for item in spec.split(","):
+        model, _, value = item.strip().rpartition("=")
+        if model and value.strip().isdigit():
+            caps[model.strip()] = max(1, int(value))
+    return caps
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class Slot:
+    """An admitted request; release() (or leaving the with block) frees the slot.
+    waited is how many seconds the request was queued."""
+
+    __slots__ = ("_scheduler", "_lane", "_priority", "_released", "waited")
+
+    def __init__(self, scheduler, lane, priority, waited=0.0):
+        self._scheduler = scheduler
+        self._lane = lane
+        self._priority = priority
+        self._released = False
+        self.waited = waited
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self._lane, self._priority)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Waiter:
+    __slots__ = ("event", "enqueued", "waited")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.enqueued = time.perf_counter()
+        self.waited = 0.0
+
+
+class _Lane:
+    """Slots and waiting requests of one model."""
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.running = {p: 0 for p in PRIORITY_NAMES}
+        # priority -> {session: deque of waiters}; sessions rotate to the back after each turn
+        self.waiting = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self.queued = {p: 0 for p in PRIORITY_NAMES}
+        self.peak_queued = {p: 0 for p in PRIORITY_NAMES}
+        self.served = {p: 0 for p in PRIORITY_NAMES}
+        self.waits = {p: deque(maxlen=WAIT_SAMPLES) for p in PRIORITY_NAMES}
+
+    def admits(self, priority):
+        """Whether a request of this priority may start now."""
+        busy = sum(self.running.values())
+        if priority == INTERACTIVE:
+            return busy < self.cap
+        reserve = min(INTERACTIVE_RESERVE, self.cap - 1)
+        return busy < self.cap - reserve and not self.queued[INTERACTIVE]
+
+    def next_waiter(self):
+        """Pop the waiter to admit next, or None: interactive first, sessions in turn."""
+        for priority in sorted(PRIORITY_NAMES):
+            sessions = self.waiting[priority]
+            if not sessions or not self.admits(priority):
+                continue
+            session, waiters = next(iter(sessions.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                sessions.move_to_end(session)
+            else:
+                del sessions[session]
+            self.queued[priority] -= 1
+            return priority, waiter
+        return None
+
+
+class OllamaScheduler:
+    """Per-model concurrency caps with priority classes and per-session fair queuing."""
+
+    def __init__(self, default_cap=None, caps=None):
+        self.default_cap = max(1, default_cap or default_parallelism())
+        self.caps = dict(caps or {})
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def set_cap(self, model, cap):
+        """Change how many requests model may have in flight (takes effect on the next admission)."""
+        with self._lock:
+            self.caps[model] = max(1, cap)
+            if model in self._lanes:
+                self._lanes[model].cap = self.caps[model]
+                self._dispatch(self._lanes[model])
+
+    def _lane(self, model):
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = self._lanes[model] = _Lane(self.caps.get(model, self.default_cap))
+        return lane
+
+    def acquire(self, model, priority=None, session=_KEEP):
+        """Block until a request for model may start. Returns a Slot to release afterwards.
+        priority and session default to the calling context (see request_class)."""
+        context_priority, context_session = _request.get()
+        priority = context_priority if priority is None else priority
+        session = context_session if session is _KEEP else session
+        with self._lock:
+            lane = self._lane(model)
+            if not lane.waiting[priority] and lane.admits(priority):
+                self._start(lane, priority, 0.0)
+                return Slot(self, lane, priority)
+            waiter = _Waiter()
+            lane.waiting[priority].setdefault(session, deque()).append(waiter)
+            lane.queued[priority] += 1
+            lane.peak_queued[priority] = max(lane.peak_queued[priority], lane.queued[priority])
+        waiter.event.wait()
+        return Slot(self, lane, priority, waiter.waited)
+
+    def _start(self, lane, priority, waited):
+        lane.running[priority] += 1
+        lane.served[priority] += 1
+        lane.waits[priority].append(waited)
+
+    def _dispatch(self, lane):
+        """Admit waiters while slots are free. Caller holds the lock."""
+        while True:
+            picked = lane.next_waiter()
+            if picked is None:
+                return
+            priority, waiter = picked
+            waiter.waited = time.perf_counter() - waiter.enqueued
+            self._start(lane, priority, waiter.waited)
+            waiter.event.set()
+
+    def _release(self, lane, priority):
+        with self._lock:
+            lane.running[priority] -= 1
+            self._dispatch(lane)
+
+    def stats(self):
+        """One dict per model and priority: cap, running, queued, peak queued, served and wait percentiles."""
+        rows = []
+        with self._lock:
+            for model, lane in sorted(self._lanes.items()):
+                for priority, name in PRIORITY_NAMES.items():
+                    waits = list(lane.waits[priority])
+                    rows.append({
+                        "model": model,
+                        "priority": name,
+                        "cap": lane.cap,
+                        "running": lane.running[priority],
+                        "queued": lane.queued[priority],
+                        "peak_queued": lane.peak_queued[priority],
+                        "served": lane.served[priority],
+                        "wait_p50": _percentile(waits, 0.50),
+                        "wait_p95": _percentile(waits, 0.95),
+                        "wait_max": max(waits, default=0.0),
+                    })
+        return rows
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler shared by every client and session."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = OllamaScheduler(caps=model_caps())
+        return _scheduler
@@ -0,0 +1,93 @@
+"""Hierarchical map-reduce summarization for long documents."""
+from clauseease.concurrency import map_ordered
+from clauseease.scheduler import BATCH, request_class
+
+MAP_PROMPT = (
+    "Translate the following text to English if needed and summarize it clearly. "
+    "Keep parties, obligations, amounts and dates.\n\n{text}\n\nSummary:"
+)
+REDUCE_PROMPT = (
+    "Combine the partial summaries below into one summary of at most {words} words. "
+    "Keep parties, obligations, amounts and dates; drop anything repeated.\n\n{text}\n\nSummary:"
+)
+TARGET_CHARS = 4000        # stop reducing once the joined summaries fit in this
+GROUP_SIZE = 4             # summaries merged by one reduce call
+MAX_LEVELS = 6
+
+
+class MapReduceSummarizer:
+    """Summarize chunks, then summarize groups of summaries level by level.
+
+    Every call goes through the client's response cache, so intermediate map and
+    reduce results are reused when the same document (or the same boilerplate)
+    is summarized again. Calls within a level run in parallel.
+
+    A failed call keeps its input text; errors then holds the exceptions of the
+    last map(), reduce() or summarize(), so callers can avoid storing a result
+    that a retry would improve.
+    """
+
+    def __init__(self, client, model, target_chars=TARGET_CHARS, group_size=GROUP_SIZE,
+                 max_workers=None, map_prompt=MAP_PROMPT, reduce_prompt=REDUCE_PROMPT,
+                 max_levels=MAX_LEVELS, cache=True, options=None):
+        self.client = client
+        self.model = model
+        self.target_chars = target_chars
+        self.group_size = max(2, group_size)
+        self.max_workers = max_workers
+        self.map_prompt = map_prompt
+        self.reduce_prompt = reduce_prompt
+        self.max_levels = max_levels
+        self.cache = cache
+        self.options = options
+        self.levels = 0
+        self.errors = []
+
+    def _call(self, prompt):
+        return self.client.generate(prompt, model=self.model, options=self.options,
+                                    cache=self.cache).text.strip()
+
+    def _run(self, fn, items, fallbacks, on_done):
+        # Bulk work: chat questions from any session are served first
+        with request_class(BATCH):
+            results, errors = map_ordered(fn, items, self.max_workers, on_done)
+        self.errors.extend(err for err in errors if err is not None)
+        # A failed or empty call keeps its input text, so nothing is silently dropped
+        return [r if (err is None and r) else fb for r, err, fb in zip(results, errors, fallbacks)]
+
+    def map(self, chunks, on_done=None):
+        """One summary per chunk, in document order."""
+        self.errors = []
+        return self._run(lambda c: self._call(self.map_prompt.format(text=c)),
+                         chunks, chunks, on_done)
+
+    def _fits(self, summaries):
+        return sum(len(s) for s in summaries) + 2 * len(summaries) <= self.target_chars
+
+    def reduce(self, summaries, on_level=None):
+        """Merge summaries group by group until they fit target_chars (or max_levels)."""
+        summaries = [s for s in summaries if s and s.strip()]
+        words = max(50, self.target_chars // 6)
+        self.levels = 0
+        self.errors = []
+        while summaries and not self._fits(summaries) and self.levels < self.max_levels:
+            groups = [summaries[i:i + self.group_size]
+                      for i in range(0, len(summaries), self.group_size)]
+            joined = ["\n\n".join(g) for g in groups]
+            summaries = self._run(
+                lambda text: self._call(self.reduce_prompt.format(text=text, words=words)),
+                joined, joined, None)
+            self.levels += 1
+            if on_level:
+                on_level(self.levels, len(summaries))
+            if len(groups) == 1 and len(summaries[0]) >= len(joined[0]):
+                break   # the model is not shrinking the text any more
+        return "\n\n".join(summaries)
+
+    def summarize(self, chunks, on_done=None, on_level=None):
+        """Map every chunk, then reduce. Returns the final summary text."""
+        summaries = self.map(chunks, on_done)
+        map_errors = self.errors
+        summary = self.reduce(summaries, on_level)
+        self.errors = map_errors + self.errors
+        return summary
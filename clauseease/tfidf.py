@@ -0,0 +1,63 @@
+"""Sparse TF-IDF retrieval over document chunks (NumPy/SciPy)."""
+from clauseease.bm25 import tokenize
+from clauseease.lazy import load
+
+
+class TfidfRetriever:
+    """Built once per document: an L2-normalised sublinear TF-IDF chunk matrix.
+
+    The matrix is stored column-major, so a query only touches the columns of
+    its own terms, and top-k uses argpartition instead of a full sort.
+    """
+
+    def __init__(self, chunks):
+        np = load("numpy")
+        vocab = {}
+        rows, cols, counts = [], [], []
+        for i, chunk in enumerate(chunks):
+            tf = {}
+            for t in tokenize(chunk):
+                tf[t] = tf.get(t, 0) + 1
+            for t, c in tf.items():
+                rows.append(i)
+                cols.append(vocab.setdefault(t, len(vocab)))
+                counts.append(c)
+        n_docs = len(chunks)
+        cols = np.asarray(cols, dtype=np.int64)
+        df = np.bincount(cols, minlength=len(vocab))
+        self.vocab = vocab
+        self.n_chunks = n_docs
+        self.idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+        weights = (1 + np.log(np.asarray(counts, dtype=np.float32))) * self.idf[cols]
+        sparse = load("scipy.sparse")      # imported with the first document, not at app start
+        matrix = sparse.csr_matrix((weights, (rows, cols)), shape=(n_docs, len(vocab)),
+                                   dtype=np.float32)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        self.matrix = sparse.diags(1 / norms).dot(matrix).tocsc()
+
+    def scores(self, query):
+        """Cosine similarity of the query against every chunk (dense array)."""
+        np = load("numpy")
+        tf = {}
+        for t in tokenize(query):
+            j = self.vocab.get(t)
+            if j is not None:
+                tf[j] = tf.get(j, 0) + 1
+        if not tf:
+            return np.zeros(self.n_chunks, dtype=np.float32)
+        cols = np.fromiter(tf.keys(), dtype=np.int64)
+        q = (1 + np.log(np.fromiter(tf.values(), dtype=np.float32))) * self.idf[cols]
+        q /= np.linalg.norm(q)
+        return self.matrix[:, cols].dot(q)
+
+    def top_k(self, query, k=3):
+        """[(chunk index, score)] for the k best chunks with a non-zero score."""
+        np = load("numpy")
+        scores = self.scores(query)
+        k = min(k, self.n_chunks)
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best if scores[i] > 0]
@@ -0,0 +1,102 @@
+"""Token estimates and context-window sizes for the local models.
+
+The chars-per-token ratio starts at CHARS_PER_TOKEN and is calibrated per
+model from the prompt_eval_count Ollama reports for real prompts.
+"""
+import re
+import threading
+
+# Context window each model was trained with. Ollama itself only allocates
+# num_ctx tokens (2048 unless told otherwise), so prompts must fit that.
+MODEL_CONTEXT = {
+    "tinyllama": 2048,
+    "phi3": 4096,
+    "llama2": 4096,
+    "llama3": 8192,
+    "llama3.1": 131072,
+    "llama3.2": 131072,
+    "gemma2": 8192,
+    "mistral": 32768,
+    "qwen2.5": 32768,
+    "nomic-embed-text": 8192,
+    "mxbai-embed-large": 512,
+    "all-minilm": 256,
+}
+DEFAULT_CONTEXT = 2048
+MAX_NUM_CTX = 8192         # larger windows cost too much RAM on our CPU boxes
+CHARS_PER_TOKEN = 4.0      # typical for English with llama-style BPE vocabularies
+CHUNK_FRACTION = 0.5       # share of num_ctx one document chunk may fill; the rest is prompt + answer
+MIN_SAMPLES = 3            # prompts seen before a model's calibrated ratio is trusted
+# Calibrated ratios are kept in this range: prompt templates, prompt caching and
+# tiny prompts can all skew a single observation
+RATIO_BOUNDS = (2.0, 5.0)
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]+")
+_calibration = {}          # base model name -> [prompts, chars, tokens]
+_calibration_lock = threading.Lock()
+
+
+def _base(model):
+    return model.split(":")[0].lower()
+
+
+def context_window(model):
+    """Trained context length for an Ollama model name such as "llama3:latest"."""
+    return MODEL_CONTEXT.get(_base(model), DEFAULT_CONTEXT)
+
+
+def default_num_ctx(model):
+    """num_ctx to request from Ollama for model."""
+    return min(context_window(model), MAX_NUM_CTX)
+
+
+def observe(model, chars, prompt_tokens):
+    """Record that a prompt of chars characters cost prompt_tokens tokens on model."""
+    if not model or chars <= 0 or prompt_tokens <= 0:
+        return
+    with _calibration_lock:
+        seen = _calibration.setdefault(_base(model), [0, 0, 0])
+        seen[0] += 1
+        seen[1] += chars
+        seen[2] += prompt_tokens
+
+
+def chars_per_token(model=None):
+    """Calibrated chars-per-token ratio for model, or CHARS_PER_TOKEN until enough prompts were seen."""
+    seen = _calibration.get(_base(model)) if model else None
+    if not seen or seen[0] < MIN_SAMPLES:
+        return CHARS_PER_TOKEN
+    low, high = RATIO_BOUNDS
+    return min(max(seen[1] / seen[2], low), high)
+
+
+def estimate_tokens(text, model=None):
+    """Rough token count: the larger of the char-based and word/punctuation-based guesses."""
+    if not text:
+        return 0
+    return estimate_from_counts(len(text), len(_WORD_RE.findall(text)), chars_per_token(model))
+
+
+def estimate_from_counts(chars, pieces, ratio):
+    """estimate_tokens() of a text with chars characters and pieces word/punctuation pieces."""
+    return max(int(chars / ratio + 0.5), pieces)
+
+
+def word_tokens(word):
+    """Word/punctuation pieces in one whitespace-free word (the lower bound estimate_tokens uses)."""
+    return len(_WORD_RE.findall(word))
+
+
+def piece_spans(text, start, end):
+    """(start, end) of each word/punctuation piece in text[start:end]."""
+    return [m.span() for m in _WORD_RE.finditer(text, start, end)]
+
+
+def chunk_token_budget(model, fraction=CHUNK_FRACTION, num_ctx=None):
+    """Tokens one document chunk may use so that the prompt and answer still fit num_ctx."""
+    return max(1, int((num_ctx or default_num_ctx(model)) * fraction))
+
+
+def tokens_to_chars(tokens, model=None):
+    """Characters that make up about `tokens` tokens on model."""
+    return max(1, int(tokens * chars_per_token(model)))
@@ -0,0 +1,358 @@
+"""Lightweight per-stage tracing and Ollama token metrics, shared by every app.
+
+    with span("extract", file=name):
+        text = read_pdf(path)
+
+Spans are aggregated per stage name (count, histogram, recent durations) and
+the last few are kept with their attributes for the diagnostics panel; the
+client's own llm.* call spans are kept apart, so they never push the stages
+out. A background job's spans belong to the session that submitted it. The
+Ollama client records every call: prompt and completion tokens, generation
+time, cache hits and how long the request waited in the scheduler; those
+numbers are also added to the open span and every span it is nested in.
+
+Metrics are exposed in the Prometheus text format: set CLAUSEEASE_METRICS_PORT
+to serve them on http://host:port/metrics, or CLAUSEEASE_METRICS_FILE to have
+them written to a file for node_exporter's textfile collector.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from clauseease.scheduler import current_request, get_scheduler
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RECENT_SPANS = 200         # finished spans kept with their attributes (stages and llm.* calls each)
+LLM_SPAN_PREFIX = "llm."   # spans the Ollama client opens around each call
+STAGE_SAMPLES = 256        # recent durations per stage for percentiles
+EXPORT_INTERVAL = 15.0     # seconds between metric file writes
+
+_current = ContextVar("clauseease_span", default=None)
+_owner = ContextVar("clauseease_span_session", default=None)
+_attrs_lock = threading.Lock()     # worker threads add to a shared parent span
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class Span:
+    """One timed stage; attrs collects tokens, cache hits and anything the caller adds."""
+
+    __slots__ = ("name", "parent", "session", "start", "duration", "attrs")
+
+    def __init__(self, name, parent, session, attrs):
+        self.name = name
+        self.parent = parent
+        self.session = session
+        self.start = time.time()
+        self.duration = None
+        self.attrs = attrs
+
+    def add(self, **counts):
+        """Add numbers to the attributes of this span and every span it is nested in."""
+        span = self
+        with _attrs_lock:
+            while span is not None:
+                for key, value in counts.items():
+                    span.attrs[key] = span.attrs.get(key, 0) + value
+                span = span.parent
+
+
+class _Stage:
+    __slots__ = ("count", "total", "max", "buckets", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=STAGE_SAMPLES)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+class _ModelStats:
+    __slots__ = ("requests", "prompt_tokens", "completion_tokens", "eval_seconds",
+                 "prompt_eval_seconds", "cached", "queue_wait", "queued")
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.eval_seconds = 0.0
+        self.prompt_eval_seconds = 0.0
+        self.cached = 0
+        self.queue_wait = 0.0
+        self.queued = 0
+
+    @property
+    def tokens_per_second(self):
+        return self.completion_tokens / self.eval_seconds if self.eval_seconds else 0.0
+
+
+class Tracer:
+    """Process-wide span and metric store."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}           # stage name -> _Stage
+        self.models = {}           # model -> _ModelStats
+        self.caches = {}           # cache name -> [hits, misses]
+        self.recent = deque(maxlen=RECENT_SPANS)
+        self.recent_calls = deque(maxlen=RECENT_SPANS)
+
+    def open_span(self, name, **attrs):
+        """A span nested in the current one but not made current; end it with finish()."""
+        return Span(name, _current.get(), _owner.get() or current_request()[1], attrs)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        current = self.open_span(name, **attrs)
+        token = _current.set(current)
+        start = time.perf_counter()
+        try:
+            yield current
+        finally:
+            _current.reset(token)
+            self.finish(current, time.perf_counter() - start)
+
+    def finish(self, span, seconds):
+        """Record a span measured elsewhere (e.g. a stream that ends after its call returned)."""
+        span.duration = seconds
+        with self._lock:
+            self.stages.setdefault(span.name, _Stage()).observe(seconds)
+            if span.name.startswith(LLM_SPAN_PREFIX):
+                self.recent_calls.append(span)
+            else:
+                self.recent.append(span)
+
+    def record_llm(self, response, span=None):
+        """Count one OllamaResponse's tokens and timings under its model and on span
+        (default: the current span)."""
+        with self._lock:
+            stats = self.models.setdefault(response.model or "unknown", _ModelStats())
+            stats.requests += 1
+            if response.cached:
+                stats.cached += 1
+            else:
+                stats.prompt_tokens += response.prompt_tokens
+                stats.completion_tokens += response.completion_tokens
+                stats.eval_seconds += response.eval_duration
+                stats.prompt_eval_seconds += response.prompt_eval_duration
+        current = span or _current.get()
+        if current is not None:
+            current.add(llm_calls=1, prompt_tokens=response.prompt_tokens,
+                        completion_tokens=response.completion_tokens,
+                        llm_cache_hits=int(response.cached))
+
+    def record_wait(self, model, seconds, span=None):
+        """Time one request spent queued in the scheduler before it was sent, on span
+        (default: the current span)."""
+        with self._lock:
+            stats = self.models.setdefault(model, _ModelStats())
+            stats.queue_wait += seconds
+            stats.queued += 1
+        current = span or _current.get()
+        if current is not None:
+            current.add(queue_wait=seconds)
+
+    def record_cache(self, name, hits, misses):
+        with self._lock:
+            counts = self.caches.setdefault(name, [0, 0])
+            counts[0] += hits
+            counts[1] += misses
+        current = _current.get()
+        if current is not None:
+            current.add(**{f"{name}_cache_hits": hits, f"{name}_cache_misses": misses})
+
+    # -------------------------
+    # Reading
+    # -------------------------
+    def stage_rows(self):
+        """One dict per stage: count, mean, p50, p95, max and total seconds."""
+        with self._lock:
+            return [{"stage": name, "count": s.count, "mean_s": s.total / s.count,
+                     "p50_s": _percentile(s.recent, 0.50), "p95_s": _percentile(s.recent, 0.95),
+                     "max_s": s.max, "total_s": s.total}
+                    for name, s in sorted(self.stages.items(), key=lambda kv: -kv[1].total)]
+
+    def model_rows(self):
+        """One dict per model: requests, tokens, tokens/sec, cache hits and mean queue wait."""
+        with self._lock:
+            return [{"model": model, "requests": m.requests, "cache_hits": m.cached,
+                     "prompt_tokens": m.prompt_tokens, "completion_tokens": m.completion_tokens,
+                     "tokens_per_s": m.tokens_per_second,
+                     "queue_wait_mean_s": m.queue_wait / m.queued if m.queued else 0.0}
+                    for model, m in sorted(self.models.items())]
+
+    def cache_rows(self):
+        with self._lock:
+            return [{"cache": name, "hits": hits, "misses": misses,
+                     "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+                    for name, (hits, misses) in sorted(self.caches.items())]
+
+    def recent_spans(self, session=None, limit=20, calls=False):
+        """Newest finished stage spans first (llm.* call spans with calls=True),
+        optionally only those of one session."""
+        with self._lock:
+            recent = self.recent_calls if calls else self.recent
+            spans = [s for s in reversed(recent) if session is None or s.session == session]
+        return spans[:limit]
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        with self._lock:
+            stages = [(name, s.count, s.total, list(s.buckets)) for name, s in sorted(self.stages.items())]
+            models = [(model, m.requests, m.cached, m.prompt_tokens, m.completion_tokens, m.eval_seconds,
+                       m.prompt_eval_seconds, m.queue_wait, m.queued)
+                      for model, m in sorted(self.models.items())]
+            caches = sorted((name, list(counts)) for name, counts in self.caches.items())
+
+        lines.append("# HELP clauseease_stage_duration_seconds Time spent per pipeline stage.")
+        lines.append("# TYPE clauseease_stage_duration_seconds histogram")
+        for name, count, total, buckets in stages:
+            stage = _escape(name)
+            for bound, n in zip((*BUCKETS, "+Inf"), (*buckets, count)):
+                lines.append(f'clauseease_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {n}')
+            lines.append(f'clauseease_stage_duration_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'clauseease_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+
+        metric("clauseease_llm_requests_total", "counter", "Ollama calls, including cache hits.",
+               [({"model": m[0]}, m[1]) for m in models])
+        metric("clauseease_llm_cache_hits_total", "counter", "Ollama calls answered from the response cache.",
+               [({"model": m[0]}, m[2]) for m in models])
+        metric("clauseease_llm_prompt_tokens_total", "counter", "Prompt tokens evaluated by Ollama.",
+               [({"model": m[0]}, m[3]) for m in models])
+        metric("clauseease_llm_completion_tokens_total", "counter", "Tokens generated by Ollama.",
+               [({"model": m[0]}, m[4]) for m in models])
+        metric("clauseease_llm_eval_seconds_total", "counter",
+               "Generation time reported by Ollama (completion tokens / this = tokens per second).",
+               [({"model": m[0]}, m[5]) for m in models])
+        metric("clauseease_llm_prompt_eval_seconds_total", "counter", "Prompt evaluation time reported by Ollama.",
+               [({"model": m[0]}, m[6]) for m in models])
+        metric("clauseease_llm_queue_wait_seconds_total", "counter", "Time requests waited in the scheduler.",
+               [({"model": m[0]}, m[7]) for m in models])
+        metric("clauseease_llm_queued_requests_total", "counter", "Requests that passed through the scheduler.",
+               [({"model": m[0]}, m[8]) for m in models])
+        metric("clauseease_cache_hits_total", "counter", "Cache hits per cache.",
+               [({"cache": name}, counts[0]) for name, counts in caches])
+        metric("clauseease_cache_misses_total", "counter", "Cache misses per cache.",
+               [({"cache": name}, counts[1]) for name, counts in caches])
+        queues = get_scheduler().stats()
+        metric("clauseease_scheduler_queued", "gauge", "Requests waiting for a slot.",
+               [({"model": q["model"], "priority": q["priority"]}, q["queued"]) for q in queues])
+        metric("clauseease_scheduler_running", "gauge", "Requests in flight.",
+               [({"model": q["model"], "priority": q["priority"]}, q["running"]) for q in queues])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the metrics file atomically (for a textfile collector)."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def serve_metrics(tracer, port, host="0.0.0.0"):
+    """Serve tracer's metrics on /metrics from a daemon thread. Returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="clauseease-metrics").start()
+    return server
+
+
+def write_metrics_periodically(tracer, path, interval=EXPORT_INTERVAL):
+    """Rewrite path with tracer's metrics every interval seconds from a daemon thread."""
+
+    def loop():
+        while True:
+            try:
+                tracer.write_prometheus(path)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    threading.Thread(target=loop, daemon=True, name="clauseease-metrics-file").start()
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Process-wide Tracer; the first call starts the exporters configured in the environment."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+            port = os.environ.get("CLAUSEEASE_METRICS_PORT")
+            if port:
+                try:
+                    serve_metrics(_tracer, int(port))
+                except (OSError, ValueError):
+                    pass    # another process (e.g. a second app) already serves this port
+            path = os.environ.get("CLAUSEEASE_METRICS_FILE")
+            if path:
+                write_metrics_periodically(_tracer, path)
+        return _tracer
+
+
+def span(name, **attrs):
+    """Time a pipeline stage: `with span("embed", chunks=n): ...`."""
+    return get_tracer().span(name, **attrs)
+
+
+@contextmanager
+def span_session(session):
+    """Attribute the block's spans to session, e.g. the one that submitted a job."""
+    token = _owner.set(session)
+    try:
+        yield
+    finally:
+        _owner.reset(token)
+
+
+def current_span():
+    return _current.get()
@@ -0,0 +1,108 @@
+"""Small Streamlit rendering helpers shared by the apps."""
+import time
+
+from clauseease.lazy import load
+from clauseease.scheduler import get_scheduler, set_session
+from clauseease.tracing import get_tracer
+
+REFRESH_SECONDS = 0.05     # redraw at most ~20 times a second while streaming
+POLL_SECONDS = 1.0         # rerun interval while a background job is running
+
+
+def stream_markdown(placeholder, stream, cursor="▌"):
+    """Render an OllamaStream into a placeholder token by token. Returns the full text."""
+    pieces = []
+    last_draw = 0.0
+    for piece in stream:
+        pieces.append(piece)
+        now = time.perf_counter()
+        if now - last_draw >= REFRESH_SECONDS:
+            placeholder.markdown("".join(pieces) + cursor)
+            last_draw = now
+    text = "".join(pieces)
+    placeholder.markdown(text)
+    return text
+
+
+def timing_caption(response):
+    """One-line summary of an OllamaResponse, e.g. for st.caption."""
+    parts = []
+    if response.ttft is not None:
+        parts.append(f"first token {response.ttft:.2f}s")
+    parts.append(f"total {response.wall_time:.2f}s")
+    if response.completion_tokens:
+        parts.append(f"{response.completion_tokens} tokens")
+    if response.tokens_per_second:
+        parts.append(f"{response.tokens_per_second:.1f} tok/s")
+    return " · ".join(parts)
+
+
+def poll_job(job, label, container=None, seconds=POLL_SECONDS):
+    """Show a running JobRecord's progress, then rerun the script to poll it again.
+
+    Only call this for unfinished jobs: it does not return.
+    """
+    st = load("streamlit")
+    text = f"{label}: {job.message or job.status}"
+    if job.total:
+        text += f" ({job.done}/{job.total})"
+    (container or st).progress(job.fraction, text=text)
+    time.sleep(seconds)
+    st.rerun()
+
+
+def _session_id():
+    ctx = load("streamlit.runtime.scriptrunner").get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def tag_session():
+    """Queue this script run's Ollama requests under its Streamlit session, so sessions
+    take turns in the scheduler. Call once near the top of the app."""
+    set_session(_session_id())
+
+
+def queue_stats(container=None):
+    """Table of the Ollama scheduler's per-model queues, e.g. inside an expander."""
+    st = load("streamlit")
+    rows = [row for row in get_scheduler().stats() if row["served"] or row["queued"]]
+    if not rows:
+        (container or st).caption("No Ollama requests yet.")
+        return
+    (container or st).dataframe(
+        [dict(row, wait_p50=round(row["wait_p50"], 2), wait_p95=round(row["wait_p95"], 2),
+              wait_max=round(row["wait_max"], 2)) for row in rows],
+        hide_index=True,
+    )
+
+
+def diagnostics_panel(container=None, limit=8):
+    """Per-stage timings, per-model tokens and throughput, cache hit rates and
+    this session's latest spans (see clauseease.tracing)."""
+    st = load("streamlit")
+    target = container or st
+    tracer = get_tracer()
+    stages = tracer.stage_rows()
+    if not stages:
+        target.caption("Nothing traced yet.")
+        return
+    target.caption("Stages (ms)")
+    target.dataframe([{"stage": r["stage"], "count": r["count"], "p50": round(1000 * r["p50_s"]),
+                       "p95": round(1000 * r["p95_s"]), "total": round(1000 * r["total_s"])}
+                      for r in stages], hide_index=True)
+    models = tracer.model_rows()
+    if models:
+        target.caption("Ollama")
+        target.dataframe([dict(r, tokens_per_s=round(r["tokens_per_s"], 1),
+                               queue_wait_mean_s=round(r["queue_wait_mean_s"], 2)) for r in models],
+                         hide_index=True)
+    caches = tracer.cache_rows()
+    if caches:
+        target.caption(" · ".join(f"{r['cache']} cache {r['hit_rate']:.0%} hits ({r['hits']}/{r['hits'] + r['misses']})"
+                                  for r in caches))
+    spans = tracer.recent_spans(session=_session_id(), limit=limit)
+    if spans:
+        target.caption("Latest in this session")
+        for s in spans:
+            details = ", ".join(f"{k}={round(v, 2) if isinstance(v, float) else v}" for k, v in s.attrs.items())
+            target.text(f"{s.name}: {1000 * s.duration:.0f} ms" + (f" ({details})" if details else ""))
@@ -0,0 +1,124 @@
+"""Multi-document Chroma index, namespaced by document content hash."""
+import re
+import threading
+
+from clauseease.embedding_cache import EmbeddingDimensionError
+
+COLLECTION_NAME = "clauseease_documents"
+
+_doc_locks = {}
+_doc_locks_lock = threading.Lock()
+
+
+def document_lock(doc_id):
+    """Process-wide lock per document, so concurrent sessions ingest it only once."""
+    with _doc_locks_lock:
+        return _doc_locks.setdefault(doc_id, threading.Lock())
+
+
+def collection_name(embedding_model, base=COLLECTION_NAME):
+    """One collection per embedding model, e.g. clauseease_documents__nomic-embed-text."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "-", embedding_model).strip("-._")
+    return f"{base}__{slug}"
+
+
+class DocumentIndex:
+    """Every document's chunks live once in one collection, tagged with metadata.
+
+    Chunk ids are "<doc_id>:<chunk index>", and each chunk carries doc_id,
+    file_name, chunk and total_chunks metadata, so re-uploads are detected,
+    half-finished ingests can be completed, and queries can be filtered to
+    any set of documents.
+
+    With an embedding_model the collection belongs to that model alone and
+    records its vector dimension, so vectors from another model are refused.
+    """
+
+    def __init__(self, chroma_client, embedding_model=None, name=COLLECTION_NAME):
+        self.embedding_model = embedding_model
+        if embedding_model:
+            self.collection = chroma_client.get_or_create_collection(
+                name=collection_name(embedding_model, name),
+                metadata={"embedding_model": embedding_model})
+        else:
+            self.collection = chroma_client.get_or_create_collection(name=name)
+
+    @property
+    def dimension(self):
+        return (self.collection.metadata or {}).get("dimension")
+
+    def _check_dimension(self, embeddings):
+        dims = {len(e) for e in embeddings}
+        known = self.dimension
+        if len(dims) > 1 or (known is not None and dims != {known}):
+            raise EmbeddingDimensionError(
+                f"Collection {self.collection.name} holds {known}-dimensional vectors, "
+                f"got {sorted(dims)}")
+        if known is None and dims:
+            metadata = dict(self.collection.metadata or {})
+            metadata["dimension"] = dims.pop()
+            self.collection.modify(metadata=metadata)
+
+    @staticmethod
+    def chunk_id(doc_id, index):
+        return f"{doc_id}:{index}"
+
+    def stored_chunks(self, doc_id):
+        """Indexes of the chunks of doc_id already in the collection."""
+        got = self.collection.get(where={"doc_id": doc_id}, include=["metadatas"])
+        return {m["chunk"] for m in got["metadatas"]}
+
+    def missing_chunks(self, doc_id, total):
+        """Chunk indexes still to embed (empty when the document is complete)."""
+        stored = self.stored_chunks(doc_id)
+        return [i for i in range(total) if i not in stored]
+
+    def is_indexed(self, doc_id):
+        got = self.collection.get(where={"doc_id": doc_id}, limit=1, include=["metadatas"])
+        if not got["ids"]:
+            return False
+        return len(self.stored_chunks(doc_id)) >= got["metadatas"][0]["total_chunks"]
+
+    def add_chunks(self, doc_id, file_name, indexes, chunks, embeddings, total):
+        """Store chunks (with their embeddings) under doc_id."""
+        self._check_dimension(embeddings)
+        self.collection.upsert(
+            ids=[self.chunk_id(doc_id, i) for i in indexes],
+            documents=list(chunks),
+            embeddings=list(embeddings),
+            metadatas=[{"doc_id": doc_id, "file_name": file_name, "chunk": i,
+                        "total_chunks": total} for i in indexes],
+        )
+
+    def documents(self):
+        """{doc_id: file_name} for every document with at least one stored chunk."""
+        got = self.collection.get(where={"chunk": 0}, include=["metadatas"])
+        return {m["doc_id"]: m["file_name"] for m in got["metadatas"]}
+
+    def delete_document(self, doc_id):
+        self.collection.delete(where={"doc_id": doc_id})
+
+    @staticmethod
+    def doc_filter(doc_ids):
+        """Chroma where-clause restricting results to doc_ids (None = all documents)."""
+        if not doc_ids:
+            return None
+        doc_ids = list(doc_ids)
+        if len(doc_ids) == 1:
+            return {"doc_id": doc_ids[0]}
+        return {"doc_id": {"$in": doc_ids}}
+
+    def query(self, embedding, n_results=3, doc_ids=None):
+        """Nearest chunks to embedding, as (chunk_id, text, metadata) triples."""
+        results = self.collection.query(query_embeddings=[embedding], n_results=n_results,
+                                        where=self.doc_filter(doc_ids),
+                                        include=["documents", "metadatas"])
+        return list(zip(results["ids"][0], results["documents"][0], results["metadatas"][0]))
+
+    def get_chunks(self, chunk_ids):
+        """(chunk_id, text, metadata) triples for chunk_ids, in the order given."""
+        if not chunk_ids:
+            return []
+        got = self.collection.get(ids=list(chunk_ids), include=["documents", "metadatas"])
+        found = {i: (i, d, m) for i, d, m in zip(got["ids"], got["documents"], got["metadatas"])}
+        return [found[i] for i in chunk_ids if i in found]
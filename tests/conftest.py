@@ -0,0 +1,17 @@
+"""Shared fixtures: a fake Ollama server on a free port and clients pointed at it."""
+import pytest
+
+from clauseease.fake_ollama import FakeOllama
+from clauseease.ollama_client import OllamaClient
+
+
+@pytest.fixture(scope="session")
+def server():
+    # No latency and instant generation: the tests check behaviour, not speed
+    with FakeOllama(latency=0.0, tokens_per_second=0.0, completion_tokens=8) as fake:
+        yield fake
+
+
+@pytest.fixture
+def client(server):
+    return OllamaClient(server.url, max_retries=0)
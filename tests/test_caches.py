@@ -0,0 +1,92 @@
+import os
+import time
+
+import pytest
+
+from clauseease.embedding_cache import EmbeddingCache, EmbeddingDimensionError, embed_with_cache
+from clauseease.llm_cache import ResponseCache, cache_key
+from clauseease.result_cache import ResultCache, content_hash
+
+
+def test_result_cache_reads_back_from_disk(tmp_path):
+    ResultCache("docs", tmp_path).put("k", {"summary": "short"})
+    assert ResultCache("docs", tmp_path).get("k") == {"summary": "short"}
+
+
+def test_result_cache_update_merges_fields(tmp_path):
+    cache = ResultCache("docs", tmp_path)
+    cache.update("k", text="full text")
+    assert cache.update("k", summary="short") == {"text": "full text", "summary": "short"}
+
+
+def test_result_cache_memory_layer_is_bounded(tmp_path):
+    cache = ResultCache("docs", tmp_path, memory_entries=2)
+    for key in "abc":
+        cache.put(key, {"key": key})
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a") == {"key": "a"}     # still on disk
+    assert list(cache._memory) == ["c", "a"]
+
+
+def test_result_cache_evicts_least_recently_used_files(tmp_path):
+    cache = ResultCache("docs", tmp_path, max_entries=2)
+    used = time.time() - 100
+    for n, key in enumerate("abc"):
+        cache.put(key, {"key": key})
+        os.utime(cache._path(key), (used + n, used + n))
+    cache.evict()
+    assert sorted(p.stem for p in cache.directory.glob("*.json")) == ["b", "c"]
+    assert cache.get("a") is None
+
+
+def test_result_cache_drops_expired_files(tmp_path):
+    ResultCache("docs", tmp_path).put("k", {"old": True})
+    path = tmp_path / "docs" / "k.json"
+    stale = time.time() - 3600
+    os.utime(path, (stale, stale))
+    assert ResultCache("docs", tmp_path, ttl=60).get("k") is None
+    assert not path.exists()
+
+
+def test_content_hash_depends_on_every_part():
+    assert content_hash(b"pdf", "tinyllama") != content_hash(b"pdf", "llama3.2")
+    assert content_hash(b"pdf", "tinyllama") == content_hash(b"pdf", "tinyllama")
+
+
+def test_cache_key_covers_options_and_format():
+    base = cache_key("tinyllama", "prompt")
+    assert cache_key("tinyllama", "prompt", options={"num_ctx": 2048}) != base
+    assert cache_key("tinyllama", "prompt", format="json") != base
+    assert cache_key("tinyllama", "prompt") == base
+
+
+def test_response_cache_expires_and_evicts(tmp_path):
+    cache = ResponseCache(tmp_path / "llm.sqlite3", max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, "tinyllama", {"text": key})
+    cache.evict()
+    assert cache.get("a") is None
+    assert cache.get("c") == {"text": "c"}
+    expired = ResponseCache(tmp_path / "llm.sqlite3", ttl=1e-9)
+    assert expired.get("c") is None
+
+
+def test_embedding_cache_round_trip_and_dimension_check(tmp_path):
+    cache = EmbeddingCache(tmp_path / "emb.sqlite3")
+    cache.put_many("m", ["one", "two"], [[1.0, 0.0], [0.0, 1.0]])
+    assert cache.dimension("m") == 2
+    assert cache.get_many("m", ["two", "missing"]) == [pytest.approx([0.0, 1.0]), None]
+    with pytest.raises(EmbeddingDimensionError):
+        cache.put_many("m", ["three"], [[1.0, 2.0, 3.0]])
+
+
+def test_embed_with_cache_only_requests_misses(server, client, tmp_path):
+    cache = EmbeddingCache(tmp_path / "emb.sqlite3")
+    first = embed_with_cache(client, cache, ["clause one", "clause two"], "nomic-embed-text")
+    requests = server.requests
+    again = embed_with_cache(client, cache, ["clause two", "clause one"], "nomic-embed-text")
+    assert server.requests == requests
+    assert again[0] == pytest.approx(first[1])
+    embed_with_cache(client, cache, ["clause one", "clause three", "clause three"], "nomic-embed-text")
+    assert server.requests == requests + 1
+    assert cache.stats()["entries"] == 3
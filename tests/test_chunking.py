@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from clauseease.chunking import WORD_RE, chunk_spans, chunk_view, iter_char_chunks, iter_word_chunks
+from clauseease.extraction import TextRecord
+from clauseease.tokens import estimate_tokens
+
+TEXT = "\n\n".join(
+    f"{n}. CLAUSE {n}\n" + " ".join(f"Sentence {n}.{k} of the agreement binds both parties." for k in range(6))
+    for n in range(1, 30)
+)
+
+
+def _records(text):
+    return [TextRecord("paragraph", n, 0, line) for n, line in enumerate(text.split("\n"))]
+
+
+@pytest.mark.parametrize("strategy", ["word", "char", "sentence", "paragraph", "token"])
+def test_chunks_cover_every_word_in_order(strategy):
+    spans = chunk_spans(TEXT, strategy, 120)
+    assert spans[0].start == 0 and spans[-1].end == len(TEXT)
+    for before, after in zip(spans, spans[1:]):
+        assert before.start <= after.start
+        assert not TEXT[before.end:after.start].strip()   # nothing but whitespace between chunks
+
+
+def test_word_chunks_match_joined_word_windows():
+    words = TEXT.split()
+    view = chunk_view(TEXT, "word", 50, 10)
+    assert [" ".join(c.split()) for c in view] == [" ".join(words[i:i + 50]) for i in range(0, len(words), 40)]
+
+
+def test_packed_chunks_respect_the_size():
+    for strategy in ("sentence", "paragraph"):
+        assert all(len(chunk) <= 200 for chunk in chunk_view(TEXT, strategy, 200))
+
+
+def test_token_chunks_fit_the_budget():
+    assert all(estimate_tokens(chunk) <= 64 for chunk in chunk_view(TEXT, "token", 64))
+
+
+@pytest.mark.parametrize("size", [1, 5, 20, 100])
+@pytest.mark.parametrize("overlap", [0, 3])
+def test_no_token_chunk_is_estimated_above_the_budget(size, overlap):
+    rng = random.Random(size * 10 + overlap)
+    # Dense punctuation and long runs without spaces are where a chunk could overshoot
+    text = "".join(rng.choice("abc.,;契約-/:xyz ") for _ in range(3000)) + "契" * 500
+    assert max(estimate_tokens(chunk) for chunk in chunk_view(text, "token", size, overlap)) <= size
+
+
+def test_token_chunks_split_runs_without_whitespace():
+    # CJK text has no spaces: one "word" far larger than a chunk
+    text = "前文 " + "契約当事者は本契約の条項に従う。" * 400 + " 結び"
+    spans = chunk_spans(text, "token", 100)
+    assert len(spans) > 1
+    assert all(estimate_tokens(text[s:e]) <= 100 for s, e in spans)
+    assert "".join(text[s:e] for s, e in spans).replace(" ", "") == text.replace(" ", "")
+
+
+def test_chunk_view_slices_the_source_text():
+    view = chunk_view(TEXT, "word", 20)
+    assert view.text is TEXT
+    assert [view[i] for i in range(len(view))] == [TEXT[s:e] for s, e in chunk_spans(TEXT, "word", 20)]
+    assert view[1:3] == [view[1], view[2]]
+    assert view[-1] == list(view)[-1]
+
+
+def test_unknown_strategy_and_bad_size_are_rejected():
+    with pytest.raises(ValueError):
+        chunk_spans(TEXT, "lines", 10)
+    with pytest.raises(ValueError):
+        chunk_spans(TEXT, "word", 0)
+
+
+def test_streaming_word_chunks_match_whole_text():
+    words = TEXT.split()
+    expected = [" ".join(words[i:i + 30]) for i in range(0, len(words), 25)]
+    assert list(iter_word_chunks(_records(TEXT), 30, 5)) == expected
+
+
+def test_streaming_char_chunks_match_whole_text():
+    joined = "".join(r.text + "\n" for r in _records(TEXT))
+    expected = [joined[i:i + 300] for i in range(0, len(joined), 270)]
+    assert list(iter_char_chunks(_records(TEXT), 300, 30, separator="\n")) == expected
+
+
+def test_word_re_matches_whitespace_separated_words():
+    assert WORD_RE.findall("a  b\tc\nd") == ["a", "b", "c", "d"]
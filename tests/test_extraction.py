@@ -0,0 +1,55 @@
+import io
+
+import pytest
+
+from clauseease.benchmark import synthetic_contract, write_pdf
+from clauseease.clauses import detect_clauses
+from clauseease.extraction import iter_pdf_pages, iter_records, iter_text_lines, join_records
+
+
+def test_text_lines_carry_offsets_into_the_joined_text():
+    text = "first line\nsecond line\n\nlast"
+    records = list(iter_text_lines(io.BytesIO(text.encode())))
+    joined = join_records(records, trailing=False)
+    assert joined == text
+    assert [joined[r.start:r.end] for r in records] == text.split("\n")
+
+
+def test_text_lines_decode_across_block_boundaries(tmp_path):
+    # Multi-byte characters straddle the 64 KB read blocks
+    text = "\n".join("Vertragsbedingungen für Lieferungen – §{} ✓".format(n) for n in range(4000))
+    path = tmp_path / "contract.txt"
+    path.write_text(text, encoding="utf-8")
+    assert join_records(iter_text_lines(path), trailing=False) == text
+    assert join_records(iter_records(str(path), "contract.txt"), trailing=False) == text
+
+
+def test_join_records_headers_and_separators():
+    records = list(iter_text_lines(io.BytesIO(b"a\nb")))
+    assert join_records(records) == "a\nb\n"
+    assert join_records(records, separator="", header=lambda r: f"[{r.number}]") == "[0]a[1]b"
+
+
+def test_pdf_pages_in_order(tmp_path):
+    pytest.importorskip("pypdf")
+    text = synthetic_contract(1, sections=30)
+    path = tmp_path / "contract.pdf"
+    write_pdf(text, path, lines_per_page=20)
+    serial = [r.text for r in iter_pdf_pages(str(path), workers=1)]
+    assert len(serial) > 3
+    assert "MASTER SERVICES AGREEMENT" in serial[0]
+    with open(path, "rb") as f:
+        assert [r.text for r in iter_pdf_pages(f, workers=2, min_pages=1)] == serial
+
+
+def test_detect_clauses_finds_headings_in_order():
+    text = synthetic_contract(3, sections=6)
+    clauses = detect_clauses(text)
+    headings = [c.heading for c in clauses]
+    assert "1. PAYMENT TERMS" in headings
+    assert headings.index("1. PAYMENT TERMS") < headings.index("2. TERMINATION")
+    for before, after in zip(clauses, clauses[1:]):
+        assert before.end == after.start
+    payment = clauses[headings.index("1. PAYMENT TERMS")]
+    assert text[payment.start:payment.heading_end] == payment.heading
+    assert payment.sample.startswith("1.1 The Client shall pay")
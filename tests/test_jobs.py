@@ -0,0 +1,105 @@
+import pytest
+
+from clauseease.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobStore
+from clauseease.scheduler import BATCH, current_request
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(tmp_path / "jobs.sqlite3")
+
+
+def _wait(queue, job_id, timeout=5):
+    """The job's record once its run has returned."""
+    queue._futures[job_id].result(timeout)
+    return queue.get(job_id)
+
+
+def _steps_job(calls, fail_at=None):
+    """Handler that works through params["steps"], checkpointing each one."""
+    def handler(job):
+        done = job.checkpoints()
+        for step in range(job.params["steps"]):
+            if step in done:
+                continue
+            if step == fail_at and "failed" not in calls:
+                calls.append("failed")
+                raise RuntimeError("Ollama went away")
+            calls.append(step)
+            job.checkpoint(step, step * step)
+            job.progress(step + 1, job.params["steps"], "working")
+        return sorted(job.checkpoints().values())
+    return handler
+
+
+def test_job_runs_and_stores_its_result(store):
+    calls = []
+    queue = JobQueue(store, max_workers=1)
+    queue.register("steps", _steps_job(calls))
+    queue.submit("steps", "job-1", {"steps": 3})
+    record = _wait(queue, "job-1")
+    assert record.status == DONE
+    assert record.result == [0, 1, 4]
+    assert (record.done, record.total) == (3, 3)
+    assert store.checkpoints("job-1") == {}
+
+
+def test_failed_job_resumes_from_its_checkpoints(store):
+    calls = []
+    queue = JobQueue(store, max_workers=1)
+    queue.register("steps", _steps_job(calls, fail_at=2))
+    queue.submit("steps", "job-1", {"steps": 4})
+    record = _wait(queue, "job-1")
+    assert record.status == FAILED
+    assert record.error == "Ollama went away"
+    assert sorted(store.checkpoints("job-1")) == [0, 1]
+
+    # A failed job is only run again on request
+    assert queue.submit("steps", "job-1", {"steps": 4}).status == FAILED
+    queue.submit("steps", "job-1", {"steps": 4}, retry=True)
+    record = _wait(queue, "job-1")
+    assert record.status == DONE
+    assert record.result == [0, 1, 4, 9]
+    assert calls == [0, 1, "failed", 2, 3]
+
+
+def test_done_job_is_not_run_twice(store):
+    calls = []
+    queue = JobQueue(store, max_workers=1)
+    queue.register("steps", _steps_job(calls))
+    queue.submit("steps", "job-1", {"steps": 2})
+    _wait(queue, "job-1")
+    assert queue.submit("steps", "job-1", {"steps": 2}).status == DONE
+    assert calls == [0, 1]
+
+
+def test_resume_picks_up_jobs_of_an_earlier_process(store):
+    store.create("job-1", "steps", {"steps": 3})
+    store.set_status("job-1", RUNNING)
+    store.checkpoint("job-1", 0, 0)
+    store.create("job-2", "other", {})
+
+    calls = []
+    queue = JobQueue(store, max_workers=1)      # a fresh process sharing the database
+    queue.register("steps", _steps_job(calls))
+    assert queue.resume("steps") == 1
+    assert _wait(queue, "job-1").result == [0, 1, 4]
+    assert calls == [1, 2]
+    assert store.get("job-2").status == QUEUED
+
+
+def test_missing_handler_fails_the_job(store):
+    queue = JobQueue(store, max_workers=1)
+    queue.submit("unknown", "job-1", {})
+    record = _wait(queue, "job-1")
+    assert record.status == FAILED
+    assert "unknown" in record.error
+
+
+def test_jobs_run_as_batch_work_in_their_own_session(store):
+    seen = []
+    queue = JobQueue(store, max_workers=1)
+    queue.register("probe", lambda job: seen.append(current_request()))
+    queue.submit("probe", "job-1", {})
+    _wait(queue, "job-1")
+    assert seen == [(BATCH, "job:job-1")]
@@ -0,0 +1,106 @@
+import socket
+
+import pytest
+
+from clauseease.fake_ollama import EMBEDDING_DIM, FakeOllama, fake_embedding
+from clauseease.llm_cache import ResponseCache
+from clauseease.ollama_client import OllamaClient, OllamaError
+from clauseease.scheduler import OllamaScheduler
+
+
+def test_generate_returns_text_and_token_counts(client):
+    response = client.generate("Summarize the payment terms.", model="tinyllama")
+    assert response.text
+    assert response.model == "tinyllama"
+    assert response.prompt_tokens > 0
+    assert response.completion_tokens == 8
+    assert not response.cached
+
+
+def test_chat_returns_message_content(client):
+    response = client.chat([{"role": "user", "content": "Who owns the deliverables?"}], model="llama3:latest")
+    assert response.text
+    assert response.completion_tokens == 8
+
+
+def test_generate_stream_yields_pieces_then_response(client):
+    stream = client.generate_stream("Which law governs this agreement?", model="tinyllama")
+    text = "".join(stream)
+    assert text == stream.response.text
+    assert stream.response.completion_tokens == 8
+    assert stream.response.ttft is not None
+
+
+def test_unknown_model_raises_with_status(client):
+    with pytest.raises(OllamaError) as error:
+        client.generate("hello", model="no-such-model")
+    assert error.value.status == 404
+
+
+def test_read_timeout_is_not_retried():
+    with FakeOllama(latency=0.5) as slow:
+        client = OllamaClient(slow.url, read_timeout=0.1, max_retries=2, backoff=0)
+        with pytest.raises(OllamaError, match="did not answer"):
+            client.generate("A long contract", model="tinyllama")
+        assert slow.requests == 1
+
+
+def test_connection_errors_are_retried():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]      # nothing listens here once the socket closes
+    client = OllamaClient(f"http://127.0.0.1:{port}", max_retries=2, backoff=0)
+    attempts = []
+    send = client.session.request
+    client.session.request = lambda *args, **kwargs: attempts.append(1) or send(*args, **kwargs)
+    with pytest.raises(OllamaError, match="Connection error"):
+        client.version()
+    assert len(attempts) == 3
+
+
+def test_response_cache_serves_repeated_prompts(server, tmp_path):
+    client = OllamaClient(server.url, max_retries=0, cache=ResponseCache(tmp_path / "llm.sqlite3"))
+    first = client.generate("Define indemnity.", model="tinyllama", cache=True)
+    requests = server.requests
+    second = client.generate("Define indemnity.", model="tinyllama", cache=True)
+    assert second.cached
+    assert second.text == first.text
+    assert server.requests == requests
+
+
+def test_cache_is_bypassed_unless_asked(server, tmp_path):
+    client = OllamaClient(server.url, max_retries=0, cache=ResponseCache(tmp_path / "llm.sqlite3"))
+    client.generate("Define force majeure.", model="tinyllama", cache=True)
+    requests = server.requests
+    assert not client.generate("Define force majeure.", model="tinyllama").cached
+    assert server.requests == requests + 1
+
+
+def test_embed_batches_in_one_request(server, client):
+    requests = server.requests
+    vectors = client.embed(["first chunk", "second chunk", "third chunk"], model="nomic-embed-text")
+    assert server.requests == requests + 1
+    assert [len(v) for v in vectors] == [EMBEDDING_DIM] * 3
+    assert vectors[0] == pytest.approx(fake_embedding("first chunk"))
+
+
+def test_scheduler_slot_is_released_after_each_call(server):
+    scheduler = OllamaScheduler(default_cap=1)
+    client = OllamaClient(server.url, max_retries=0, scheduler=scheduler)
+    client.generate("one", model="tinyllama")
+    "".join(client.generate_stream("two", model="tinyllama"))
+    # A stream dropped after its first piece must give its slot back too
+    stream = client.generate_stream("three", model="tinyllama")
+    next(iter(stream))
+    stream.close()
+    rows = [row for row in scheduler.stats() if row["model"] == "tinyllama"]
+    assert sum(row["running"] for row in rows) == 0
+    assert sum(row["served"] for row in rows) == 3
+
+
+def test_failed_stream_request_releases_its_slot(server):
+    scheduler = OllamaScheduler(default_cap=1)
+    client = OllamaClient(server.url, max_retries=0, scheduler=scheduler)
+    with pytest.raises(OllamaError):
+        client.generate_stream("hello", model="no-such-model")
+    assert all(row["running"] == 0 for row in scheduler.stats())
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from clauseease.bm25 import BM25Index, tokenize
+from clauseease.context import build_context
+from clauseease.retrieval import is_exact_term_query, reciprocal_rank_fusion
+from clauseease.tfidf import TfidfRetriever
+
+CHUNKS = [
+    "The Client shall pay each invoice within 30 days of receipt.",
+    "Either party may terminate this Agreement on 60 days' written notice.",
+    "This Agreement is governed by the laws of Ireland.",
+    "Confidential Information shall be kept secret for 5 years.",
+]
+
+
+def _bm25(key=int):
+    index = BM25Index()
+    for i, chunk in enumerate(CHUNKS):
+        index.add(key(i), chunk)
+    return index
+
+
+def test_tokenize_keeps_clause_numbers_and_drops_stopwords():
+    assert tokenize("See clause 12.3 of the Agreement") == ["see", "clause", "12.3", "agreement"]
+
+
+def test_bm25_ranks_the_matching_chunk_first():
+    assert _bm25().search("When must an invoice be paid?", k=2)[0][0] == 0
+    assert _bm25().search("governing laws", k=1)[0][0] == 2
+
+
+def test_bm25_keep_filters_keys():
+    hits = _bm25().search("Agreement", keep=lambda key: key != 1)
+    assert hits and all(key != 1 for key, _ in hits)
+
+
+def test_bm25_remove_and_replace():
+    index = _bm25()
+    index.remove(0)
+    assert 0 not in index and len(index) == 3
+    assert index.search("invoice") == []
+    index.add(1, "Invoices are paid monthly.")
+    assert index.search("invoices")[0][0] == 1
+    assert len(index) == 3
+
+
+def test_bm25_save_and_load(tmp_path):
+    # Saved indexes are JSON, so their keys are strings
+    path = tmp_path / "bm25.json"
+    _bm25(str).save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("terminate notice") == _bm25(str).search("terminate notice")
+
+
+def test_bm25_concurrent_saves_leave_a_whole_file(tmp_path):
+    path = tmp_path / "bm25.json"
+    index = _bm25(str)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: index.save(path), range(20)))
+    assert BM25Index.load(path).to_dict() == index.to_dict()
+    assert [p.name for p in tmp_path.iterdir()] == ["bm25.json"]
+
+
+def test_bm25_load_of_missing_file_is_empty(tmp_path):
+    assert len(BM25Index.load(tmp_path / "missing.json")) == 0
+
+
+def test_tfidf_top_k_orders_by_similarity():
+    retriever = TfidfRetriever(CHUNKS)
+    hits = retriever.top_k("confidential information secret", k=2)
+    assert hits[0][0] == 3
+    assert hits[0][1] == pytest.approx(max(retriever.scores("confidential information secret")))
+
+
+def test_tfidf_unknown_terms_give_no_hits():
+    assert TfidfRetriever(CHUNKS).top_k("zebra", k=3) == []
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "a", "d"]])
+    assert {key for key, _ in fused[:2]} == {"a", "b"}
+    assert {key for key, _ in fused[2:]} == {"c", "d"}
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+def test_rrf_weights_favour_one_ranking():
+    fused = reciprocal_rank_fusion([["sparse"], ["dense"]], weights=[0.8, 0.2])
+    assert [key for key, _ in fused] == ["sparse", "dense"]
+
+
+def test_exact_term_queries():
+    assert is_exact_term_query("What does clause 7 say?")
+    assert is_exact_term_query("Explain 12.3")
+    assert is_exact_term_query('Where is "Confidential Information" defined?')
+    assert not is_exact_term_query("How can the agreement be terminated?")
+
+
+def test_build_context_fits_the_budget():
+    ids, used = build_context("invoice payment", CHUNKS, _bm25(), 20)
+    assert ids and ids[0] == 0
+    assert used <= 20
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from clauseease.scheduler import BATCH, INTERACTIVE, OllamaScheduler, model_caps, request_class
+
+
+def _acquire_in_thread(scheduler, model, priority, session=None, on_admit=None):
+    admitted = threading.Event()
+
+    def run():
+        slot = scheduler.acquire(model, priority, session)
+        admitted.set()
+        if on_admit:
+            on_admit(slot)
+
+    threading.Thread(target=run, daemon=True).start()
+    return admitted
+
+
+def _wait_queued(scheduler, model, n, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if sum(row["queued"] for row in scheduler.stats() if row["model"] == model) == n:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"expected {n} queued requests")
+
+
+def test_cap_limits_requests_in_flight():
+    scheduler = OllamaScheduler(default_cap=2)
+    first = scheduler.acquire("m", INTERACTIVE)
+    scheduler.acquire("m", INTERACTIVE)
+    third = _acquire_in_thread(scheduler, "m", INTERACTIVE)
+    assert not third.wait(0.1)
+    first.release()
+    assert third.wait(5)
+
+
+def test_batch_never_takes_the_interactive_reserve():
+    scheduler = OllamaScheduler(default_cap=2)
+    scheduler.acquire("m", BATCH)
+    second_batch = _acquire_in_thread(scheduler, "m", BATCH)
+    assert not second_batch.wait(0.1)
+    # The last slot is kept for questions
+    scheduler.acquire("m", INTERACTIVE)
+
+
+def test_interactive_is_admitted_before_waiting_batch():
+    scheduler = OllamaScheduler(default_cap=1)
+    order = []
+    held = scheduler.acquire("m", INTERACTIVE)
+    _acquire_in_thread(scheduler, "m", BATCH, on_admit=lambda slot: (order.append("batch"), slot.release()))
+    _wait_queued(scheduler, "m", 1)
+    _acquire_in_thread(scheduler, "m", INTERACTIVE,
+                       on_admit=lambda slot: (order.append("interactive"), slot.release()))
+    _wait_queued(scheduler, "m", 2)
+    held.release()
+    _wait_queued(scheduler, "m", 0)
+    deadline = time.monotonic() + 5
+    while len(order) < 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert order == ["interactive", "batch"]
+
+
+def test_sessions_take_turns():
+    scheduler = OllamaScheduler(default_cap=1)
+    order = []
+    done = threading.Event()
+
+    def admitted(session):
+        def on_admit(slot):
+            order.append(session)
+            if len(order) == 4:
+                done.set()
+            slot.release()
+        return on_admit
+
+    held = scheduler.acquire("m", INTERACTIVE)
+    for n, session in enumerate(["a", "a", "a", "b"], 1):
+        _acquire_in_thread(scheduler, "m", INTERACTIVE, session, admitted(session))
+        _wait_queued(scheduler, "m", n)
+    held.release()
+    assert done.wait(5)
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_request_class_sets_the_default_priority():
+    scheduler = OllamaScheduler(default_cap=2)
+    with request_class(BATCH, session="job"):
+        scheduler.acquire("m")
+    rows = {row["priority"]: row for row in scheduler.stats()}
+    assert rows["batch"]["served"] == 1
+    assert rows["interactive"]["served"] == 0
+
+
+def test_set_cap_admits_waiters():
+    scheduler = OllamaScheduler(default_cap=1)
+    scheduler.acquire("m", INTERACTIVE)
+    waiting = _acquire_in_thread(scheduler, "m", INTERACTIVE)
+    assert not waiting.wait(0.1)
+    scheduler.set_cap("m", 2)
+    assert waiting.wait(5)
+
+
+def test_model_caps_parses_the_environment_format():
+    assert model_caps("llama3:latest=2, nomic-embed-text=8,bad,x=0") == {
+        "llama3:latest": 2, "nomic-embed-text": 8, "x": 1}
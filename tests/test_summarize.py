@@ -0,0 +1,29 @@
+from clauseease.ollama_client import OllamaClient
+from clauseease.summarize import MapReduceSummarizer
+
+CHUNKS = [f"Clause {n}: the Supplier shall deliver the Services described in schedule {n}. " * 8
+          for n in range(12)]
+
+
+def test_map_keeps_document_order(client):
+    summaries = MapReduceSummarizer(client, "tinyllama", cache=False).map(CHUNKS)
+    assert len(summaries) == len(CHUNKS)
+    assert all(summary and summary not in CHUNKS for summary in summaries)
+
+
+def test_reduce_merges_until_the_summaries_fit(client):
+    summarizer = MapReduceSummarizer(client, "tinyllama", target_chars=60, group_size=3, cache=False)
+    summary = summarizer.reduce(["a long summary " * 5] * 9)
+    assert summarizer.levels >= 1
+    assert summarizer.errors == []
+    assert summary
+
+
+def test_failed_calls_keep_their_input_and_are_reported(server):
+    client = OllamaClient(server.url, max_retries=0)
+    summarizer = MapReduceSummarizer(client, "no-such-model", cache=False, target_chars=100)
+    assert summarizer.map(CHUNKS[:3]) == CHUNKS[:3]
+    assert len(summarizer.errors) == 3
+    reduced = summarizer.summarize(CHUNKS[:4])
+    assert len(summarizer.errors) > 4        # the map and reduce failures together
+    assert all(chunk.strip() in reduced for chunk in CHUNKS[:4])